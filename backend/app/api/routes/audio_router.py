@@ -1,9 +1,7 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request, Depends
 from pydantic import BaseModel
-from typing import Optional, Dict
-from app.services.audio_service import audio_service
-from fastapi.responses import FileResponse
-import os
+from typing import Optional, Dict, List
+from app.core.container import get_audio_service, get_media_service
 
 router = APIRouter()
 
@@ -18,7 +16,11 @@ class AudioGenerationResponse(BaseModel):
     script: Optional[dict] = None
 
 @router.post("/generate/audio", response_model=AudioGenerationResponse)
-async def generate_audio(request: AudioGenerationRequest, background_tasks: BackgroundTasks):
+async def generate_audio(
+    request: AudioGenerationRequest,
+    background_tasks: BackgroundTasks,
+    audio_service=Depends(get_audio_service)
+):
     """
     Generate audio from input text.
     This is an async operation - use the status endpoint to check progress.
@@ -33,30 +35,50 @@ async def generate_audio(request: AudioGenerationRequest, background_tasks: Back
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/status/{generation_id}", response_model=AudioGenerationResponse)
-async def get_generation_status(generation_id: int):
+async def get_generation_status(generation_id: int, audio_service=Depends(get_audio_service)):
     """Get the status of an audio generation request"""
     result = await audio_service.get_audio_status(generation_id)
     if not result:
         raise HTTPException(status_code=404, detail="Generation not found")
     return result
 
+class AudioPeaksResponse(BaseModel):
+    id: int
+    duration: Optional[float] = None
+    peaks: List[float]
+
+@router.get("/peaks/{generation_id}", response_model=AudioPeaksResponse)
+async def get_audio_peaks(generation_id: int, audio_service=Depends(get_audio_service)):
+    """Get the duration and waveform peaks of generated audio, so the frontend can draw it without decoding"""
+    result = await audio_service.get_peaks(generation_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Audio not yet generated")
+    return result
+
 @router.get("/download/{generation_id}")
-async def download_audio(generation_id: int):
-    """Download the generated audio file"""
+async def download_audio(
+    generation_id: int,
+    request: Request,
+    audio_service=Depends(get_audio_service),
+    media_service=Depends(get_media_service)
+):
+    """
+    Download the generated audio file (supports byte ranges and conditional GETs)
+
+    Audio evicted to free disk space is regenerated from the stored script.
+    """
     result = await audio_service.get_audio_status(generation_id)
     
     if not result:
         raise HTTPException(status_code=404, detail="Generation not found")
         
-    if not result.get("audio_path"):
+    audio_path = await audio_service.ensure_audio(generation_id)
+    if not audio_path:
         raise HTTPException(status_code=404, detail="Audio not yet generated")
         
-    audio_path = result["audio_path"]
-    if not os.path.exists(audio_path):
-        raise HTTPException(status_code=404, detail="Audio file not found")
-        
-    return FileResponse(
+    return await media_service.serve(
+        request,
         audio_path,
         media_type="audio/mpeg",
         filename=f"generated_audio_{generation_id}.mp3"
-    ) 
\ No newline at end of file
+    )
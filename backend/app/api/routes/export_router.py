@@ -0,0 +1,52 @@
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
+from app.core.container import get_export_service
+from app.services.export_service import ExportError
+
+router = APIRouter()
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: Literal["summaries", "generations"],
+    format: Literal["ndjson", "csv"] = "ndjson",
+    status: Optional[str] = None,
+    source: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    export_service=Depends(get_export_service)
+):
+    """
+    Stream summaries or audio generations as NDJSON or CSV, oldest first
+
+    Each row has a `cursor`. Pass the last one received as `cursor` to
+    continue an interrupted or incremental export after that row.
+    """
+    try:
+        export = export_service.open(
+            dataset,
+            status=status,
+            source=source,
+            created_after=created_after,
+            cursor=cursor,
+            limit=limit
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # A plain generator, so Starlette reads the CSV in its threadpool rather than on the event loop
+    body = export.ndjson() if format == "ndjson" else export.csv()
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"content-disposition": f'attachment; filename="{dataset}.{format}"'}
+    )
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import List
+from app.core.container import get_ffmpeg_service
+
+router = APIRouter()
+
+@router.get("/jobs", response_model=List[dict])
+async def list_jobs(ffmpeg_service=Depends(get_ffmpeg_service)):
+    """List queued, running and recently finished ffmpeg jobs"""
+    return [job.to_dict() for job in ffmpeg_service.list_jobs()]
+
+@router.get("/jobs/{job_id}", response_model=dict)
+async def get_job(job_id: str, ffmpeg_service=Depends(get_ffmpeg_service)):
+    """Get the status and progress of an ffmpeg job"""
+    job = ffmpeg_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.delete("/jobs/{job_id}", response_model=dict)
+async def cancel_job(job_id: str, ffmpeg_service=Depends(get_ffmpeg_service)):
+    """Cancel a queued or running ffmpeg job"""
+    job = ffmpeg_service.get_job(job_id)
+    if not job or not await ffmpeg_service.cancel(job_id):
+        raise HTTPException(status_code=404, detail="No queued or running job with this id")
+    return job.to_dict()
@@ -0,0 +1,77 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from app.core.container import get_job_events
+from app.services.job_events import Subscription
+
+router = APIRouter()
+
+@router.websocket("/ws")
+async def job_events_socket(websocket: WebSocket, job_events=Depends(get_job_events)):
+    """
+    Push job state changes for any number of jobs over one connection
+
+    Jobs are named "<kind>:<id>": audio:<generation id>, lipsync:<job id>
+    and youtube:<upload job id>. Globs such as "audio:*" follow every job
+    of a kind. Send
+        {"action": "subscribe", "jobs": ["audio:12", "youtube:*"]}
+        {"action": "unsubscribe", "jobs": ["audio:12"]}
+    and receive {"type": "event", "event": {...}} for each state change,
+    starting with the current state of every known job that matches.
+    """
+    await websocket.accept()
+    subscription = Subscription(asyncio.get_running_loop())
+    # Both tasks below write to the socket
+    send_lock = asyncio.Lock()
+
+    async def send_json(message: dict):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def receive():
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                await send_json({"type": "error", "detail": "Messages must be JSON"})
+                continue
+            jobs = message.get("jobs") if isinstance(message, dict) else None
+            if not isinstance(jobs, list) or not all(isinstance(job, str) for job in jobs):
+                await send_json({"type": "error", "detail": "Expected {\"action\": ..., \"jobs\": [...]}"})
+                continue
+            if message.get("action") == "subscribe":
+                job_events.subscribe(subscription, jobs)
+            elif message.get("action") == "unsubscribe":
+                job_events.unsubscribe(subscription, jobs)
+            else:
+                await send_json({"type": "error", "detail": f"Unknown action {message.get('action')!r}"})
+                continue
+            await send_json({"type": "subscribed", "jobs": sorted(subscription.patterns)})
+
+    async def send():
+        while True:
+            event = await subscription.queue.get()
+            await send_json({"type": "event", "event": event})
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in tasks:
+            if task.done() and not task.cancelled() and not isinstance(task.exception(), WebSocketDisconnect):
+                task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        job_events.unsubscribe(subscription)
+
+@router.get("/stats", response_model=dict)
+async def get_job_event_stats(job_events=Depends(get_job_events)):
+    """Get the number of connected subscriptions and of jobs whose state is kept"""
+    return job_events.stats()
+
+@router.get("/{job}", response_model=dict)
+async def get_job_state(job: str, job_events=Depends(get_job_events)):
+    """Get the last published state of a job, e.g. /api/v1/jobs/audio:12, without reading the CSV"""
+    event = job_events.latest(job)
+    if not event:
+        raise HTTPException(status_code=404, detail="No recent events for this job")
+    return event
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from app.core.container import get_mash_service
+from app.services.mash_service import VideoPathError
+
+router = APIRouter()
+
+class VideoRegistrationRequest(BaseModel):
+    video_path: str
+
+class MashResponse(BaseModel):
+    id: int
+    status: str
+    combined_path: Optional[str] = None
+
+class BatchMashRequest(BaseModel):
+    row_ids: List[int]
+
+@router.get("/{row_id}", response_model=Dict[str, str])
+async def get_artifacts(row_id: int, mash_service=Depends(get_mash_service)):
+    """Get the audio, video and combined artifacts recorded for a generation row"""
+    artifacts = mash_service.index.get(row_id)
+    if not artifacts:
+        raise HTTPException(status_code=404, detail="No artifacts found for this row")
+    return artifacts
+
+@router.put("/{row_id}/video", response_model=Dict[str, str])
+async def register_video(row_id: int, request: VideoRegistrationRequest, mash_service=Depends(get_mash_service)):
+    """Attach an existing video file to a generation row"""
+    try:
+        mash_service.register_video(row_id, request.video_path)
+    except VideoPathError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return mash_service.index.get(row_id)
+
+@router.post("/batch", response_model=List[MashResponse])
+async def mash_batch(request: BatchMashRequest, mash_service=Depends(get_mash_service)):
+    """Mash many rows concurrently, reporting a status per row"""
+    results = await mash_service.mash_rows(request.row_ids)
+    return [MashResponse(id=row_id, **result) for row_id, result in results.items()]
+
+@router.post("/{row_id}", response_model=MashResponse)
+async def mash_row(row_id: int, mash_service=Depends(get_mash_service)):
+    """Combine a row's registered video with its generated audio"""
+    try:
+        combined_path = await mash_service.mash_audio_video(row_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return MashResponse(id=row_id, status="completed", combined_path=combined_path)
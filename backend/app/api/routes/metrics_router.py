@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.metrics import registry
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Expose stage and request latency histograms for Prometheus to scrape"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
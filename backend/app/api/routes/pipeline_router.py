@@ -0,0 +1,55 @@
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from app.core.container import get_pipeline_service
+
+router = APIRouter()
+
+class PipelineRequest(BaseModel):
+    pdf_path: str
+    avatar_video_path: Optional[str] = Field(default=None, description="Video to lip-sync each summary onto; without it the run stops at audio")
+    voice_type: str = "nova"
+    upload: bool = Field(default=False, description="Upload each mashed video to YouTube")
+    privacy_status: str = Field(default="private", description="Video privacy status: public, unlisted, or private")
+    max_summaries: Optional[int] = Field(default=None, description="Only turn the first N summaries into videos")
+    force: bool = Field(default=False, description="Recompute every node instead of using cached outputs")
+
+@router.post("/runs", response_model=dict)
+async def start_run(request: PipelineRequest, pipeline_service=Depends(get_pipeline_service)):
+    """Start a pipeline run in the background; poll it with GET /runs/{run_id}"""
+    try:
+        run = pipeline_service.start(**request.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return run.to_dict()
+
+@router.get("/runs", response_model=List[dict])
+async def list_runs(pipeline_service=Depends(get_pipeline_service)):
+    """List running and recently finished pipeline runs"""
+    return [{
+        "id": run.id,
+        "status": run.status,
+        "pdf_path": run.params["pdf_path"],
+        "created_at": run.created_at,
+        "elapsed": run.elapsed,
+    } for run in pipeline_service.list_runs()]
+
+@router.get("/runs/{run_id}", response_model=dict)
+async def get_run(run_id: str, pipeline_service=Depends(get_pipeline_service)):
+    """Get a run's nodes with their status and timings, per-stage totals and critical path"""
+    run = pipeline_service.get_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Pipeline run not found")
+    return run.to_dict()
+
+@router.post("/runs/{run_id}/rerun", response_model=dict)
+async def rerun(run_id: str, pipeline_service=Depends(get_pipeline_service)):
+    """Run a previous run's parameters again, redoing only nodes that failed or went stale"""
+    run = pipeline_service.get_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Pipeline run not found")
+    try:
+        new_run = pipeline_service.start(**{**run.params, "force": False})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return new_run.to_dict()
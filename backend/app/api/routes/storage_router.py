@@ -0,0 +1,16 @@
+import asyncio
+from fastapi import APIRouter, Depends
+from typing import Dict, List
+from app.core.container import get_storage_service
+
+router = APIRouter()
+
+@router.get("/usage", response_model=dict)
+async def get_usage(storage_service=Depends(get_storage_service)):
+    """Get the size, quota and pinned files of each artifact directory, and free disk space"""
+    return await asyncio.to_thread(storage_service.usage)
+
+@router.post("/sweep", response_model=Dict[str, List[str]])
+async def sweep(storage_service=Depends(get_storage_service)):
+    """Evict least recently used artifacts from every directory over its quota now"""
+    return await asyncio.to_thread(storage_service.sweep)
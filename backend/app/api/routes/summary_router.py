@@ -1,10 +1,12 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
+from typing import List
 import os
 
-from app.services.summaries_service import SummariesService
+from app.core.container import get_summaries_service
 from app.core.config import settings
+from app.core.tracing import run_in_background_trace
 
 router = APIRouter()
 
@@ -15,7 +17,11 @@ class PDFProcessResponse(BaseModel):
     detail: str
 
 @router.post("/process/", response_model=PDFProcessResponse)
-async def process_pdf(request: PDFProcessRequest, background_tasks: BackgroundTasks):
+async def process_pdf(
+    request: PDFProcessRequest,
+    background_tasks: BackgroundTasks,
+    summaries_service=Depends(get_summaries_service)
+):
     """
     Endpoint to process a PDF document and extract summaries.
 
@@ -23,8 +29,12 @@ async def process_pdf(request: PDFProcessRequest, background_tasks: BackgroundTa
     (using FastAPI's BackgroundTasks) so that the client receives an immediate confirmation.
     """
     try:
-        summaries_service = SummariesService()
-        background_tasks.add_task(summaries_service.process_pdf_document, request.pdf_path)
+        background_tasks.add_task(run_in_background_trace, "process_pdf", summaries_service.process_pdf_document, request.pdf_path)
         return PDFProcessResponse(detail="PDF processing started successfully.")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/prompt-cache", response_model=List[dict])
+async def prompt_cache_reports(summaries_service=Depends(get_summaries_service)):
+    """Get prompt-prefix caching results, including tokens saved, for recently processed documents"""
+    return list(summaries_service.prompt_cache_reports)
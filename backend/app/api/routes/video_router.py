@@ -1,18 +1,24 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.services.video_service import video_service
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request, Depends, Query
+from app.core.config import settings
+from app.core.container import get_video_service, get_media_service, get_preview_service
 from typing import Optional
-from fastapi.responses import FileResponse
 import os
+import uuid
 
 router = APIRouter()
 
 @router.post("/lip-sync/")
 async def create_lip_sync_video(
     video: UploadFile = File(...),
-    audio: UploadFile = File(...)
+    audio: UploadFile = File(...),
+    job_id: Optional[str] = Form(None),
+    video_service=Depends(get_video_service)
 ) -> dict:
     """
     Generate a lip-synced video from input video and audio files
+
+    Progress is pushed to subscribers of lipsync:<job_id> on
+    /api/v1/jobs/ws. Pass your own `job_id` to subscribe before posting.
     """
     # Validate file types
     if not video.content_type.startswith('video/'):
@@ -22,28 +28,95 @@ async def create_lip_sync_video(
         raise HTTPException(status_code=400, detail="Invalid audio file type")
 
     # Generate lip-sync video
-    output_path = await video_service.generate_lip_sync(video, audio)
+    job_id = job_id or uuid.uuid4().hex
+    output_path = await video_service.generate_lip_sync(video, audio, job_id)
     
     if not output_path or not os.path.exists(output_path):
         raise HTTPException(status_code=500, detail="Failed to generate video")
 
     return {
         "message": "Video generated successfully",
-        "file_path": output_path
+        "file_path": output_path,
+        "job_id": job_id
     }
 
 @router.get("/download/{filename}")
-async def download_video(filename: str):
+async def download_video(filename: str, request: Request, media_service=Depends(get_media_service)):
     """
     Download a generated video file
+
+    Supports byte-range requests and conditional GETs. Append `?v=<etag>`
+    to get a long-lived immutable cache entry.
     """
-    file_path = os.path.join("generated_videos", filename)
+    file_path = os.path.join("generated_videos", os.path.basename(filename))
     
-    if not os.path.exists(file_path):
+    if not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="Video not found")
         
-    return FileResponse(
+    return await media_service.serve(
+        request,
         file_path,
         media_type='video/mp4',
         filename=filename
-    ) 
\ No newline at end of file
+    )
+
+@router.get("/videos")
+async def list_videos(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    preview_service=Depends(get_preview_service)
+) -> dict:
+    """
+    List generated videos, newest first, with their preview URLs
+
+    `previews` is null for videos whose previews are still being generated.
+    """
+    return await preview_service.list_videos(offset, limit)
+
+def _locate_previews(filename: str, preview_service):
+    """Find a generated video and its preview manifest, scheduling generation if there is none yet"""
+    video_path = os.path.join(settings.OUTPUT_DIR, os.path.basename(filename))
+    if not os.path.isfile(video_path):
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    manifest = preview_service.lookup(video_path)
+    if manifest is None:
+        preview_service.schedule(video_path)
+        raise HTTPException(status_code=404, detail="Previews are being generated")
+    return video_path, manifest
+
+@router.get("/videos/{filename}/previews")
+async def get_video_previews(filename: str, preview_service=Depends(get_preview_service)) -> dict:
+    """Get the thumbnail, preview clip and seek sprite URLs of a generated video, with the sprite's tile layout"""
+    _, manifest = _locate_previews(filename, preview_service)
+    return preview_service.describe(os.path.basename(filename), manifest)
+
+@router.get("/videos/{filename}/thumbnail.jpg")
+async def get_video_thumbnail(
+    filename: str,
+    request: Request,
+    preview_service=Depends(get_preview_service),
+    media_service=Depends(get_media_service)
+):
+    video_path, manifest = _locate_previews(filename, preview_service)
+    return await media_service.serve(request, preview_service.asset_path(video_path, manifest, "thumbnail.jpg"), media_type='image/jpeg', version=manifest["content_hash"])
+
+@router.get("/videos/{filename}/preview.mp4")
+async def get_video_preview(
+    filename: str,
+    request: Request,
+    preview_service=Depends(get_preview_service),
+    media_service=Depends(get_media_service)
+):
+    video_path, manifest = _locate_previews(filename, preview_service)
+    return await media_service.serve(request, preview_service.asset_path(video_path, manifest, "preview.mp4"), media_type='video/mp4', version=manifest["content_hash"])
+
+@router.get("/videos/{filename}/sprite.jpg")
+async def get_video_sprite(
+    filename: str,
+    request: Request,
+    preview_service=Depends(get_preview_service),
+    media_service=Depends(get_media_service)
+):
+    video_path, manifest = _locate_previews(filename, preview_service)
+    return await media_service.serve(request, preview_service.asset_path(video_path, manifest, "sprite.jpg"), media_type='image/jpeg', version=manifest["content_hash"])
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from app.services.youtube_service import youtube_service
+from app.core.container import get_upload_queue_service
 from app.core.config import settings
 import os
 
@@ -30,34 +30,34 @@ class YouTubeUploadRequest(BaseModel):
         }
 
 @router.post("/upload", response_model=dict)
-async def upload_to_youtube(request: YouTubeUploadRequest):
+async def upload_to_youtube(request: YouTubeUploadRequest, upload_queue_service=Depends(get_upload_queue_service)):
     """
-    Upload a video to YouTube with specified settings
+    Queue a video for upload to YouTube with specified settings
     
     The video will be public by default, but you can set it to 'unlisted' or 'private'.
-    You can also specify tags, category, and language.
+    You can also specify tags, category, and language. The upload runs in the
+    background; poll the returned status URL for progress.
     
     Returns:
-        dict: Contains YouTube video ID and URL
+        dict: Contains the upload job ID, its status and status URL
     """
-    try:
-        # Verify file exists
-        if not os.path.exists(request.file_path):
-            raise HTTPException(
-                status_code=404,
-                detail=f"Video file not found at path: {request.file_path}"
-            )
+    # Verify file exists
+    if not os.path.exists(request.file_path):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Video file not found at path: {request.file_path}"
+        )
 
-        # Validate privacy status
-        valid_privacy_statuses = ["public", "unlisted", "private"]
-        if request.privacy_status not in valid_privacy_statuses:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid privacy status. Must be one of: {', '.join(valid_privacy_statuses)}"
-            )
+    # Validate privacy status
+    valid_privacy_statuses = ["public", "unlisted", "private"]
+    if request.privacy_status not in valid_privacy_statuses:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid privacy status. Must be one of: {', '.join(valid_privacy_statuses)}"
+        )
 
-        # Upload to YouTube
-        video_id = youtube_service.upload_video(
+    try:
+        job = upload_queue_service.enqueue(
             file_path=request.file_path,
             title=request.title,
             description=request.description,
@@ -66,21 +66,45 @@ async def upload_to_youtube(request: YouTubeUploadRequest):
             category_id=request.category_id,
             language=request.language
         )
-
-        video_url = f"https://www.youtube.com/watch?v={video_id}"
-        
-        if settings.DEBUG:
-            print(f"Successfully uploaded video: {video_url}")
-
-        return {
-            "video_id": video_id,
-            "video_url": video_url,
-            "privacy_status": request.privacy_status,
-            "title": request.title
-        }
-
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=str(e)
-        ) 
\ No newline at end of file
+        )
+
+    if settings.DEBUG:
+        print(f"Queued YouTube upload {job['id']} for {request.file_path}")
+
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"{settings.API_V1_STR}/youtube/uploads/{job['id']}",
+        "title": request.title
+    }
+
+@router.get("/uploads", response_model=List[dict])
+async def list_uploads(upload_queue_service=Depends(get_upload_queue_service)):
+    """List all YouTube upload jobs"""
+    return upload_queue_service.list_jobs()
+
+@router.get("/uploads/{job_id}", response_model=dict)
+async def get_upload_status(job_id: str, upload_queue_service=Depends(get_upload_queue_service)):
+    """
+    Get an upload's status, progress percentage and throughput (bytes/second)
+
+    When completed, the response includes the YouTube video ID and URL.
+    """
+    job = upload_queue_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if job["video_id"]:
+        job["video_url"] = f"https://www.youtube.com/watch?v={job['video_id']}"
+    return job
+
+@router.post("/uploads/{job_id}/retry", response_model=dict)
+async def retry_upload(job_id: str, upload_queue_service=Depends(get_upload_queue_service)):
+    """Retry a failed upload from its last persisted byte offset"""
+    job = upload_queue_service.retry(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="No failed upload with this id")
+    return job
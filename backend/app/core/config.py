@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import os
 from dotenv import load_dotenv
 
@@ -18,12 +18,14 @@ class Settings(BaseSettings):
     
     # FAL AI Settings
     FAL_KEY: str = os.getenv("FAL_KEY", "")
+    FAL_DOWNLOAD_TIMEOUT: float = 60.0  # Seconds to connect, or to wait for more data, before a download fails
     
     # OpenAI Settings
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     
     # Google GenAI Settings
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    GEMINI_MODEL: str = "gemini-1.5-flash-002"  # Pinned, since context caching needs a fixed version and cached and uncached calls must match
     
     # Output Settings
     OUTPUT_DIR: str = "generated_videos"
@@ -33,6 +35,112 @@ class Settings(BaseSettings):
     AUDIO_CSV_PATH: str = "data/audio_generations.csv"
     SUMMARIES_CSV_PATH: str = "data/summaries.csv"
     
+    # Job Events Settings
+    JOB_EVENTS_HISTORY: int = 1000  # Jobs whose last event is kept for clients that subscribe late
+    JOB_EVENTS_QUEUE_SIZE: int = 256  # Events buffered per WebSocket client before the oldest are dropped
+    
+    # Export Settings
+    EXPORT_CHUNK_BYTES: int = 64 * 1024  # Rows are sent in chunks of about this size
+    
+    # Artifact Index Settings
+    ARTIFACT_INDEX_PATH: str = "data/artifact_index.json"
+    
+    # FFmpeg Scheduler Settings
+    FFMPEG_CPU_SLOTS: int = 0  # 0 = one slot per CPU
+    FFMPEG_INTERACTIVE_RESERVED_SLOTS: int = 1  # Slots batch jobs can't use
+    FFMPEG_JOB_HISTORY: int = 100  # Finished jobs kept for status queries
+    
+    # YouTube Settings
+    YOUTUBE_TOKEN_REFRESH_MARGIN: int = 300  # Refresh the access token this many seconds before it expires
+    YOUTUBE_UPLOAD_JOBS_PATH: str = "data/youtube_uploads.json"
+    YOUTUBE_UPLOAD_WORKERS: int = 2
+    YOUTUBE_UPLOAD_MIN_CHUNK_SIZE: int = 1024 * 1024  # 1MB
+    YOUTUBE_UPLOAD_MAX_CHUNK_SIZE: int = 64 * 1024 * 1024  # 64MB
+    YOUTUBE_UPLOAD_CHUNK_SECONDS: float = 5.0  # Target time to send one chunk
+    
+    # Media Serving Settings
+    MEDIA_CACHE_MAX_AGE: int = 365 * 24 * 60 * 60  # 1 year, for content-versioned URLs
+    MEDIA_HASH_CHUNK_SIZE: int = 1024 * 1024  # 1MB
+    
+    # Startup Settings
+    WARM_UP_SERVICES: List[str] = []  # e.g. ["audio", "summaries"] to build them at startup
+    
+    # Artifact Storage Settings
+    # Disk quota in bytes per artifact directory; least recently used files are evicted beyond it
+    ARTIFACT_QUOTAS: Dict[str, int] = {
+        "generated_audio": 2 * 1024 * 1024 * 1024,  # 2GB
+        "generated_videos": 20 * 1024 * 1024 * 1024,  # 20GB
+        "generated_images": 2 * 1024 * 1024 * 1024,  # 2GB
+        "uploads": 5 * 1024 * 1024 * 1024,  # 5GB
+    }
+    ARTIFACT_EVICT_TO: float = 0.9  # Evict down to this fraction of the quota so every write doesn't trigger a sweep
+    ARTIFACT_MIN_AGE_SECONDS: float = 300  # Never evict files written more recently than this
+    ARTIFACT_SWEEP_INTERVAL: float = 600  # Seconds between background quota sweeps
+    ARTIFACT_ACCESS_PATH: str = "data/artifact_access.json"
+    
+    # External API Rate Limiting Settings
+    # Starting requests per second per "provider:model" (or "provider:*"); adapted at runtime from
+    # rate-limit headers and 429s
+    RATE_LIMITS: Dict[str, float] = {
+        "openai:gpt-4": 3.0,
+        "openai:tts-1": 0.8,
+        "gemini:*": 0.25,  # 15 requests per minute on the free tier
+        "fal:*": 2.0,
+        "youtube:*": 5.0,
+    }
+    RATE_LIMIT_DEFAULT: float = 1.0
+    RATE_LIMIT_BURST: float = 5.0  # Requests that may go out back-to-back before the rate applies
+    EXTERNAL_MAX_ATTEMPTS: int = 5
+    EXTERNAL_RETRY_BASE_DELAY: float = 0.5  # Seconds, doubled on each attempt and jittered
+    EXTERNAL_RETRY_MAX_DELAY: float = 30.0
+    CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures before a provider's circuit opens
+    CIRCUIT_RESET_SECONDS: float = 30.0
+    
+    # Audio Analysis Settings
+    AUDIO_ANALYSIS_SAMPLE_RATE: int = 16000  # Hz, plenty for levels and silence detection
+    AUDIO_ANALYSIS_FRAME_SECONDS: float = 0.01  # Resolution of the RMS envelope
+    AUDIO_SILENCE_THRESHOLD_DB: float = -45.0  # dBFS below which a frame counts as silence
+    AUDIO_TRIM_PADDING: float = 0.05  # Seconds of silence kept before and after the speech
+    AUDIO_MIN_TRIM_SECONDS: float = 0.1  # Only rewrite a file when at least this much silence can go
+    AUDIO_PEAKS_COUNT: int = 200  # Waveform peaks stored per generation
+    
+    # Video Preview Settings
+    PREVIEW_THUMBNAIL_WIDTH: int = 320  # Pixels, height follows the aspect ratio
+    PREVIEW_CLIP_WIDTH: int = 240
+    PREVIEW_CLIP_SECONDS: float = 6.0  # Length of the muted hover preview
+    PREVIEW_SPRITE_TILES: int = 50  # Frames in the seek sprite, spread evenly over the video
+    PREVIEW_SPRITE_COLUMNS: int = 10
+    PREVIEW_SPRITE_TILE_WIDTH: int = 160
+    
+    # PDF Extraction Settings
+    PDF_EXTRACTION_BACKEND: str = "auto"  # "auto" (pypdfium2, pdfplumber for table-heavy pages), "pypdfium2" or "pdfplumber"
+    PDF_TABLE_RULING_LINES: int = 10  # Path objects on a page that mark it as table-heavy
+    
+    # Gemini Prompt Cache Settings
+    GEMINI_PROMPT_CACHE: str = "gemini"  # "gemini", "local" (in-process stand-in for tests) or "off"
+    GEMINI_CACHE_TTL: int = 3600  # Seconds; the cache is deleted as soon as its document is done
+    GEMINI_CACHE_MIN_TOKENS: int = 32768  # Gemini's minimum cacheable size; smaller prefixes are sent inline
+    
+    # Pipeline Settings
+    PIPELINE_CACHE_PATH: str = "data/pipeline_cache.json"
+    # Nodes of each stage that may run at once across all pipeline runs
+    PIPELINE_STAGE_CONCURRENCY: Dict[str, int] = {
+        "summarise": 2,
+        "script": 4,
+        "audio": 4,
+        "video": 2,  # Each one uploads the avatar video to fal
+        "mash": 4,
+        "upload": 2,
+    }
+    PIPELINE_RUN_HISTORY: int = 50  # Finished runs kept for status queries
+    
+    # Tracing and Profiling Settings
+    PROFILE_DIR: str = "data/profiles"
+    PROFILE_SAMPLE_RATE: float = 0.0  # Fraction of requests to profile, on top of those sending `X-Profile: 1`
+    PROFILE_INTERVAL: float = 0.005  # Seconds between stack samples
+    PROFILE_LOOP_BLOCK_THRESHOLD: float = 0.1  # Seconds the event loop may stall before it counts as blocked
+    TRACE_SLOW_REQUEST_SECONDS: float = 10.0  # Write the trace of any slower request, 0 to disable
+    
     # Debug Settings
     DEBUG: bool = True
     
@@ -0,0 +1,150 @@
+import sys
+import time
+import threading
+import importlib
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from app.core.config import settings
+
+class ServiceContainer:
+    """
+    Lazily build and hold one instance of each service per worker
+
+    Service modules (and the SDKs they import) are only imported the first
+    time a service is requested, and the time each build takes is recorded
+    so slow services show up in the startup report.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self.build_timings: Dict[str, dict] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """Register a zero-argument factory for a service"""
+        self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        """Get a service, building it on first use"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            # Another thread may have built it while we waited
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"No service registered as '{name}'")
+                modules_before = len(sys.modules)
+                start = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self.build_timings[name] = {
+                    "seconds": time.perf_counter() - start,
+                    "modules_loaded": len(sys.modules) - modules_before,
+                }
+                if settings.DEBUG: print(f"** Built {name} service in {self.build_timings[name]['seconds'] * 1000:.0f}ms")
+            return self._instances[name]
+
+    def override(self, name: str, instance: Any):
+        """Replace a service instance, e.g. with a fake in benchmarks"""
+        with self._lock:
+            self._instances[name] = instance
+
+    def reset(self, name: Optional[str] = None):
+        """Drop built instances so they are rebuilt on next use"""
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+    def warm_up(self, names: Iterable[str]):
+        """Build the given services ahead of the first request"""
+        for name in names:
+            self.get(name)
+
+    def import_report(self) -> List[dict]:
+        """
+        Cost of building each service so far, slowest first
+
+        `seconds` covers importing the service module and constructing the
+        service, which is where SDK imports happen; `modules_loaded` counts
+        the modules that were imported along the way.
+        """
+        return sorted(
+            ({"service": name, **timing} for name, timing in self.build_timings.items()),
+            key=lambda entry: entry["seconds"],
+            reverse=True
+        )
+
+    def print_import_report(self):
+        print("** Service import/build cost:")
+        for entry in self.import_report():
+            print(f"   {entry['service']:<16} {entry['seconds'] * 1000:>8.0f}ms  ({entry['modules_loaded']} modules)")
+
+container = ServiceContainer()
+
+def _lazy(module_name: str, class_name: str, *args) -> Callable[[], Any]:
+    """Factory that imports a service module on first use and instantiates its class"""
+    def factory():
+        module = importlib.import_module(module_name)
+        return getattr(module, class_name)(*args)
+    return factory
+
+container.register("artifact_index", _lazy("app.services.artifact_index", "ArtifactIndex", settings.ARTIFACT_INDEX_PATH))
+container.register("audio", _lazy("app.services.audio_service", "AudioService"))
+container.register("export", _lazy("app.services.export_service", "ExportService"))
+container.register("ffmpeg", _lazy("app.services.ffmpeg_service", "FFmpegService"))
+container.register("job_events", _lazy("app.services.job_events", "JobEventHub"))
+container.register("mash", _lazy("app.services.mash_service", "MashService"))
+container.register("media", _lazy("app.services.media_service", "MediaService"))
+container.register("pipeline", _lazy("app.services.pipeline_service", "PipelineService"))
+container.register("previews", _lazy("app.services.preview_service", "PreviewService"))
+container.register("storage", _lazy("app.services.storage_service", "StorageService"))
+container.register("summaries", _lazy("app.services.summaries_service", "SummariesService"))
+container.register("upload_queue", _lazy("app.services.upload_queue_service", "UploadQueueService"))
+container.register("video", _lazy("app.services.video_service", "VideoService"))
+container.register("youtube", _lazy("app.services.youtube_service", "YouTubeService"))
+
+# FastAPI dependencies and accessors for cross-service use
+def get_artifact_index():
+    return container.get("artifact_index")
+
+def get_audio_service():
+    return container.get("audio")
+
+def get_export_service():
+    return container.get("export")
+
+def get_ffmpeg_service():
+    return container.get("ffmpeg")
+
+def get_job_events():
+    return container.get("job_events")
+
+def get_mash_service():
+    return container.get("mash")
+
+def get_media_service():
+    return container.get("media")
+
+def get_pipeline_service():
+    return container.get("pipeline")
+
+def get_preview_service():
+    return container.get("previews")
+
+def get_storage_service():
+    return container.get("storage")
+
+def get_summaries_service():
+    return container.get("summaries")
+
+def get_upload_queue_service():
+    return container.get("upload_queue")
+
+def get_video_service():
+    return container.get("video")
+
+def get_youtube_service():
+    return container.get("youtube")
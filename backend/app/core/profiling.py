@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+import traceback
+from collections import Counter
+from typing import List, Optional
+from app.core.config import settings
+
+def _collapse(frame) -> str:
+    """Render a frame's call stack root-first in the collapsed flamegraph format"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class RequestProfiler:
+    """
+    Sampling profiler and event-loop block detector for a single request
+
+    A background thread samples the stacks of every thread every
+    PROFILE_INTERVAL seconds and keeps a heartbeat on the event loop. When
+    the loop doesn't answer within PROFILE_LOOP_BLOCK_THRESHOLD, the stack
+    it is stuck in is recorded as a blocking event. Samples cover the whole
+    process while the request is in flight, so concurrent requests show up
+    too.
+    """
+
+    def __init__(self, interval: Optional[float] = None, block_threshold: Optional[float] = None):
+        self.interval = interval or settings.PROFILE_INTERVAL
+        self.block_threshold = block_threshold or settings.PROFILE_LOOP_BLOCK_THRESHOLD
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.loop_blocks: List[dict] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._beat_requested_at: Optional[float] = None
+        self._current_block: Optional[dict] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+        self._elapsed = 0.0
+
+    def start(self):
+        """Start sampling; must be called from the event loop thread"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._elapsed = time.perf_counter() - self._started_at
+
+    def _beat(self):
+        self._beat_requested_at = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                thread_name = "event-loop" if thread_id == self._loop_thread_id else f"thread-{thread_id}"
+                self.samples[f"{thread_name};{_collapse(frame)}"] += 1
+            self.sample_count += 1
+
+            self._check_loop(now, frames.get(self._loop_thread_id))
+
+    def _check_loop(self, now: float, loop_frame):
+        """Record the loop as blocked if the last heartbeat hasn't run within the threshold"""
+        if self._beat_requested_at is None:
+            if self._current_block:
+                self._current_block = None
+            self._beat_requested_at = now
+            self._loop.call_soon_threadsafe(self._beat)
+            return
+
+        blocked_for = now - self._beat_requested_at
+        if blocked_for < self.block_threshold:
+            return
+
+        if self._current_block is None:
+            # Capture the stack once, when the block is first noticed
+            self._current_block = {
+                "at": round(self._beat_requested_at - self._started_at, 6),
+                "blocked_for": round(blocked_for, 6),
+                "stack": traceback.format_stack(loop_frame) if loop_frame else [],
+            }
+            self.loop_blocks.append(self._current_block)
+        else:
+            self._current_block["blocked_for"] = round(blocked_for, 6)
+
+    def write(self, directory: str):
+        """
+        Write the profile to a directory
+
+        `profile.folded` can be fed to flamegraph.pl or speedscope, and
+        `loop_blocks.json` lists each time the event loop was blocked.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "profile.folded"), "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(directory, "loop_blocks.json"), "w") as f:
+            json.dump({
+                "elapsed": round(self._elapsed, 6),
+                "samples": self.sample_count,
+                "interval": self.interval,
+                "block_threshold": self.block_threshold,
+                "blocks": self.loop_blocks,
+            }, f, indent=2)
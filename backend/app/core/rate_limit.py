@@ -0,0 +1,318 @@
+import re
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import observe_stage
+
+# Statuses worth retrying: timeouts, throttling and transient server errors
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+# YouTube reports throttling as 403 with one of these reasons; quotaExceeded is daily and not retried
+RETRYABLE_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "backendError")
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider that has been failing repeatedly"""
+
+def parse_duration(value: str) -> Optional[float]:
+    """Parse OpenAI-style reset durations ("1s", "6m0s", "20ms") or plain seconds"""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    scale = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+    seconds = parse_duration(value)
+    if seconds is not None:
+        return seconds
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def classify_error(error: BaseException) -> Tuple[bool, Optional[int], Optional[float]]:
+    """
+    Work out whether an SDK error is worth retrying
+
+    The SDKs all raise different exception types, so this looks for a
+    status code and headers by duck typing (OpenAI/httpx `status_code` and
+    `response`, googleapiclient `resp`, google.api_core `code`) along the
+    exception's cause chain. Returns (retryable, status, retry_after).
+    """
+    current = error
+    while current is not None:
+        response = getattr(current, "response", None) or getattr(current, "resp", None)
+        status = getattr(current, "status_code", None) or getattr(response, "status_code", None) or getattr(response, "status", None)
+        if status is None and isinstance(getattr(current, "code", None), int):
+            status = current.code
+        if status is not None:
+            status = int(status)
+            headers = getattr(response, "headers", None) or (response if isinstance(response, Mapping) else {})
+            retry_after = parse_retry_after(headers.get("retry-after") or headers.get("Retry-After"))
+            # googleapiclient keeps the reason in the response body rather than the message
+            details = f"{current} {getattr(current, 'content', b'')!r}"
+            retryable = status in RETRYABLE_STATUSES or (status == 403 and any(reason in details for reason in RETRYABLE_REASONS))
+            return retryable, status, retry_after
+        current = current.__cause__ or current.__context__
+
+    # No status anywhere: network failures are retryable, anything else is a bug
+    retryable = isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in (
+        "APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "ConnectTimeout", "RemoteProtocolError",
+        # requests' own, which don't subclass the builtin ConnectionError
+        "ConnectionError", "ChunkedEncodingError"
+    )
+    return retryable, None, None
+
+class TokenBucket:
+    """
+    Token bucket whose rate adapts to what the provider tolerates
+
+    The rate creeps up after each success and halves on a 429, and pauses
+    entirely until the reset time when the provider says the window is
+    used up. When rate-limit headers give the real limit, the rate never
+    goes above it.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = rate / 20
+        self.max_rate = rate * 10
+        self.tokens = burst
+        self.paused_until = 0.0
+        self._last_decrease = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Reserve the token now so concurrent callers queue up behind each other
+            self.tokens -= 1
+            return max(-self.tokens / self.rate if self.tokens < 0 else 0.0, self.paused_until - now)
+
+    def acquire(self) -> float:
+        """Take a token, sleeping until one is available; returns the time waited"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.rate * 0.05)
+
+    def on_throttled(self, retry_after: Optional[float]):
+        with self._lock:
+            now = time.monotonic()
+            # Concurrent callers hitting the same limit are one signal, so halve once per second at most
+            if now - self._last_decrease >= 1.0:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._last_decrease = now
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+    def update_from_headers(self, limit: Optional[float], remaining: Optional[float], reset: Optional[float]):
+        """Apply a requests-per-minute limit and remaining/reset counters from a response"""
+        with self._lock:
+            if limit:
+                self.max_rate = limit / 60
+                self.rate = min(self.rate, self.max_rate)
+            if remaining is not None and remaining <= 0 and reset:
+                self.paused_until = max(self.paused_until, time.monotonic() + reset)
+
+class CircuitBreaker:
+    """Stop calling a provider after repeated failures, then let one trial call through"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def before_call(self, name: str) -> bool:
+        """Raise if the provider may not be called now; returns whether this call is the half-open trial"""
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half_open" and self._trial_in_flight):
+                raise CircuitOpenError(f"{name} is failing, not calling it for up to {self.reset_seconds:.0f}s")
+            if state == "half_open":
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def on_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def on_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+    def end_trial(self):
+        """Free the trial slot even if the trial ended without a success or failure, e.g. when cancelled"""
+        with self._lock:
+            self._trial_in_flight = False
+
+class ExternalCallLimiter:
+    """
+    Shared rate limiting, retries and circuit breaking for external APIs
+
+    Buckets are kept per provider and model (e.g. "openai:tts-1") and
+    circuit breakers per provider. `call` blocks the calling thread while
+    it waits; async code uses `acall`, which waits on the event loop and
+    only holds a worker thread for the call itself.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, provider: str, model: str) -> TokenBucket:
+        key = f"{provider}:{model}"
+        with self._lock:
+            if key not in self._buckets:
+                rate = settings.RATE_LIMITS.get(key) or settings.RATE_LIMITS.get(f"{provider}:*") or settings.RATE_LIMIT_DEFAULT
+                self._buckets[key] = TokenBucket(rate, settings.RATE_LIMIT_BURST)
+            return self._buckets[key]
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            if provider not in self._breakers:
+                self._breakers[provider] = CircuitBreaker(settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS)
+            return self._breakers[provider]
+
+    def observe_headers(self, provider: str, model: str, headers: Mapping[str, str]):
+        """Adapt a bucket to x-ratelimit-* response headers (OpenAI's naming)"""
+        def number(name: str) -> Optional[float]:
+            try:
+                return float(headers[name])
+            except (KeyError, TypeError, ValueError):
+                return None
+
+        remaining = number("x-ratelimit-remaining-requests")
+        reset = parse_duration(headers.get("x-ratelimit-reset-requests", "") or "")
+        # Running out of tokens pauses requests just like running out of requests does
+        remaining_tokens = number("x-ratelimit-remaining-tokens")
+        limit_tokens = number("x-ratelimit-limit-tokens")
+        if remaining_tokens is not None and limit_tokens and remaining_tokens < limit_tokens * 0.02:
+            remaining = 0
+            reset = max(reset or 0.0, parse_duration(headers.get("x-ratelimit-reset-tokens", "") or "") or 0.0)
+
+        limit = number("x-ratelimit-limit-requests")
+        if limit is not None or remaining is not None:
+            self.bucket(provider, model).update_from_headers(limit, remaining, reset)
+
+    def _backoff(self, provider: str, model: str, bucket: TokenBucket, breaker: CircuitBreaker, attempt: int, error: Exception) -> Optional[float]:
+        """Record a failed attempt and return how long to wait before the next one, or None to give up"""
+        retryable, status, retry_after = classify_error(error)
+        if status == 429:
+            bucket.on_throttled(retry_after)
+        if retryable and status != 429:
+            breaker.on_failure()
+        else:
+            # Throttling and client errors mean the provider is up
+            breaker.on_success()
+        if not retryable or attempt == settings.EXTERNAL_MAX_ATTEMPTS:
+            return None
+
+        # Full jitter, but never sooner than the provider asked for
+        backoff = random.uniform(0, min(settings.EXTERNAL_RETRY_MAX_DELAY, settings.EXTERNAL_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+        backoff = max(backoff, retry_after or 0.0)
+        if settings.DEBUG: print(f"** {provider}:{model} call failed ({status or type(error).__name__}), retry {attempt}/{settings.EXTERNAL_MAX_ATTEMPTS - 1} in {backoff:.1f}s")
+        observe_stage(f"{provider}_retry_backoff", backoff)
+        return backoff
+
+    def call(self, provider: str, model: str, fn: Callable[..., Any], /, *args, **kwargs) -> Any:
+        """Call `fn` once a token is available, retrying transient failures with jittered backoff"""
+        bucket = self.bucket(provider, model)
+        breaker = self.breaker(provider)
+
+        for attempt in range(1, settings.EXTERNAL_MAX_ATTEMPTS + 1):
+            trial = breaker.before_call(provider)
+            try:
+                waited = bucket.acquire()
+                if waited > 0:
+                    observe_stage(f"{provider}_ratelimit_wait", waited)
+
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    backoff = self._backoff(provider, model, bucket, breaker, attempt, e)
+                    if backoff is None:
+                        raise
+                else:
+                    bucket.on_success()
+                    breaker.on_success()
+                    return result
+            finally:
+                if trial:
+                    breaker.end_trial()
+            time.sleep(backoff)
+
+    async def acall(self, provider: str, model: str, fn: Callable[..., Any], /, *args, **kwargs) -> Any:
+        """
+        `call` for async code: waits for tokens and backoff with asyncio.sleep
+
+        The blocking `fn` still runs in a worker thread, but a throttled
+        burst no longer fills the default executor with sleeping threads
+        that file hashing, CSV reads and previews are queued behind.
+        """
+        bucket = self.bucket(provider, model)
+        breaker = self.breaker(provider)
+
+        for attempt in range(1, settings.EXTERNAL_MAX_ATTEMPTS + 1):
+            trial = breaker.before_call(provider)
+            try:
+                waited = bucket.reserve()
+                if waited > 0:
+                    await asyncio.sleep(waited)
+                    observe_stage(f"{provider}_ratelimit_wait", waited)
+
+                try:
+                    result = await asyncio.to_thread(fn, *args, **kwargs)
+                except Exception as e:
+                    backoff = self._backoff(provider, model, bucket, breaker, attempt, e)
+                    if backoff is None:
+                        raise
+                else:
+                    bucket.on_success()
+                    breaker.on_success()
+                    return result
+            finally:
+                if trial:
+                    breaker.end_trial()
+            await asyncio.sleep(backoff)
+
+limiter = ExternalCallLimiter()
@@ -0,0 +1,200 @@
+import os
+import json
+import asyncio
+import time
+import uuid
+import random
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from app.core.config import settings
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    duration: Optional[float] = None
+    attributes: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+
+@dataclass
+class Trace:
+    trace_id: str
+    started_at: float = field(default_factory=time.time)
+    _origin: float = field(default_factory=time.perf_counter, repr=False)
+    spans: List[Span] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "started_at": self.started_at,
+            "spans": [
+                {
+                    "name": span.name,
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    # Offsets are relative to the start of the trace
+                    "start": round(span.start - self._origin, 6),
+                    "duration": None if span.duration is None else round(span.duration, 6),
+                    "attributes": span.attributes,
+                    "error": span.error,
+                } for span in self.spans
+            ],
+        }
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+def current_trace_id() -> str:
+    """Trace id of the request being handled, or an empty string outside a request"""
+    trace = _current_trace.get()
+    return trace.trace_id if trace else ""
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Record a span for a block inside the current trace
+
+    Spans nest through context variables, so they follow the request into
+    awaited coroutines, tasks and `asyncio.to_thread` calls. Outside a
+    request this is a no-op.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(
+        name=name,
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent.span_id if parent else None,
+        start=time.perf_counter(),
+        attributes={key: str(value) for key, value in attributes.items()}
+    )
+    trace.spans.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = repr(e)
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _current_span.reset(token)
+
+def record_span(name: str, seconds: float, **attributes):
+    """Record a span that has already finished, e.g. one measured from callbacks"""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    trace.spans.append(Span(
+        name=name,
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent.span_id if parent else None,
+        start=time.perf_counter() - seconds,
+        duration=seconds,
+        attributes={key: str(value) for key, value in attributes.items()}
+    ))
+
+def write_trace(trace: Trace, directory: str):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "trace.json"), "w") as f:
+        json.dump(trace.to_dict(), f, indent=2)
+
+@contextmanager
+def background_trace(name: str, trace_id: Optional[str] = None, **attributes):
+    """
+    Give background work its own trace instead of the request's that started it
+
+    Tasks and background tasks copy the request's context, so without this
+    their spans would keep piling onto a trace that was already finished
+    and written, and the rows they write would carry the request's trace
+    id. The new trace is written to PROFILE_DIR/<trace_id>/ when it runs
+    longer than TRACE_SLOW_REQUEST_SECONDS.
+    """
+    trace = Trace(trace_id=trace_id or uuid.uuid4().hex)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    start = time.perf_counter()
+    try:
+        with span(name, **attributes):
+            yield trace
+    finally:
+        elapsed = time.perf_counter() - start
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        if settings.TRACE_SLOW_REQUEST_SECONDS and elapsed >= settings.TRACE_SLOW_REQUEST_SECONDS:
+            directory = os.path.join(settings.PROFILE_DIR, trace.trace_id)
+            write_trace(trace, directory)
+            if settings.DEBUG: print(f"** Wrote trace for {name} ({elapsed:.2f}s) to {directory}")
+
+def run_in_background_trace(name: str, fn, *args, **kwargs):
+    """Call `fn` in its own trace, e.g. as a FastAPI background task"""
+    with background_trace(name):
+        return fn(*args, **kwargs)
+
+class TracingMiddleware:
+    """
+    ASGI middleware that starts a trace per request and optionally profiles it
+
+    The trace id comes from the `X-Trace-Id` request header when present and
+    is echoed back in the response. A request is profiled when it sends
+    `X-Profile: 1` or falls into the PROFILE_SAMPLE_RATE sample; profiled and
+    slow requests have their spans written to PROFILE_DIR/<trace_id>/.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _should_profile(self, headers: Dict[str, str]) -> bool:
+        if headers.get("x-profile", "").lower() in ("1", "true", "yes"):
+            return True
+        return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        # Only accept short, header-safe ids from clients
+        trace_id = headers.get("x-trace-id", "")
+        if not (0 < len(trace_id) <= 64 and trace_id.replace("-", "").isalnum()):
+            trace_id = uuid.uuid4().hex
+
+        trace = Trace(trace_id=trace_id)
+        trace_token = _current_trace.set(trace)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-trace-id", trace_id.encode("latin-1"))]
+            await send(message)
+
+        profiler = None
+        if self._should_profile(headers):
+            # Imported lazily, profiling is off for almost every request
+            from app.core.profiling import RequestProfiler
+            profiler = RequestProfiler()
+            profiler.start()
+
+        start = time.perf_counter()
+        try:
+            with span("http_request", method=scope["method"], path=scope["path"]):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_trace.reset(trace_token)
+
+            directory = os.path.join(settings.PROFILE_DIR, trace_id)
+            if profiler:
+                profiler.stop()
+                await asyncio.to_thread(profiler.write, directory)
+            slow = settings.TRACE_SLOW_REQUEST_SECONDS and elapsed >= settings.TRACE_SLOW_REQUEST_SECONDS
+            if profiler or slow:
+                await asyncio.to_thread(write_trace, trace, directory)
+                if settings.DEBUG: print(f"** Wrote trace for {scope['method']} {scope['path']} ({elapsed:.2f}s) to {directory}")
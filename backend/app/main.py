@@ -1,12 +1,46 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import video_router, audio_router, summary_router, youtube_router
+from app.api.routes import video_router, audio_router, summary_router, youtube_router, mash_router, ffmpeg_router, metrics_router, storage_router, pipeline_router, export_router, jobs_router
+from app.core.container import container
 from app.core.config import settings
+from app.core.metrics import MetricsMiddleware
+from app.core.tracing import TracingMiddleware
+
+async def sweep_artifacts_periodically():
+    """Keep artifact directories within their quotas even when nothing is being written"""
+    storage = container.get("storage")
+    while True:
+        try:
+            await asyncio.to_thread(storage.sweep)
+        except Exception as e:
+            if settings.DEBUG: print(f"** Artifact sweep failed: {str(e)}")
+        await asyncio.sleep(settings.ARTIFACT_SWEEP_INTERVAL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Optionally build slow services (and import their SDKs) before the first request
+    if settings.WARM_UP_SERVICES:
+        await asyncio.to_thread(container.warm_up, settings.WARM_UP_SERVICES)
+
+    # Pick up YouTube uploads interrupted by the last shutdown or crash
+    container.get("upload_queue").resume_pending()
+
+    sweeper = asyncio.create_task(sweep_artifacts_periodically())
+
+    if settings.DEBUG:
+        container.print_import_report()
+    yield
+    sweeper.cancel()
+    container.get("storage").flush()
+    container.get("upload_queue").shutdown()
 
 app = FastAPI(
     title="AI Video Generator API",
     description="API for generating lip-synced videos and TikTok audio from content",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -18,8 +52,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record per-route request latency for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Added last so it is outermost and the trace covers the whole request
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(video_router.router, prefix="/api/v1", tags=["videos"])
 app.include_router(audio_router.router, prefix="/api/v1/audio", tags=["audio"]) 
 app.include_router(summary_router.router, prefix="/api/v1/summaries", tags=["summaries"])
-app.include_router(youtube_router.router, prefix="/api/v1/youtube", tags=["youtube"])
\ No newline at end of file
+app.include_router(youtube_router.router, prefix="/api/v1/youtube", tags=["youtube"])
+app.include_router(mash_router.router, prefix="/api/v1/mash", tags=["mash"])
+app.include_router(ffmpeg_router.router, prefix="/api/v1/ffmpeg", tags=["ffmpeg"])
+app.include_router(storage_router.router, prefix="/api/v1/storage", tags=["storage"])
+app.include_router(pipeline_router.router, prefix="/api/v1/pipeline", tags=["pipeline"])
+app.include_router(export_router.router, prefix="/api/v1/export", tags=["export"])
+app.include_router(jobs_router.router, prefix="/api/v1/jobs", tags=["jobs"])
+
+# Prometheus scrapes the conventional root path
+app.include_router(metrics_router.router, tags=["metrics"])
\ No newline at end of file
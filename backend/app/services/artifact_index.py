@@ -0,0 +1,58 @@
+import os
+import json
+import threading
+from typing import Dict, Optional
+from app.core.config import settings
+
+class ArtifactIndex:
+    """Persistent map of generation row id -> audio, video and combined artifact paths"""
+
+    KINDS = ("audio", "video", "combined")
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, str]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        """Load the index from disk, starting empty if it doesn't exist yet"""
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            if settings.DEBUG: print(f"** Ignoring unreadable artifact index {self.index_path}: {str(e)}")
+            return {}
+
+    def _save(self):
+        """Atomically write the index to disk (caller holds the lock)"""
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def register(self, row_id: int, kind: str, path: str):
+        """Record the artifact of a given kind for a row"""
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown artifact kind '{kind}', expected one of: {', '.join(self.KINDS)}")
+
+        with self._lock:
+            self._entries.setdefault(str(row_id), {})[kind] = str(path)
+            self._save()
+
+    def get(self, row_id: int) -> Dict[str, str]:
+        """Get all known artifacts for a row"""
+        with self._lock:
+            return dict(self._entries.get(str(row_id), {}))
+
+    def entries(self) -> Dict[str, Dict[str, str]]:
+        """Get a copy of the whole index"""
+        with self._lock:
+            return {row_id: dict(artifacts) for row_id, artifacts in self._entries.items()}
+
+    def get_path(self, row_id: int, kind: str) -> Optional[str]:
+        """Get the path of one artifact kind for a row, if registered"""
+        with self._lock:
+            return self._entries.get(str(row_id), {}).get(kind)
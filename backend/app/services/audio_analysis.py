@@ -0,0 +1,126 @@
+import os
+import base64
+import tempfile
+from dataclasses import dataclass
+from typing import List
+from app.core.config import settings
+from app.services.ffmpeg_service import FFmpegService, Priority
+
+@dataclass
+class AudioAnalysis:
+    """What the decoded samples of one audio file tell us (times in seconds, levels in dBFS)"""
+    duration: float
+    speech_start: float
+    speech_end: float
+    loudness_dbfs: float  # RMS level of the frames above the silence threshold
+    peak_dbfs: float
+    peaks: List[float]  # Max absolute amplitude per bucket between speech_start and speech_end, loudest = 1
+
+    @property
+    def silence(self) -> float:
+        """Leading plus trailing silence"""
+        return self.speech_start + (self.duration - self.speech_end)
+
+def _dbfs(amplitude):
+    import numpy as np
+    return 20 * np.log10(np.maximum(amplitude, 1e-10))
+
+async def decode_pcm(ffmpeg: FFmpegService, path: str, priority: Priority = Priority.INTERACTIVE):
+    """Decode a file to mono float32 samples at AUDIO_ANALYSIS_SAMPLE_RATE through the ffmpeg scheduler"""
+    import numpy as np
+
+    # The scheduler reads progress from stdout, so the PCM goes through a temporary file
+    fd, pcm_path = tempfile.mkstemp(suffix=".pcm")
+    os.close(fd)
+    try:
+        await ffmpeg.run([
+            '-y',
+            '-i', path,
+            '-map', '0:a:0',
+            '-ac', '1',
+            '-ar', str(settings.AUDIO_ANALYSIS_SAMPLE_RATE),
+            '-f', 's16le',
+            pcm_path
+        ], priority=priority)
+        return np.fromfile(pcm_path, dtype="<i2").astype(np.float32) / 32768.0
+    finally:
+        os.remove(pcm_path)
+
+def analyse_samples(samples, sample_rate: int) -> AudioAnalysis:
+    """
+    Silence bounds, levels and waveform peaks of mono samples in [-1, 1]
+
+    Samples are cut into AUDIO_ANALYSIS_FRAME_SECONDS frames and reduced to
+    an RMS envelope in one vectorised pass. Speech runs from the first to
+    the last frame above AUDIO_SILENCE_THRESHOLD_DB, widened by
+    AUDIO_TRIM_PADDING on each side so soft onsets aren't clipped.
+    """
+    import numpy as np
+
+    duration = len(samples) / sample_rate
+    frame = max(1, int(sample_rate * settings.AUDIO_ANALYSIS_FRAME_SECONDS))
+    frame_count = len(samples) // frame
+    if frame_count == 0:
+        return AudioAnalysis(duration, 0.0, duration, -200.0, -200.0, [])
+
+    frames = samples[:frame_count * frame].reshape(frame_count, frame)
+    power = np.mean(frames ** 2, axis=1)
+    voiced = _dbfs(np.sqrt(power)) > settings.AUDIO_SILENCE_THRESHOLD_DB
+    if not voiced.any():
+        return AudioAnalysis(duration, 0.0, duration, -200.0, float(_dbfs(np.abs(samples).max())), [])
+
+    first = int(np.argmax(voiced))
+    last = frame_count - int(np.argmax(voiced[::-1]))
+    speech_start = max(0.0, first * frame / sample_rate - settings.AUDIO_TRIM_PADDING)
+    speech_end = min(duration, last * frame / sample_rate + settings.AUDIO_TRIM_PADDING)
+
+    # Peaks of the part that is kept, padded with silence to a whole number of buckets
+    speech = np.abs(samples[int(speech_start * sample_rate):int(speech_end * sample_rate)])
+    bucket = max(1, -(-len(speech) // settings.AUDIO_PEAKS_COUNT))
+    padded = np.zeros(bucket * -(-len(speech) // bucket), dtype=np.float32)
+    padded[:len(speech)] = speech
+    peaks = padded.reshape(-1, bucket).max(axis=1)
+    # Normalised so quiet speech still uses the whole byte each peak is stored in
+    peaks = peaks / max(float(peaks.max()), 1e-10)
+
+    return AudioAnalysis(
+        duration=duration,
+        speech_start=speech_start,
+        speech_end=speech_end,
+        loudness_dbfs=float(_dbfs(np.sqrt(power[voiced].mean()))),
+        peak_dbfs=float(_dbfs(np.abs(samples).max())),
+        peaks=[round(float(peak), 4) for peak in peaks],
+    )
+
+# Stored instead of peaks for audio that was analysed but has none, e.g. silence,
+# since an empty cell means the audio hasn't been analysed yet
+NO_PEAKS = "-"
+
+def encode_peaks(peaks: List[float]) -> str:
+    """Pack peaks into one byte each, so a row carries ~270 characters instead of a JSON array"""
+    if not peaks:
+        return NO_PEAKS
+    return base64.b64encode(bytes(min(255, round(peak * 255)) for peak in peaks)).decode()
+
+def decode_peaks(encoded: str) -> List[float]:
+    if encoded == NO_PEAKS:
+        return []
+    return [round(value / 255, 4) for value in base64.b64decode(encoded)]
+
+def trim_command(path: str, output_path: str, start: float, end: float) -> List[str]:
+    """
+    Cut the audio stream to [start, end] without re-encoding
+
+    Stream copy can only cut on packet boundaries (about 24ms for TTS
+    MP3s), which is far finer than the padding kept around the speech, and
+    it avoids a lossy second encode.
+    """
+    return [
+        '-y',
+        '-ss', f"{start:.3f}",
+        '-i', path,
+        '-t', f"{end - start:.3f}",
+        '-map', '0:a:0',
+        '-c:a', 'copy',
+        output_path
+    ]
@@ -1,12 +1,18 @@
 import os
+import json
+import asyncio
 from pathlib import Path
-from typing import Optional
-from openai import OpenAI
-import instructor
+from typing import Dict, Optional
 from pydantic import BaseModel, Field
 from textwrap import dedent
 from app.core.config import settings
+from app.core.container import get_artifact_index, get_ffmpeg_service, get_job_events, get_storage_service
+from app.core.metrics import time_stage
+from app.core.rate_limit import limiter
+from app.core.tracing import current_trace_id
+from app.services.audio_analysis import NO_PEAKS, analyse_samples, decode_pcm, decode_peaks, encode_peaks, trim_command
 from app.services.csv_service import CSVManager
+from app.services.ffmpeg_service import Priority, summarize_streams
 
 class TranscriptResponse(BaseModel):
     """Model for the script generation response"""
@@ -22,7 +28,14 @@ class TranscriptResponse(BaseModel):
 
 class AudioService:
     def __init__(self):
-        self.client = instructor.patch(OpenAI(api_key=settings.OPENAI_API_KEY))
+        # Imported here so the SDKs only load when the service is first used
+        from openai import OpenAI
+        import instructor
+        import httpx
+
+        # Retries are left to the shared limiter, which also reads the rate-limit headers
+        http_client = httpx.Client(event_hooks={"response": [self._observe_rate_limits]})
+        self.client = instructor.patch(OpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0, http_client=http_client))
         
         self.audio_csv_headers = [
           "id",
@@ -32,42 +45,60 @@ class AudioService:
           "script",
           "status",
           "audio_path",  
+          "trace_id",
+          "duration",
+          "silence_trimmed",
+          "loudness_dbfs",
+          "peak_dbfs",
+          "peaks",
+          "created_at",
         ]
         self.csv_manager = CSVManager(settings.AUDIO_CSV_PATH, self.audio_csv_headers)
         self.output_dir = Path(settings.AUDIO_OUTPUT_DIR)
         os.makedirs(self.output_dir, exist_ok=True)
+        self._regeneration_locks: Dict[int, asyncio.Lock] = {}
+
+    def _observe_rate_limits(self, response):
+        """Feed OpenAI's x-ratelimit-* headers to the limiter bucket of the model that was called"""
+        try:
+            model = json.loads(response.request.content).get("model", "*")
+        except (ValueError, AttributeError):
+            model = "*"
+        limiter.observe_headers("openai", model, response.headers)
 
     async def generate_script(self, input_text: str) -> TranscriptResponse:
         """Generate a TikTok-optimized script from input text"""
         
         if settings.DEBUG: print(f"** Generating script for input text...")
         
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            response_model=TranscriptResponse,
-            messages=[
-                {
-                  "role": "system",
-                "content": "You are a specialized TikTok Audio Script Generator AI. Your purpose is to transform text into engaging, viral-worthy audio scripts optimized for TikTok's format. You must follow a specific format and always maintain high standards for creating attention-grabbing, shareable content."
-                },
-                {
-                  "role": "system",
-                "content": "Core Requirements:\n1. Always identify hooks that will grab attention in the first 3 seconds\n2. Create an amazing script for each input\n3. Each script must be at least 7-15 seconds long\n4. Follow the specified JSON output format exactly\n5. Focus on emotional impact and shareability"
-                },
-                  {
-                    "role": "user",
-                  "content": "Please provide TikTok-optimized audio scripts following this format for any input text I provide."
-                },
-                {
-                  "role": "assistant",
-                  "content": "I understand. For each text input I will generate an optimized and engaging script to be read out loud verbatim."
-                },
-                {
-                    "role": "user",
-                    "content": f"Generate TikTok-optimized audio recommendations from this text: {input_text}"
-                }
-            ]
-        )
+        with time_stage("openai_script"):
+            response = await limiter.acall(
+                "openai", "gpt-4", self.client.chat.completions.create,
+                model="gpt-4",
+                response_model=TranscriptResponse,
+                messages=[
+                    {
+                      "role": "system",
+                    "content": "You are a specialized TikTok Audio Script Generator AI. Your purpose is to transform text into engaging, viral-worthy audio scripts optimized for TikTok's format. You must follow a specific format and always maintain high standards for creating attention-grabbing, shareable content."
+                    },
+                    {
+                      "role": "system",
+                    "content": "Core Requirements:\n1. Always identify hooks that will grab attention in the first 3 seconds\n2. Create an amazing script for each input\n3. Each script must be at least 7-15 seconds long\n4. Follow the specified JSON output format exactly\n5. Focus on emotional impact and shareability"
+                    },
+                      {
+                        "role": "user",
+                      "content": "Please provide TikTok-optimized audio scripts following this format for any input text I provide."
+                    },
+                    {
+                      "role": "assistant",
+                      "content": "I understand. For each text input I will generate an optimized and engaging script to be read out loud verbatim."
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Generate TikTok-optimized audio recommendations from this text: {input_text}"
+                    }
+                ]
+            )
         
         if settings.DEBUG: print(f"** Finished generating script!")
         return response
@@ -80,21 +111,69 @@ class AudioService:
         if settings.DEBUG: print(f"** Audio file path: {audio_file}")
         
         if settings.DEBUG: print(f"** Generating audio...")
-        response = self.client.audio.speech.create(
-            model="tts-1",
-            voice=voice_type,
-            input=script.soundbite
-        )
+        with time_stage("openai_tts"):
+            response = await limiter.acall(
+                "openai", "tts-1", self.client.audio.speech.create,
+                model="tts-1",
+                voice=voice_type,
+                input=script.soundbite
+            )
         if settings.DEBUG: print(f"** Finished generating audio!")
 
         # Save the audio file
         if settings.DEBUG: print(f"** Saving audio file...")
         with open(audio_file, "wb") as f:
             f.write(response.content)
+        get_storage_service().record_write(str(audio_file))
         if settings.DEBUG: print(f"** Finished saving audio file!")
 
         return str(audio_file)
 
+    async def _probe_duration(self, audio_path: str, estimate: float) -> float:
+        """Stream copy cuts on packet boundaries, so ask the container for the exact result"""
+        try:
+            return summarize_streams(await get_ffmpeg_service().probe(audio_path))["duration"] or estimate
+        except Exception as e:
+            if settings.DEBUG: print(f"** Could not probe {audio_path}, estimating its duration: {str(e)}")
+            return estimate
+
+    async def analyse_audio(self, audio_path: str) -> dict:
+        """
+        Measure a generated file and cut its leading and trailing silence in place
+
+        The file is decoded to PCM once; silence bounds, levels and waveform
+        peaks all come from those samples. Returns the fields to store in
+        the generation row, or none if the file couldn't be analysed, in
+        which case it is left untouched.
+        """
+        ffmpeg = get_ffmpeg_service()
+        try:
+            with time_stage("audio_analysis"):
+                samples = await decode_pcm(ffmpeg, audio_path)
+                analysis = await asyncio.to_thread(analyse_samples, samples, settings.AUDIO_ANALYSIS_SAMPLE_RATE)
+
+            duration, trimmed = analysis.duration, 0.0
+            if analysis.silence >= settings.AUDIO_MIN_TRIM_SECONDS:
+                path = Path(audio_path)
+                trimmed_path = str(path.with_name(f"{path.stem}.trimmed{path.suffix}"))
+                await ffmpeg.run(trim_command(audio_path, trimmed_path, analysis.speech_start, analysis.speech_end), priority=Priority.INTERACTIVE)
+                os.replace(trimmed_path, audio_path)
+                get_storage_service().touch(audio_path)
+                duration = await self._probe_duration(audio_path, analysis.speech_end - analysis.speech_start)
+                trimmed = analysis.duration - duration
+        except Exception as e:
+            if settings.DEBUG: print(f"** Could not analyse {audio_path}, keeping it as is: {str(e)}")
+            return {}
+
+        if settings.DEBUG: print(f"** {audio_path}: {duration:.2f}s after trimming {trimmed:.2f}s of silence, {analysis.loudness_dbfs:.1f} dBFS")
+        return {
+            "duration": round(duration, 3),
+            "silence_trimmed": round(trimmed, 3),
+            "loudness_dbfs": round(analysis.loudness_dbfs, 2),
+            "peak_dbfs": round(analysis.peak_dbfs, 2),
+            "peaks": encode_peaks(analysis.peaks),
+        }
+
     async def process_text(self, input_text: str, voice_type: str = "nova") -> dict:
         """Process text through script generation and audio generation"""
         
@@ -103,8 +182,12 @@ class AudioService:
         row_id = self.csv_manager.append_rows({
             "input_text": input_text,
             "status": "pending",
-            "voice_type": voice_type
+            "voice_type": voice_type,
+            "trace_id": current_trace_id()
         })
+        row_id = int(row_id)
+        events = get_job_events()
+        events.publish("audio", row_id, "pending", 0.0)
 
         try:
             # Generate script
@@ -115,17 +198,23 @@ class AudioService:
                 "script": script.model_dump_json(),
                 "status": "script_generated"
             })
+            events.publish("audio", row_id, "script_generated", 0.4)
 
             # Generate audio
             if settings.DEBUG: print(f"** Generating audio...")
             audio_path = await self.generate_audio(script, voice_type)
             if settings.DEBUG: print(f"** Finished generating audio!")
+            events.publish("audio", row_id, "analysing", 0.8)
+            analysis = await self.analyse_audio(audio_path)
             
             # Update CSV with audio path
             self.csv_manager.update_row(row_id, {
                 "audio_path": audio_path,
-                "status": "completed"
+                "status": "completed",
+                **analysis
             })
+            get_artifact_index().register(row_id, "audio", audio_path)
+            events.publish("audio", row_id, "completed", 1.0, audio_path=audio_path, duration=analysis.get("duration"))
 
             return {
                 "id": row_id,
@@ -140,10 +229,107 @@ class AudioService:
             self.csv_manager.update_row(row_id, {
                 "status": f"error: {str(e)}"
             })
+            events.publish("audio", row_id, "error", error=str(e))
             raise e
 
+    def save_generation(
+        self,
+        input_text: str,
+        voice_type: str,
+        script: TranscriptResponse,
+        audio_path: str,
+        analysis: Optional[dict] = None
+    ) -> int:
+        """Record a script and audio generated outside `process_text` as a completed row and return its id"""
+        row_id = self.csv_manager.append_rows({
+            "input_text": input_text,
+            "status": "completed",
+            "voice_type": voice_type,
+            "script": script.model_dump_json(),
+            "audio_path": audio_path,
+            "trace_id": current_trace_id(),
+            **(analysis or {})
+        })
+        get_artifact_index().register(row_id, "audio", audio_path)
+        get_job_events().publish("audio", int(row_id), "completed", 1.0, audio_path=audio_path, duration=(analysis or {}).get("duration"))
+        return int(row_id)
+
+    def _existing_audio(self, row: Optional[dict]) -> Optional[str]:
+        audio_path = row.get("audio_path") if row else None
+        if isinstance(audio_path, str) and audio_path and os.path.isfile(audio_path):
+            return audio_path
+        return None
+
+    async def ensure_audio(self, row_id: int) -> Optional[str]:
+        """
+        Get the path of a row's audio, regenerating it if it was evicted
+
+        The script is kept in the CSV, so only the text-to-speech call is
+        repeated. Returns None if the row has no audio to give yet.
+        """
+        row = self.csv_manager.get_row(row_id)
+        if not row or self._existing_audio(row):
+            return self._existing_audio(row)
+
+        # Concurrent requests for the same evicted file regenerate it once
+        lock = self._regeneration_locks.setdefault(row_id, asyncio.Lock())
+        async with lock:
+            row = self.csv_manager.get_row(row_id)
+            if self._existing_audio(row):
+                return self._existing_audio(row)
+
+            script_json = row.get("script")
+            if row.get("status") != "completed" or not isinstance(script_json, str) or not script_json:
+                return None
+
+            if settings.DEBUG: print(f"** Audio for row {row_id} was evicted, regenerating...")
+            events = get_job_events()
+            events.publish("audio", row_id, "regenerating", 0.0)
+            voice_type = row.get("voice_type") if isinstance(row.get("voice_type"), str) else "nova"
+            try:
+                audio_path = await self.generate_audio(TranscriptResponse.model_validate_json(script_json), voice_type)
+                analysis = await self.analyse_audio(audio_path)
+            except Exception as e:
+                events.publish("audio", row_id, "error", error=str(e))
+                raise
+            finally:
+                self._regeneration_locks.pop(row_id, None)
+            self.csv_manager.update_row(row_id, {"audio_path": audio_path, **analysis})
+            get_artifact_index().register(row_id, "audio", audio_path)
+            events.publish("audio", row_id, "completed", 1.0, audio_path=audio_path, duration=analysis.get("duration"))
+            return audio_path
+
+    async def get_peaks(self, row_id: int) -> Optional[dict]:
+        """
+        Get a generation's duration and waveform peaks for drawing its waveform
+
+        Rows generated before audio analysis existed are analysed on first
+        request, if their audio is still on disk: evicted audio is not
+        regenerated just to draw it. Returns None if the row has no audio
+        to analyse.
+        """
+        row = self.csv_manager.get_row(row_id)
+        if not row:
+            return None
+
+        if not isinstance(row.get("peaks"), str) or not row["peaks"]:
+            audio_path = self._existing_audio(row)
+            if not audio_path:
+                return None
+            # A file that can't be analysed is marked too, so it isn't decoded again on every request
+            analysis = await self.analyse_audio(audio_path) or {"peaks": NO_PEAKS}
+            self.csv_manager.update_row(row_id, analysis)
+            row.update(analysis)
+
+        peaks = row.get("peaks")
+        duration = row.get("duration")
+        return {
+            "id": row_id,
+            # Empty cells come back from the CSV as NaN
+            "duration": duration if isinstance(duration, (int, float)) and duration == duration else None,
+            "peaks": decode_peaks(peaks) if isinstance(peaks, str) and peaks else [],
+        }
+
     async def get_audio_status(self, row_id: int) -> Optional[dict]:
         """Get the status of an audio generation request"""
         return self.csv_manager.get_row(row_id)
-
-audio_service = AudioService() 
\ No newline at end of file
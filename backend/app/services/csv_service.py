@@ -1,8 +1,26 @@
 import pandas as pd
 import os
-from typing import List, Dict, Any, Union
+import csv
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
 
 from app.core.config import settings
+from app.core.metrics import time_stage
+
+def unique_columns(header: List[str]) -> List[Tuple[int, str]]:
+    """
+    (index, name) of the columns in a CSV header, without duplicates
+
+    The generations CSV lists status twice. The first one is kept, and
+    the copy pandas renames to "status.1" after a rewrite is dropped.
+    """
+    columns = []
+    for index, name in enumerate(header):
+        base, _, suffix = name.rpartition(".")
+        if name in header[:index] or (suffix.isdigit() and base in header[:index]):
+            continue
+        columns.append((index, name))
+    return columns
 
 class CSVManager:
     def __init__(self, csv_path: str, headers: List[str]):
@@ -15,11 +33,18 @@ class CSVManager:
         if not os.path.exists(self.csv_path):
             os.makedirs(os.path.dirname(self.csv_path), exist_ok=True)
             df = pd.DataFrame(columns=headers)
-            df.to_csv(self.csv_path, index=False)
+            self._write(df)
+
+    def _write(self, df: pd.DataFrame):
+        """Atomically replace the CSV, so readers streaming the old file never see a half-written one"""
+        tmp_path = f"{self.csv_path}.tmp"
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.csv_path)
 
     def read_data(self) -> pd.DataFrame:
         """Read all data from CSV"""
-        return pd.read_csv(self.csv_path)
+        with time_stage("csv_read"):
+            return pd.read_csv(self.csv_path)
 
     def append_rows(self, data: Union[Dict[str, Any], List[Dict[str, Any]]]) -> int:
         """Append a new row to CSV and return its ID"""
@@ -41,11 +66,14 @@ class CSVManager:
           new_row.update({
             'id': next_id + i
           })
+          if 'created_at' in self.headers and not new_row['created_at']:
+            new_row['created_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
           new_rows.append(new_row)
       
         # Append to DataFrame and save
         df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
-        df.to_csv(self.csv_path, index=False)
+        with time_stage("csv_write"):
+            self._write(df)
         
         if settings.DEBUG: print(f"Appended {len(new_rows)} rows to CSV!")
       
@@ -60,10 +88,17 @@ class CSVManager:
         
         # Update the row
         for key, value in data.items():
-            if key in df.columns:
+            # Headers added since the file was created become columns on first write
+            if key in df.columns or key in self.headers:
+                if key not in df.columns:
+                    df[key] = pd.Series(dtype=object)
+                # Columns that are still empty are read back as float64, which can't hold strings
+                if isinstance(value, str) and df[key].dtype != object:
+                    df[key] = df[key].astype(object)
                 df.loc[df['id'] == int(row_id), key] = value
         
-        df.to_csv(self.csv_path, index=False)
+        with time_stage("csv_write"):
+            self._write(df)
         return True
 
     def get_row(self, row_id: int) -> Dict[str, Any]:
@@ -80,5 +115,48 @@ class CSVManager:
         """Get all rows with pending status"""
         df = self.read_data()
         pending = df[df['status'] == 'pending']
-        return pending.to_dict('records') 
-    
+        return pending.to_dict('records')
+
+    def read_columns(self) -> List[str]:
+        """Column names from the file's header, which may differ from the headers it was opened with"""
+        with open(self.csv_path, newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f), [])
+        return [name for _, name in unique_columns(header)]
+
+    def iter_records(self, offset: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, str]]]:
+        """
+        Stream rows as (byte offset of the row, row) without loading the file
+
+        Values are the raw CSV strings. Starts at `offset`, which must be
+        the offset of a row, or at the first row. Memory use is one row
+        regardless of the file size.
+        """
+        with open(self.csv_path, "rb") as f:
+            position = [0]
+
+            def lines():
+                # csv.reader pulls one line at a time, so `position` is exact between rows
+                for line in f:
+                    position[0] += len(line)
+                    yield line.decode("utf-8")
+
+            reader = csv.reader(lines())
+            header = next(reader, None)
+            if header is None:
+                return
+
+            columns = unique_columns(header)
+
+            if offset is not None and offset > position[0]:
+                f.seek(offset)
+                position[0] = offset
+                reader = csv.reader(lines())
+
+            while True:
+                start = position[0]
+                row = next(reader, None)
+                if row is None:
+                    return
+                if not row:
+                    continue
+                yield start, {name: row[index] if index < len(row) else "" for index, name in columns}
@@ -0,0 +1,195 @@
+import io
+import os
+import csv
+import json
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from app.services.csv_service import CSVManager
+
+# Columns exported as numbers rather than strings
+NUMERIC_COLUMNS = {
+    "generations": {"duration", "silence_trimmed", "loudness_dbfs", "peak_dbfs"},
+    "summaries": set(),
+}
+
+class ExportError(ValueError):
+    """Raised for an unknown dataset, a filter the dataset can't apply or a malformed cursor"""
+
+def _parse_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        row_id, offset = cursor.split(":")
+        return int(row_id), int(offset)
+    except ValueError:
+        raise ExportError(f"Malformed cursor '{cursor}'")
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+def _row_id(row: Dict[str, str]) -> Optional[int]:
+    try:
+        return int(float(row["id"]))
+    except (KeyError, ValueError):
+        return None
+
+class Export:
+    """
+    One filtered pass over a dataset's CSV, resumable from a cursor
+
+    Every exported row carries a `cursor` ("<id>:<byte offset>"). Passing
+    the last one received back starts the next export right after that
+    row: the offset lets it seek straight there, and if the file has been
+    rewritten since, rows are skipped by id instead.
+    """
+
+    def __init__(
+        self,
+        dataset: str,
+        manager: "CSVManager",
+        columns: List[str],
+        status: Optional[str] = None,
+        source: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None
+    ):
+        self.dataset = dataset
+        self.manager = manager
+        self.columns = columns
+        self.numeric = NUMERIC_COLUMNS[dataset]
+        self.limit = limit
+        self.filters = {"status": status, "source": source}
+        for column, value in self.filters.items():
+            if value is not None and column not in columns:
+                raise ExportError(f"The {dataset} export has no {column} column to filter on")
+        if created_after is not None and created_after.tzinfo is None:
+            created_after = created_after.replace(tzinfo=timezone.utc)
+        self.created_after = created_after
+        self.cursor = _parse_cursor(cursor) if cursor else None
+
+    def _matches(self, row: Dict[str, str]) -> bool:
+        if self.filters["status"] is not None and row["status"] != self.filters["status"]:
+            return False
+        # Sources are PDF paths, so the file name alone also matches
+        source = self.filters["source"]
+        if source is not None and source not in (row["source"], os.path.basename(row["source"])):
+            return False
+        if self.created_after is not None:
+            # Rows written before created_at was recorded have no timestamp and never match
+            created_at = _parse_timestamp(row.get("created_at", ""))
+            if created_at is None or created_at <= self.created_after:
+                return False
+        return True
+
+    def _after_cursor(self) -> Iterator[Tuple[int, Dict[str, str]]]:
+        """Rows following the cursor's row, or every row without a cursor"""
+        if self.cursor is None:
+            yield from self.manager.iter_records()
+            return
+
+        cursor_id, offset = self.cursor
+        records = self.manager.iter_records(offset)
+        try:
+            first = next(records, None)
+        except (csv.Error, UnicodeDecodeError):
+            # The offset now falls inside a row
+            first = None
+        if first is not None and first[0] == offset and _row_id(first[1]) == cursor_id:
+            yield from records
+            return
+        records.close()
+
+        if settings.DEBUG: print(f"** Export cursor {cursor_id}:{offset} is stale, skipping rows by id...")
+        for record in self.manager.iter_records():
+            row_id = _row_id(record[1])
+            if row_id is not None and row_id > cursor_id:
+                yield record
+
+    def _typed(self, row: Dict[str, str]) -> dict:
+        typed = {}
+        for column in self.columns:
+            value = row.get(column, "")
+            if value == "":
+                typed[column] = None
+            elif column == "id":
+                typed[column] = int(float(value))
+            elif column in self.numeric:
+                typed[column] = float(value)
+            else:
+                typed[column] = value
+        return typed
+
+    def rows(self) -> Iterator[dict]:
+        """Matching rows with their resume cursor"""
+        exported = 0
+        for offset, row in self._after_cursor():
+            if self.limit is not None and exported >= self.limit:
+                return
+            if _row_id(row) is None or not self._matches(row):
+                continue
+            typed = self._typed(row)
+            typed["cursor"] = f"{typed['id']}:{offset}"
+            exported += 1
+            yield typed
+
+    def _batched(self, lines: Iterator[str]) -> Iterator[str]:
+        """Join lines into chunks of about EXPORT_CHUNK_BYTES, so each write to the socket isn't one row"""
+        batch, size = [], 0
+        for line in lines:
+            batch.append(line)
+            size += len(line)
+            if size >= settings.EXPORT_CHUNK_BYTES:
+                yield "".join(batch)
+                batch, size = [], 0
+        if batch:
+            yield "".join(batch)
+
+    def ndjson(self) -> Iterator[str]:
+        return self._batched(json.dumps(row) + "\n" for row in self.rows())
+
+    def csv(self) -> Iterator[str]:
+        columns = self.columns + ["cursor"]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for row in self.rows():
+            writer.writerow(["" if row[column] is None else row[column] for column in columns])
+            if buffer.tell() >= settings.EXPORT_CHUNK_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+class ExportService:
+    """
+    Streaming exports of the summaries and audio generations CSVs
+
+    Rows are read and written one at a time, so an export of any size runs
+    in constant memory, unlike CSVManager.read_data which loads the whole
+    file into pandas.
+    """
+
+    def __init__(self):
+        self.datasets = {
+            "summaries": settings.SUMMARIES_CSV_PATH,
+            "generations": settings.AUDIO_CSV_PATH,
+        }
+
+    def open(self, dataset: str, **filters) -> Export:
+        """Validate an export's dataset, filters and cursor before anything is streamed"""
+        if dataset not in self.datasets:
+            raise ExportError(f"Unknown dataset '{dataset}', expected one of: {', '.join(self.datasets)}")
+        path = self.datasets[dataset]
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No {dataset} have been recorded yet")
+
+        # csv_service imports pandas, which the export itself never needs
+        from app.services.csv_service import CSVManager
+        manager = CSVManager(path, [])
+        return Export(dataset, manager, manager.read_columns(), **filters)
@@ -0,0 +1,281 @@
+import os
+import json
+import heapq
+import time
+import uuid
+import asyncio
+import itertools
+import contextvars
+from enum import IntEnum
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from app.core.config import settings
+from app.core.metrics import observe_stage
+
+class Priority(IntEnum):
+    """Scheduling class of an ffmpeg job, lower values run first"""
+    INTERACTIVE = 0  # A request handler is waiting on it, e.g. a mux
+    BATCH = 1  # Bulk work, e.g. transcoding a directory
+
+class FFmpegError(RuntimeError):
+    """Raised when an ffmpeg or ffprobe process fails or is cancelled"""
+
+@dataclass
+class FFmpegJob:
+    id: str
+    args: List[str]
+    priority: Priority
+    slots: int
+    duration: Optional[float] = None
+    on_progress: Optional[Callable[["FFmpegJob"], None]] = field(default=None, repr=False)
+    status: str = "queued"
+    progress: Dict[str, str] = field(default_factory=dict)
+    returncode: Optional[int] = None
+    stderr: str = ""
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    _process: Optional[asyncio.subprocess.Process] = field(default=None, repr=False)
+    _done: Optional[asyncio.Future] = field(default=None, repr=False)
+    _context: Optional[contextvars.Context] = field(default=None, repr=False)
+
+    @property
+    def percent(self) -> Optional[float]:
+        """Completion percentage, when the input duration is known"""
+        if self.status == "completed":
+            return 100.0
+        out_time_us = self.progress.get("out_time_us")
+        if not self.duration or not out_time_us or not out_time_us.isdigit():
+            return None
+        return min(100.0, int(out_time_us) / 1_000_000 / self.duration * 100)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.priority.name.lower(),
+            "slots": self.slots,
+            "percent": self.percent,
+            "speed": self.progress.get("speed"),
+            "returncode": self.returncode,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    async def wait(self) -> "FFmpegJob":
+        """Wait for the job to finish, raising FFmpegError if it failed or was cancelled"""
+        await asyncio.shield(self._done)
+        if self.status != "completed":
+            raise FFmpegError(f"FFmpeg job {self.id} {self.status}: {self.stderr[-2000:]}")
+        return self
+
+class FFmpegService:
+    """
+    Run ffmpeg processes through a CPU-slot scheduler
+
+    Each job reserves as many slots as the threads it is allowed to use, so
+    the total never exceeds the CPU count. Interactive jobs are dispatched
+    before batch jobs, and batch jobs can't take the slots reserved for
+    interactive work. All scheduling happens on the event loop thread.
+    """
+
+    def __init__(self, total_slots: Optional[int] = None, interactive_reserved_slots: Optional[int] = None):
+        self.total_slots = total_slots or settings.FFMPEG_CPU_SLOTS or os.cpu_count() or 1
+        reserved = settings.FFMPEG_INTERACTIVE_RESERVED_SLOTS if interactive_reserved_slots is None else interactive_reserved_slots
+        self.interactive_reserved_slots = min(reserved, self.total_slots - 1)
+        self._used_slots = 0
+        self._queue: list = []
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, FFmpegJob] = {}
+        self._tasks: set = set()
+
+    def submit(
+        self,
+        args: List[str],
+        priority: Priority = Priority.BATCH,
+        threads: int = 1,
+        duration: Optional[float] = None,
+        on_progress: Optional[Callable[[FFmpegJob], None]] = None
+    ) -> FFmpegJob:
+        """Queue an ffmpeg invocation (arguments without the leading 'ffmpeg')"""
+        job = FFmpegJob(
+            id=uuid.uuid4().hex,
+            args=list(args),
+            priority=priority,
+            slots=max(1, min(threads, self.total_slots)),
+            duration=duration,
+            on_progress=on_progress,
+            # The job runs in the submitter's context so its spans join the submitter's trace
+            _context=contextvars.copy_context(),
+        )
+        job._done = asyncio.get_running_loop().create_future()
+        self._jobs[job.id] = job
+        heapq.heappush(self._queue, (job.priority, next(self._sequence), job))
+        self._dispatch()
+        return job
+
+    async def run(
+        self,
+        args: List[str],
+        priority: Priority = Priority.BATCH,
+        threads: int = 1,
+        duration: Optional[float] = None,
+        on_progress: Optional[Callable[[FFmpegJob], None]] = None
+    ) -> FFmpegJob:
+        """Submit an ffmpeg job and wait for it, cancelling it if the caller is cancelled"""
+        job = self.submit(args, priority, threads, duration, on_progress)
+        try:
+            return await job.wait()
+        except asyncio.CancelledError:
+            await self.cancel(job.id)
+            raise
+
+    def get_job(self, job_id: str) -> Optional[FFmpegJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[FFmpegJob]:
+        return list(self._jobs.values())
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job"""
+        job = self._jobs.get(job_id)
+        if not job or job.status not in ("queued", "running"):
+            return False
+
+        if job.status == "queued":
+            self._queue = [entry for entry in self._queue if entry[2] is not job]
+            heapq.heapify(self._queue)
+            self._finish(job, "cancelled")
+            return True
+
+        # Running: mark first so the runner doesn't report it as a failure
+        job.status = "cancelled"
+        if job._process and job._process.returncode is None:
+            job._process.terminate()
+        return True
+
+    def _slots_available(self, job: FFmpegJob) -> bool:
+        limit = self.total_slots
+        if job.priority != Priority.INTERACTIVE:
+            limit -= self.interactive_reserved_slots
+        # A job larger than the limit may still run alone rather than starve
+        return self._used_slots + job.slots <= limit or self._used_slots == 0
+
+    def _dispatch(self):
+        """Start queued jobs in priority order while slots are free"""
+        while self._queue:
+            _, _, job = self._queue[0]
+            if not self._slots_available(job):
+                break
+            heapq.heappop(self._queue)
+            self._used_slots += job.slots
+            job.status = "running"
+            job.started_at = time.time()
+            task = job._context.run(asyncio.get_running_loop().create_task, self._execute(job))
+            # Hold a reference so the runner isn't garbage collected mid-flight
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _finish(self, job: FFmpegJob, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        if job.started_at:
+            observe_stage("ffmpeg_queue_wait", job.started_at - job.created_at)
+            observe_stage("ffmpeg", job.finished_at - job.started_at)
+        if job.on_progress:
+            job.on_progress(job)
+        if not job._done.done():
+            job._done.set_result(job)
+        self._prune()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the retention limit"""
+        finished = [job for job in self._jobs.values() if job.finished_at]
+        for job in sorted(finished, key=lambda j: j.finished_at)[:-settings.FFMPEG_JOB_HISTORY or None]:
+            del self._jobs[job.id]
+
+    async def _read_progress(self, job: FFmpegJob, stream: asyncio.StreamReader):
+        """Parse key=value blocks written by -progress pipe:1"""
+        block = {}
+        async for raw_line in stream:
+            key, _, value = raw_line.decode(errors="replace").strip().partition("=")
+            if not key:
+                continue
+            block[key] = value
+            if key == "progress":
+                job.progress = {**job.progress, **block}
+                block = {}
+                if job.on_progress:
+                    job.on_progress(job)
+
+    async def _read_stderr(self, job: FFmpegJob, stream: asyncio.StreamReader):
+        chunks = []
+        async for line in stream:
+            chunks.append(line.decode(errors="replace"))
+            # Keep only the tail, ffmpeg logs can be large
+            if len(chunks) > 200:
+                del chunks[:100]
+        job.stderr = "".join(chunks)
+
+    async def _execute(self, job: FFmpegJob):
+        cmd = ["ffmpeg", "-hide_banner", "-nostats", "-progress", "pipe:1", *job.args]
+        try:
+            if settings.DEBUG: print(f"** Starting ffmpeg job {job.id} ({job.priority.name.lower()}, {job.slots} slot(s))...")
+            job._process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            await asyncio.gather(
+                self._read_progress(job, job._process.stdout),
+                self._read_stderr(job, job._process.stderr)
+            )
+            job.returncode = await job._process.wait()
+
+            if job.status == "cancelled":
+                status = "cancelled"
+            else:
+                status = "completed" if job.returncode == 0 else "failed"
+        except Exception as e:
+            job.stderr += str(e)
+            status = "cancelled" if job.status == "cancelled" else "failed"
+        finally:
+            self._used_slots -= job.slots
+            job._process = None
+
+        if settings.DEBUG: print(f"** FFmpeg job {job.id} {status}")
+        self._finish(job, status)
+        self._dispatch()
+
+    async def probe(self, path: str) -> dict:
+        """Run ffprobe on a file and return its streams and format as a dict"""
+        process = await asyncio.create_subprocess_exec(
+            "ffprobe",
+            "-v", "error",
+            "-show_entries", "stream=codec_type,codec_name,pix_fmt,width,height:format=duration",
+            "-of", "json",
+            path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise FFmpegError(stderr.decode(errors="replace").strip() or f"ffprobe failed on {path}")
+        return json.loads(stdout)
+
+def summarize_streams(probe: dict) -> dict:
+    """Reduce ffprobe output to the first video/audio codecs, the video size and the duration"""
+    streams = probe.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+    duration = probe.get("format", {}).get("duration")
+    return {
+        "video_codec": video.get("codec_name"),
+        "pix_fmt": video.get("pix_fmt"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "audio_codec": audio.get("codec_name"),
+        "duration": float(duration) if duration not in (None, "N/A") else None,
+    }
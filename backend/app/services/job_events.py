@@ -0,0 +1,120 @@
+import time
+import asyncio
+import fnmatch
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Set
+from app.core.config import settings
+
+class Subscription:
+    """
+    One client's view of the hub: the job ids it follows and a queue of their events
+
+    Patterns are job ids, or globs such as "audio:*" to follow every job of
+    a kind, including ones that don't exist yet. When a slow client's queue
+    is full the oldest event is dropped, since later events of the same job
+    supersede it.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.patterns: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.JOB_EVENTS_QUEUE_SIZE)
+        self.dropped = 0
+
+    def matches(self, job: str) -> bool:
+        return any(job == pattern or fnmatch.fnmatchcase(job, pattern) for pattern in self.patterns)
+
+    def _put(self, event: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    def push(self, event: dict):
+        """Queue an event from any thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The client's event loop has closed
+            pass
+
+class JobEventHub:
+    """
+    In-process publish/subscribe for job state transitions and progress
+
+    Services publish from the event loop or from worker threads. The last
+    event of the JOB_EVENTS_HISTORY most recently updated jobs is kept, so
+    a client that subscribes late gets the current state at once instead
+    of reading it back from the CSV or the upload jobs file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest: "OrderedDict[str, dict]" = OrderedDict()
+        self._subscriptions: Set[Subscription] = set()
+
+    def publish(self, kind: str, job_id, status: str, progress: Optional[float] = None, **data) -> dict:
+        """Record a job's new state and push it to every subscriber following the job"""
+        job = f"{kind}:{job_id}"
+        event = {
+            "job": job,
+            "kind": kind,
+            "id": str(job_id),
+            "status": status,
+            "progress": round(progress, 4) if progress is not None else None,
+            "data": data,
+            "at": time.time(),
+        }
+        with self._lock:
+            self._latest[job] = event
+            self._latest.move_to_end(job)
+            while len(self._latest) > settings.JOB_EVENTS_HISTORY:
+                self._latest.popitem(last=False)
+            subscriptions = [subscription for subscription in self._subscriptions if subscription.matches(job)]
+
+        for subscription in subscriptions:
+            subscription.push(event)
+        return event
+
+    def latest(self, job: str) -> Optional[dict]:
+        with self._lock:
+            return self._latest.get(job)
+
+    def subscribe(self, subscription: Subscription, patterns: Iterable[str]) -> int:
+        """
+        Follow more jobs, queueing the current state of the matching ones first
+
+        The snapshot is queued under the same lock publish takes, so every
+        live event for those jobs is queued after it and a client never
+        ends up on an older state than the latest. Returns how many jobs
+        the snapshot covered.
+        """
+        patterns = set(patterns)
+        with self._lock:
+            subscription.patterns |= patterns
+            self._subscriptions.add(subscription)
+            snapshot = [
+                event for job, event in self._latest.items()
+                if any(job == pattern or fnmatch.fnmatchcase(job, pattern) for pattern in patterns)
+            ]
+            for event in snapshot:
+                subscription.push(event)
+        return len(snapshot)
+
+    def unsubscribe(self, subscription: Subscription, patterns: Optional[Iterable[str]] = None):
+        """Stop following some jobs, or all of them when no patterns are given"""
+        with self._lock:
+            if patterns is None:
+                subscription.patterns.clear()
+            else:
+                subscription.patterns -= set(patterns)
+            if not subscription.patterns:
+                self._subscriptions.discard(subscription)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscriptions": len(self._subscriptions),
+                "jobs": len(self._latest),
+            }
@@ -1,74 +1,135 @@
 import os
+import uuid
+import asyncio
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
-from openai import OpenAI
-import instructor
-from pydantic import BaseModel, Field
-from textwrap import dedent
+from typing import Dict, List, Optional, Tuple
 from app.core.config import settings
-from app.services.csv_service import CSVManager
-import re
+from app.core.container import get_artifact_index, get_audio_service, get_ffmpeg_service, get_preview_service, get_storage_service
+from app.services.ffmpeg_service import summarize_streams, Priority
+
+class VideoPathError(ValueError):
+    """Raised for a video outside the directories videos may be registered from"""
 
 class MashService:
     def __init__(self):
-        self.client = instructor.patch(OpenAI(api_key=settings.OPENAI_API_KEY))
-        
-        self.mash_csv_headers = [
-          "id",
-          "status",
-          "script",
-          "status",
-          "audio_path",
-          "video_path"  
-        ]
-        self.csv_manager = CSVManager(settings.SUMMARIES_CSV_PATH, self.mash_csv_headers)
+        self.index = get_artifact_index()
+        self.ffmpeg = get_ffmpeg_service()
         self.output_dir = Path(settings.OUTPUT_DIR)
 
         os.makedirs(self.output_dir, exist_ok=True)
-    
-    def locate_files_to_mash(self, row_id: int):
-        import os
-        import glob
-        
- 
-        base_dir = "../../"  # You'll need to set this
-        
-     
-        audio_pattern = os.path.join(base_dir, f"speech_*_row_{row_id}")
-        video_pattern = os.path.join(base_dir, f"video_*_row_{row_id}")
-        
-        # Find matching files
-        audio_matches = glob.glob(audio_pattern)
-        video_matches = glob.glob(video_pattern)
-        
-        if not audio_matches or not video_matches:
+
+    def register_video(self, row_id: int, video_path: str):
+        """
+        Attach a video to a generation row so it can be mashed with its audio
+
+        Only uploaded and generated videos may be registered: the combined
+        file is served for download, so any other path would let a client
+        read arbitrary files off the server.
+        """
+        real_path = os.path.realpath(video_path)
+        allowed = [os.path.realpath(directory) for directory in (settings.OUTPUT_DIR, settings.UPLOAD_DIR)]
+        if not any(os.path.commonpath([real_path, directory]) == directory for directory in allowed):
+            raise VideoPathError(f"Videos must be in {settings.OUTPUT_DIR} or {settings.UPLOAD_DIR}")
+        if not os.path.isfile(real_path):
+            raise ValueError(f"Video file not found at path: {video_path}")
+        self.index.register(row_id, "video", real_path)
+
+    def _locate_audio(self, row_id: int) -> Optional[str]:
+        """Find a row's audio, falling back to the generations CSV for rows indexed before the index existed"""
+        audio_path = self.index.get_path(row_id, "audio")
+        if audio_path:
+            return audio_path
+
+        row = get_audio_service().csv_manager.get_row(row_id)
+        audio_path = row.get("audio_path") if row else None
+        if isinstance(audio_path, str) and audio_path:
+            self.index.register(row_id, "audio", audio_path)
+            return audio_path
+        return None
+
+    def locate_files_to_mash(self, row_id: int) -> Tuple[str, str]:
+        """Look up the audio and video artifacts for a row"""
+        audio_path = self._locate_audio(row_id)
+        video_path = self.index.get_path(row_id, "video")
+
+        if not audio_path or not video_path:
             raise ValueError(f"Could not find matching audio/video files for row_id {row_id}")
-        
-        # Take the first match if multiple exist
-        audio_path = audio_matches[0]
-        video_path = video_matches[0]
-        
+
+        for path in (audio_path, video_path):
+            if not os.path.isfile(path):
+                raise ValueError(f"Indexed file {path} for row_id {row_id} no longer exists")
+
         return audio_path, video_path
 
-    def mash_audio_video(row_id: int) -> str:
+    async def _probe_audio_codec(self, path: str) -> Optional[str]:
+        """Get the codec of the first audio stream in a file"""
+        try:
+            return summarize_streams(await self.ffmpeg.probe(path))["audio_codec"]
+        except Exception as e:
+            if settings.DEBUG: print(f"** Could not probe {path}: {str(e)}")
+            return None
 
-        audio_path, video_path = locate_files_to_mash(row_id)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_filename = f"combined_video_{row_id}_{timestamp}.mp4"
-        
+    def build_mash_command(self, video_path: str, audio_path: str, output_path: str, audio_codec: Optional[str]) -> List[str]:
+        """Build the ffmpeg mux arguments, copying the audio stream when it is already AAC"""
         cmd = [
-            'ffmpeg',
             '-y',
             '-i', video_path,
             '-i', audio_path,
+            '-map', '0:v:0',
+            '-map', '1:a:0',
             '-c:v', 'copy',
-            '-c:a', 'aac',
-            output_filename
         ]
-        
-        try:
-            subprocess.run(cmd, check=True, capture_output=True)
-            return output_filename
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"FFmpeg failed: {e.stderr.decode()}") from e
\ No newline at end of file
+        if audio_codec == 'aac':
+            cmd += ['-c:a', 'copy']
+        else:
+            cmd += ['-c:a', 'aac', '-b:a', '128k']
+        cmd += [
+            '-shortest',
+            '-movflags', '+faststart',
+            output_path
+        ]
+        return cmd
+
+    async def mash_audio_video(self, row_id: int, priority: Priority = Priority.INTERACTIVE) -> str:
+        """Combine a row's video and audio into a single MP4 and return its path"""
+        # The TTS audio may have been evicted to free disk space; it can be regenerated
+        indexed_audio = self._locate_audio(row_id)
+        if indexed_audio and not os.path.isfile(indexed_audio):
+            await get_audio_service().ensure_audio(row_id)
+
+        audio_path, video_path = self.locate_files_to_mash(row_id)
+        storage = get_storage_service()
+        storage.touch(audio_path)
+        storage.touch(video_path)
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # The same row can be mashed twice within a second, so the name alone must not collide
+        output_path = str(self.output_dir / f"combined_video_{row_id}_{timestamp}_{uuid.uuid4().hex[:8]}.mp4")
+
+        audio_codec = await self._probe_audio_codec(audio_path)
+        cmd = self.build_mash_command(video_path, audio_path, output_path, audio_codec)
+
+        audio_mode = "copying" if audio_codec == 'aac' else "transcoding"
+        if settings.DEBUG: print(f"** Mashing row {row_id} into {output_path} ({audio_mode} audio)...")
+        await self.ffmpeg.run(cmd, priority=priority)
+
+        self.index.register(row_id, "combined", output_path)
+        storage.record_write(output_path)
+        get_preview_service().schedule(output_path)
+        return output_path
+
+    async def mash_rows(self, row_ids: List[int]) -> Dict[int, dict]:
+        """Mash many rows concurrently (bounded by the ffmpeg scheduler) and return a result per row"""
+        outcomes = await asyncio.gather(
+            *(self.mash_audio_video(row_id, priority=Priority.BATCH) for row_id in row_ids),
+            return_exceptions=True
+        )
+
+        results = {}
+        for row_id, outcome in zip(row_ids, outcomes):
+            if isinstance(outcome, BaseException):
+                results[row_id] = {"status": f"error: {str(outcome)}", "combined_path": None}
+            else:
+                results[row_id] = {"status": "completed", "combined_path": outcome}
+        return results
@@ -0,0 +1,89 @@
+import os
+import hashlib
+import asyncio
+from typing import Dict, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from app.core.config import settings
+from app.core.container import get_storage_service
+
+class MediaService:
+    """Serve generated media with strong ETags, conditional GETs and byte ranges"""
+
+    def __init__(self):
+        # (path, mtime_ns, size) -> content hash, so each file is hashed once per version
+        self._hash_cache: Dict[Tuple[str, int, int], str] = {}
+
+    def _hash_file(self, path: str) -> str:
+        """Compute the SHA-256 of a file in fixed-size chunks"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(settings.MEDIA_HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    async def get_content_hash(self, path: str, stat_result: Optional[os.stat_result] = None) -> str:
+        """Get the content hash of a file, hashing it off the event loop on a cache miss"""
+        stat_result = stat_result or os.stat(path)
+        key = (os.path.abspath(path), stat_result.st_mtime_ns, stat_result.st_size)
+
+        content_hash = self._hash_cache.get(key)
+        if content_hash is None:
+            if settings.DEBUG: print(f"** Hashing media file {path}...")
+            content_hash = await asyncio.to_thread(self._hash_file, path)
+            self._hash_cache[key] = content_hash
+
+        return content_hash
+
+    def _etag_matches(self, if_none_match: str, etag: str) -> bool:
+        """Check an If-None-Match header against an ETag"""
+        if if_none_match.strip() == "*":
+            return True
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison is what RFC 9110 prescribes for If-None-Match
+        return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+    async def serve(
+        self,
+        request: Request,
+        path: str,
+        media_type: str,
+        filename: Optional[str] = None,
+        version: Optional[str] = None
+    ) -> Response:
+        """
+        Build a response for a media file
+
+        Range requests are answered with 206 by FileResponse, a matching
+        If-None-Match is answered with 304, and requests whose `v` query
+        parameter equals `version`, by default the file's content hash,
+        are treated as immutable.
+        """
+        stat_result = os.stat(path)
+        content_hash = await self.get_content_hash(path, stat_result)
+        # Recently downloaded files are the last to be evicted
+        get_storage_service().touch(path)
+        etag = f'"{content_hash}"'
+
+        if request.query_params.get("v") == (version or content_hash):
+            cache_control = f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable"
+        else:
+            # Unversioned URLs can be overwritten in place, so always revalidate
+            cache_control = "no-cache"
+
+        headers = {
+            "etag": etag,
+            "cache-control": cache_control,
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and self._etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        return FileResponse(
+            path,
+            media_type=media_type,
+            filename=filename,
+            headers=headers,
+            stat_result=stat_result
+        )
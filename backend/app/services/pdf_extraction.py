@@ -0,0 +1,150 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Type
+from app.core.config import settings
+
+# PDFium keeps global state and isn't thread-safe, so calls into it from different threads are serialised
+_PDFIUM_LOCK = threading.Lock()
+
+class PDFExtractor(ABC):
+    """
+    Extracts the text of a PDF's pages, one page at a time
+
+    Use as a context manager so the document is closed afterwards. Page
+    indexes start at 0.
+    """
+
+    name = ""
+
+    def __init__(self, pdf_path: str):
+        self.pdf_path = pdf_path
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of pages"""
+
+    @abstractmethod
+    def extract_text(self, index: int) -> str:
+        """Text of one page"""
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> "PDFExtractor":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class PdfiumExtractor(PDFExtractor):
+    """Plain text straight from PDFium's text layer, in content-stream order"""
+
+    name = "pypdfium2"
+
+    def __init__(self, pdf_path: str):
+        super().__init__(pdf_path)
+        import pypdfium2
+        import pypdfium2.raw as pdfium_c
+
+        self._path_type = pdfium_c.FPDF_PAGEOBJ_PATH
+        with _PDFIUM_LOCK:
+            self.pdf = pypdfium2.PdfDocument(pdf_path)
+            self._pages = len(self.pdf)
+
+    def __len__(self) -> int:
+        return self._pages
+
+    def extract_text(self, index: int) -> str:
+        with _PDFIUM_LOCK:
+            page = self.pdf[index]
+            textpage = page.get_textpage()
+            try:
+                text = textpage.get_text_range()
+            finally:
+                textpage.close()
+                page.close()
+        return text.replace("\r\n", "\n")
+
+    def ruling_lines(self, index: int) -> int:
+        """Count the page's path objects, which on Hansard pages are almost only table rules"""
+        with _PDFIUM_LOCK:
+            page = self.pdf[index]
+            try:
+                return sum(1 for _ in page.get_objects(filter=(self._path_type,)))
+            finally:
+                page.close()
+
+    def close(self):
+        with _PDFIUM_LOCK:
+            self.pdf.close()
+
+class PdfplumberExtractor(PDFExtractor):
+    """Layout-aware text from pdfplumber, which rebuilds table rows by position but is much slower"""
+
+    name = "pdfplumber"
+
+    def __init__(self, pdf_path: str):
+        super().__init__(pdf_path)
+        import pdfplumber
+
+        self.pdf = pdfplumber.open(pdf_path)
+
+    def __len__(self) -> int:
+        return len(self.pdf.pages)
+
+    def extract_text(self, index: int) -> str:
+        page = self.pdf.pages[index]
+        try:
+            return page.extract_text() or ""
+        finally:
+            # Drop the parsed layout, otherwise every page of the document stays in memory
+            page.close()
+
+    def close(self):
+        self.pdf.close()
+
+class AutoExtractor(PdfiumExtractor):
+    """
+    pypdfium2 for plain pages, pdfplumber for table-heavy ones
+
+    A page counts as table-heavy when it has at least
+    PDF_TABLE_RULING_LINES path objects. pdfplumber only opens the document
+    once the first such page turns up.
+    """
+
+    name = "auto"
+
+    def __init__(self, pdf_path: str):
+        super().__init__(pdf_path)
+        self._layout: Optional[PdfplumberExtractor] = None
+        self.table_pages = 0
+
+    def is_table_heavy(self, index: int) -> bool:
+        return self.ruling_lines(index) >= settings.PDF_TABLE_RULING_LINES
+
+    def extract_text(self, index: int) -> str:
+        if not self.is_table_heavy(index):
+            return super().extract_text(index)
+
+        self.table_pages += 1
+        if self._layout is None:
+            self._layout = PdfplumberExtractor(self.pdf_path)
+        return self._layout.extract_text(index)
+
+    def close(self):
+        super().close()
+        if self._layout is not None:
+            self._layout.close()
+
+EXTRACTORS: Dict[str, Type[PDFExtractor]] = {
+    "auto": AutoExtractor,
+    "pypdfium2": PdfiumExtractor,
+    "pdfplumber": PdfplumberExtractor,
+}
+
+def open_pdf(pdf_path: str, backend: Optional[str] = None) -> PDFExtractor:
+    """Open a PDF with the named extraction backend, PDF_EXTRACTION_BACKEND by default"""
+    backend = backend or settings.PDF_EXTRACTION_BACKEND
+    if backend not in EXTRACTORS:
+        raise ValueError(f"Unknown PDF extraction backend '{backend}', expected one of: {', '.join(EXTRACTORS)}")
+    return EXTRACTORS[backend](pdf_path)
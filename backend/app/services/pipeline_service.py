@@ -0,0 +1,407 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.core.container import (
+    get_audio_service, get_mash_service, get_summaries_service, get_upload_queue_service, get_video_service
+)
+from app.core.metrics import time_stage
+from app.core.tracing import background_trace
+from app.services.ffmpeg_service import Priority
+
+# Bump a stage's version when its code changes in a way that makes cached outputs stale
+STAGE_VERSIONS = {"summarise": 2, "script": 1, "audio": 2, "video": 1, "mash": 1, "upload": 1}
+
+# Node statuses after which dependants may start, and after which they never will
+SUCCEEDED = ("completed", "cached")
+UNSUCCESSFUL = ("failed", "skipped")
+
+def node_key(stage: str, **inputs) -> str:
+    """Content key of a node: its stage, the stage version and everything it reads"""
+    payload = json.dumps({"stage": stage, "version": STAGE_VERSIONS[stage], "inputs": inputs}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's contents, so renamed or touched inputs still hit the cache"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(settings.MEDIA_HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class NodeCache:
+    """Persistent map of node key -> output of a pipeline node that finished"""
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            if settings.DEBUG: print(f"** Ignoring unreadable pipeline cache {self.cache_path}: {str(e)}")
+            return {}
+
+    def _save(self):
+        """Atomically write the cache to disk (caller holds the lock)"""
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached output, unless a file it points to has since been deleted or evicted"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        output = entry["output"]
+        if isinstance(output, dict):
+            for name, value in output.items():
+                if name.endswith("_path") and not os.path.isfile(value):
+                    return None
+        return output
+
+    def put(self, key: str, stage: str, output: Any):
+        with self._lock:
+            self._entries[key] = {"stage": stage, "output": output, "created_at": time.time()}
+            self._save()
+
+@dataclass
+class PipelineNode:
+    id: str
+    stage: str
+    key: str
+    deps: List[str]
+    # Receives the outputs of the node's dependencies, by node id
+    execute: Callable[[Dict[str, Any]], Awaitable[Any]] = field(repr=False)
+    # Called with the node's output once it is known, to add the nodes that depend on it
+    expand: Optional[Callable[[Any], None]] = field(default=None, repr=False)
+    status: str = "pending"
+    output: Any = None
+    error: Optional[str] = None
+    # Seconds since the run started
+    ready_at: Optional[float] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "stage": self.stage,
+            "status": self.status,
+            "key": self.key,
+            "deps": self.deps,
+            "output": self.output,
+            "error": self.error,
+            "ready_at": self.ready_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": self.duration,
+        }
+
+@dataclass
+class PipelineRun:
+    id: str
+    params: dict
+    nodes: Dict[str, PipelineNode] = field(default_factory=dict)
+    status: str = "running"
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    elapsed: Optional[float] = None
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def add(self, node: PipelineNode):
+        self.nodes[node.id] = node
+
+    def clock(self) -> float:
+        return time.perf_counter() - self._started
+
+    def critical_path(self) -> List[dict]:
+        """
+        The chain of nodes that determined how long the run took
+
+        Starting from the node that finished last, repeatedly step back to
+        the dependency that finished last, since that is the one the node
+        was waiting on. Speeding up anything off this path doesn't shorten
+        the run.
+        """
+        finished = [node for node in self.nodes.values() if node.finished_at is not None]
+        if not finished:
+            return []
+
+        node = max(finished, key=lambda n: n.finished_at)
+        path = [node]
+        while node.deps:
+            node = max((self.nodes[dep] for dep in node.deps), key=lambda n: n.finished_at or 0.0)
+            path.append(node)
+        return [
+            {"id": node.id, "stage": node.stage, "status": node.status, "duration": node.duration,
+             "queued": node.started_at - node.ready_at if node.started_at is not None else None}
+            for node in reversed(path)
+        ]
+
+    def stage_totals(self) -> Dict[str, dict]:
+        totals: Dict[str, dict] = {}
+        for node in self.nodes.values():
+            total = totals.setdefault(node.stage, {"nodes": 0, "cached": 0, "failed": 0, "seconds": 0.0})
+            total["nodes"] += 1
+            total["cached"] += node.status == "cached"
+            total["failed"] += node.status == "failed"
+            total["seconds"] += node.duration or 0.0
+        return totals
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "params": self.params,
+            "created_at": self.created_at,
+            "elapsed": self.elapsed,
+            "nodes": [node.to_dict() for node in self.nodes.values()],
+            "stages": self.stage_totals(),
+            "critical_path": self.critical_path(),
+        }
+
+class PipelineService:
+    """
+    Run PDF -> summaries -> scripts -> audio -> video -> mash -> upload as a DAG
+
+    Summarising the PDF fans out into one branch per summary, and every node
+    starts as soon as its dependencies are done, so branches overlap, with
+    PIPELINE_STAGE_CONCURRENCY bounding each stage. A node's key hashes its
+    stage and inputs, including the keys of the nodes it depends on, and
+    finished outputs are cached under it. Re-running the same PDF therefore
+    only redoes nodes whose inputs changed, that failed, or whose output
+    files were evicted.
+    """
+
+    def __init__(self):
+        self.cache = NodeCache(settings.PIPELINE_CACHE_PATH)
+        self._semaphores = {
+            stage: asyncio.Semaphore(settings.PIPELINE_STAGE_CONCURRENCY.get(stage, 1)) for stage in STAGE_VERSIONS
+        }
+        self._runs: "OrderedDict[str, PipelineRun]" = OrderedDict()
+        self._tasks = set()
+
+    def start(
+        self,
+        pdf_path: str,
+        avatar_video_path: Optional[str] = None,
+        voice_type: str = "nova",
+        upload: bool = False,
+        privacy_status: str = "private",
+        max_summaries: Optional[int] = None,
+        force: bool = False
+    ) -> PipelineRun:
+        """Start a pipeline run in the background and return it"""
+        if not os.path.isfile(pdf_path):
+            raise ValueError(f"PDF file not found at path: {pdf_path}")
+        if avatar_video_path and not os.path.isfile(avatar_video_path):
+            raise ValueError(f"Video file not found at path: {avatar_video_path}")
+        if upload and not avatar_video_path:
+            raise ValueError("Uploading needs an avatar video to lip-sync")
+
+        run = PipelineRun(id=uuid.uuid4().hex, params={
+            "pdf_path": pdf_path,
+            "avatar_video_path": avatar_video_path,
+            "voice_type": voice_type,
+            "upload": upload,
+            "privacy_status": privacy_status,
+            "max_summaries": max_summaries,
+            "force": force,
+        })
+        self._remember(run)
+
+        task = asyncio.create_task(self._execute(run))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return run
+
+    def _remember(self, run: PipelineRun):
+        self._runs[run.id] = run
+        # Forget the oldest finished runs beyond the history limit
+        finished = [run_id for run_id, r in self._runs.items() if r.status != "running"]
+        for run_id in finished[:max(0, len(self._runs) - settings.PIPELINE_RUN_HISTORY)]:
+            del self._runs[run_id]
+
+    def get_run(self, run_id: str) -> Optional[PipelineRun]:
+        return self._runs.get(run_id)
+
+    def list_runs(self) -> List[PipelineRun]:
+        return list(self._runs.values())
+
+    async def _execute(self, run: PipelineRun):
+        try:
+            # A run outlives the request that started it, so it is traced on its own under the run id
+            with background_trace("pipeline_run", trace_id=run.id):
+                await self._schedule(run)
+        except Exception as e:
+            if settings.DEBUG: print(f"** Pipeline run {run.id} failed: {str(e)}")
+            run.error = str(e)
+            run.status = "failed"
+            run.elapsed = run.clock()
+
+    async def _schedule(self, run: PipelineRun):
+        """Start every node whose dependencies are done until nothing is left to run"""
+        params = run.params
+        pdf_digest = await asyncio.to_thread(file_digest, params["pdf_path"])
+        avatar_digest = await asyncio.to_thread(file_digest, params["avatar_video_path"]) if params["avatar_video_path"] else None
+
+        async def summarise(inputs: Dict[str, Any]) -> List[dict]:
+            summaries = await asyncio.to_thread(get_summaries_service().process_pdf_document, params["pdf_path"])
+            return [
+                {"topic": s["topic"], "summary": s["summary"], "pages": s["pages"], "people_involved": s["people_involved"]}
+                for s in summaries
+            ]
+
+        def add_branches(summaries: List[dict]):
+            for i, summary in enumerate(summaries[:params["max_summaries"]]):
+                self._add_branch(run, i, summary, avatar_digest)
+
+        run.add(PipelineNode(
+            id="summarise",
+            stage="summarise",
+            key=node_key("summarise", pdf=pdf_digest),
+            deps=[],
+            execute=summarise,
+            expand=add_branches,
+        ))
+
+        running: Dict[asyncio.Task, PipelineNode] = {}
+        while True:
+            for node in list(run.nodes.values()):
+                if node.status != "pending":
+                    continue
+                deps = [run.nodes[dep] for dep in node.deps]
+                if any(dep.status in UNSUCCESSFUL for dep in deps):
+                    node.status = "skipped"
+                elif all(dep.status in SUCCEEDED for dep in deps):
+                    node.status = "running"
+                    node.ready_at = run.clock()
+                    running[asyncio.create_task(self._run_node(run, node))] = node
+
+            if not running:
+                break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                running.pop(task)
+
+        run.elapsed = run.clock()
+        run.status = "completed" if all(node.status in SUCCEEDED for node in run.nodes.values()) else "failed"
+        if settings.DEBUG: print(f"** Pipeline run {run.id} {run.status} in {run.elapsed:.1f}s")
+
+    async def _run_node(self, run: PipelineRun, node: PipelineNode):
+        inputs = {dep: run.nodes[dep].output for dep in node.deps}
+        cached = None if run.params["force"] else self.cache.get(node.key)
+        try:
+            if cached is not None:
+                node.started_at = run.clock()
+                node.output = cached
+                node.status = "cached"
+            else:
+                async with self._semaphores[node.stage]:
+                    node.started_at = run.clock()
+                    with time_stage(f"pipeline_{node.stage}"):
+                        node.output = await node.execute(inputs)
+                self.cache.put(node.key, node.stage, node.output)
+                node.status = "completed"
+            node.finished_at = run.clock()
+            if node.expand:
+                node.expand(node.output)
+        except Exception as e:
+            if settings.DEBUG: print(f"** Pipeline node {node.id} failed: {str(e)}")
+            node.finished_at = run.clock()
+            node.error = str(e)
+            node.status = "failed"
+
+    def _add_branch(self, run: PipelineRun, index: int, summary: dict, avatar_digest: Optional[str]):
+        """Add the script, audio, video, mash and upload nodes of one summary"""
+        params = run.params
+        input_text = f"{summary['topic']}\n\n{summary['summary']}"
+        ids = {stage: f"{stage}[{index}]" for stage in ("script", "audio", "video", "mash", "upload")}
+
+        async def script(inputs: Dict[str, Any]) -> dict:
+            response = await get_audio_service().generate_script(input_text)
+            return {"script": response.model_dump()}
+
+        async def audio(inputs: Dict[str, Any]) -> dict:
+            from app.services.audio_service import TranscriptResponse
+            audio_service = get_audio_service()
+            transcript = TranscriptResponse.model_validate(inputs[ids["script"]]["script"])
+            audio_path = await audio_service.generate_audio(transcript, params["voice_type"])
+            analysis = await audio_service.analyse_audio(audio_path)
+            row_id = audio_service.save_generation(input_text, params["voice_type"], transcript, audio_path, analysis)
+            return {"row_id": row_id, "audio_path": audio_path}
+
+        script_key = node_key("script", input_text=input_text)
+        audio_key = node_key("audio", script=script_key, voice_type=params["voice_type"])
+        run.add(PipelineNode(id=ids["script"], stage="script", key=script_key, deps=["summarise"], execute=script))
+        run.add(PipelineNode(id=ids["audio"], stage="audio", key=audio_key, deps=[ids["script"]], execute=audio))
+        if not params["avatar_video_path"]:
+            return
+
+        async def video(inputs: Dict[str, Any]) -> dict:
+            audio_path = inputs[ids["audio"]]["audio_path"]
+            # Named after the node key so concurrent branches never write the same file
+            video_path = await get_video_service().lip_sync_files(
+                params["avatar_video_path"], audio_path, f"pipeline_{video_key[:16]}.mp4"
+            )
+            if not video_path:
+                raise RuntimeError("Failed to generate or download the lip-synced video")
+            return {"video_path": video_path}
+
+        async def mash(inputs: Dict[str, Any]) -> dict:
+            mash_service = get_mash_service()
+            row_id = inputs[ids["audio"]]["row_id"]
+            mash_service.register_video(row_id, inputs[ids["video"]]["video_path"])
+            return {"combined_path": await mash_service.mash_audio_video(row_id, priority=Priority.BATCH)}
+
+        video_key = node_key("video", audio=audio_key, avatar=avatar_digest)
+        mash_key = node_key("mash", audio=audio_key, video=video_key)
+        run.add(PipelineNode(id=ids["video"], stage="video", key=video_key, deps=[ids["audio"]], execute=video))
+        run.add(PipelineNode(id=ids["mash"], stage="mash", key=mash_key, deps=[ids["audio"], ids["video"]], execute=mash))
+        if not params["upload"]:
+            return
+
+        async def upload(inputs: Dict[str, Any]) -> dict:
+            queue = get_upload_queue_service()
+            hashtags = " ".join(inputs[ids["script"]]["script"]["hashtags"])
+            job = queue.enqueue(
+                inputs[ids["mash"]]["combined_path"],
+                title=summary["topic"][:100],
+                description=f"{summary['summary']}\n\n{hashtags}",
+                privacy_status=params["privacy_status"]
+            )
+            # The queue uploads in its own worker threads; wait for it to get there
+            while job["status"] not in ("completed", "failed"):
+                await asyncio.sleep(1.0)
+                job = queue.get_job(job["id"])
+            if job["status"] == "failed":
+                raise RuntimeError(f"YouTube upload {job['id']} failed: {job['error']}")
+            return {"job_id": job["id"], "video_id": job["video_id"]}
+
+        upload_key = node_key(
+            "upload", mash=mash_key, script=script_key, title=summary["topic"], privacy_status=params["privacy_status"]
+        )
+        run.add(PipelineNode(id=ids["upload"], stage="upload", key=upload_key, deps=[ids["mash"], ids["script"]], execute=upload))
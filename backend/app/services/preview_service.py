@@ -0,0 +1,290 @@
+import os
+import json
+import math
+import time
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+from app.core.config import settings
+from app.core.container import get_ffmpeg_service, get_media_service, get_storage_service
+from app.core.tracing import background_trace
+from app.services.ffmpeg_service import FFmpegService, Priority, summarize_streams
+
+# Previews live next to their video, in <video dir>/.previews/<content hash>/
+PREVIEW_DIR_NAME = ".previews"
+PREVIEW_FILES = ("thumbnail.jpg", "preview.mp4", "sprite.jpg")
+
+def _even(value: float) -> int:
+    """Round to an even size, as yuv420p encoders require"""
+    return max(2, int(round(value / 2)) * 2)
+
+def build_thumbnail_command(video_path: str, output_path: str, at: float) -> List[str]:
+    return [
+        '-y',
+        '-ss', f"{at:.3f}",
+        '-i', video_path,
+        '-frames:v', '1',
+        '-vf', f"scale={settings.PREVIEW_THUMBNAIL_WIDTH}:-2",
+        '-q:v', '4',
+        output_path
+    ]
+
+def build_preview_command(video_path: str, output_path: str) -> List[str]:
+    """A short, muted, low-resolution clip for hover previews"""
+    return [
+        '-y',
+        '-i', video_path,
+        '-t', str(settings.PREVIEW_CLIP_SECONDS),
+        '-map', '0:v:0',
+        '-an',
+        '-vf', f"scale={settings.PREVIEW_CLIP_WIDTH}:-2",
+        '-c:v', 'libx264',
+        '-preset', 'veryfast',
+        '-crf', '32',
+        '-pix_fmt', 'yuv420p',
+        '-threads', '1',
+        '-movflags', '+faststart',
+        output_path
+    ]
+
+def build_sprite_command(video_path: str, output_path: str, sprite: dict) -> List[str]:
+    """One frame every `interval` seconds, tiled into a single image for seek-bar thumbnails"""
+    return [
+        '-y',
+        '-i', video_path,
+        '-vf', (
+            f"fps=1/{sprite['interval']:.6f},"
+            f"scale={sprite['tile_width']}:{sprite['tile_height']},"
+            f"tile={sprite['columns']}x{sprite['rows']}"
+        ),
+        '-frames:v', '1',
+        '-q:v', '5',
+        output_path
+    ]
+
+def plan_sprite(duration: float, width: Optional[int], height: Optional[int]) -> dict:
+    """Sprite sheet geometry: how many tiles, how big, and how many seconds apart"""
+    tiles = settings.PREVIEW_SPRITE_TILES
+    columns = min(tiles, settings.PREVIEW_SPRITE_COLUMNS)
+    tile_width = settings.PREVIEW_SPRITE_TILE_WIDTH
+    aspect = height / width if width and height else 9 / 16
+    return {
+        "file": "sprite.jpg",
+        "tiles": tiles,
+        "columns": columns,
+        "rows": math.ceil(tiles / columns),
+        "tile_width": tile_width,
+        "tile_height": _even(tile_width * aspect),
+        "interval": max(duration, 0.1) / tiles,
+    }
+
+async def generate_previews(ffmpeg: FFmpegService, video_path: str, directory: str) -> dict:
+    """
+    Write the thumbnail, preview clip and sprite sheet of a video into `directory`
+
+    The three ffmpeg jobs run concurrently as batch work. Returns the
+    manifest describing them, which the caller writes once they exist.
+    """
+    info = summarize_streams(await ffmpeg.probe(video_path))
+    duration = info["duration"] or 0.0
+    sprite = plan_sprite(duration, info["width"], info["height"])
+
+    os.makedirs(directory, exist_ok=True)
+    await asyncio.gather(
+        ffmpeg.run(build_thumbnail_command(video_path, os.path.join(directory, "thumbnail.jpg"), duration * 0.1), priority=Priority.BATCH),
+        ffmpeg.run(build_preview_command(video_path, os.path.join(directory, "preview.mp4")), priority=Priority.BATCH),
+        ffmpeg.run(build_sprite_command(video_path, os.path.join(directory, "sprite.jpg"), sprite), priority=Priority.BATCH),
+    )
+
+    return {
+        "content_hash": os.path.basename(directory),
+        "duration": duration,
+        "width": info["width"],
+        "height": info["height"],
+        "thumbnail": "thumbnail.jpg",
+        "preview": "preview.mp4",
+        "sprite": sprite,
+        "sources": [],
+        "created_at": time.time(),
+    }
+
+def write_manifest(directory: str, manifest: dict):
+    """Atomically write a preview manifest"""
+    manifest_path = os.path.join(directory, "manifest.json")
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def _source_key(video_path: str, stat_result: os.stat_result) -> Tuple[str, int, int]:
+    return (os.path.abspath(video_path), stat_result.st_size, stat_result.st_mtime_ns)
+
+def previews_root(video_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(video_path)), PREVIEW_DIR_NAME)
+
+def previews_complete(directory: str) -> bool:
+    return all(os.path.isfile(os.path.join(directory, name)) for name in PREVIEW_FILES)
+
+async def ensure_previews(ffmpeg: FFmpegService, video_path: str, content_hash: str) -> Tuple[dict, bool]:
+    """
+    Get the previews of a video whose content hash is known, generating them if needed
+
+    Returns the manifest and whether anything was generated. The manifest
+    is written after the files, so a directory with a manifest is complete.
+    Identical content under another name reuses the existing previews and
+    is only added to the manifest's sources.
+    """
+    directory = os.path.join(previews_root(video_path), content_hash)
+    manifest_path = os.path.join(directory, "manifest.json")
+
+    manifest = None
+    if os.path.isfile(manifest_path) and previews_complete(directory):
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            manifest = None
+
+    generated = manifest is None
+    if generated:
+        if settings.DEBUG: print(f"** Generating previews for {video_path}...")
+        manifest = await generate_previews(ffmpeg, video_path, directory)
+
+    key = _source_key(video_path, os.stat(video_path))
+    source = {"path": key[0], "size": key[1], "mtime_ns": key[2]}
+    if source not in manifest["sources"]:
+        manifest["sources"].append(source)
+        write_manifest(directory, manifest)
+    return manifest, generated
+
+class PreviewService:
+    """
+    Thumbnails, preview clips and seek sprites for generated videos
+
+    Previews are generated once per video content in the background, right
+    after a video is created, and found again by file name, size and
+    modification time so serving them never hashes the video. Identical
+    videos under different names share one set of previews. Previews lost
+    to disk quota eviction are regenerated on the next request.
+    """
+
+    def __init__(self):
+        self.ffmpeg = get_ffmpeg_service()
+        self._index: Optional[Dict[Tuple[str, int, int], dict]] = None
+        self._pending: Dict[str, asyncio.Task] = {}
+        # Copies of the same video share a directory, so they must not be generated at the same time
+        self._hash_locks: Dict[str, asyncio.Lock] = {}
+
+    def _load_index(self, directory: str) -> Dict[Tuple[str, int, int], dict]:
+        """Map every source recorded in the manifests under a video directory to its manifest"""
+        index = {}
+        root = os.path.join(os.path.abspath(directory), PREVIEW_DIR_NAME)
+        if not os.path.isdir(root):
+            return index
+        for entry in os.scandir(root):
+            try:
+                with open(os.path.join(entry.path, "manifest.json")) as f:
+                    manifest = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            for source in manifest.get("sources", []):
+                index[(source["path"], source["size"], source["mtime_ns"])] = manifest
+        return index
+
+    def lookup(self, video_path: str) -> Optional[dict]:
+        """Get the manifest of a video's previews, if they have been generated and are all still on disk"""
+        if self._index is None:
+            self._index = self._load_index(settings.OUTPUT_DIR)
+        try:
+            key = _source_key(video_path, os.stat(video_path))
+        except OSError:
+            return None
+        manifest = self._index.get(key)
+        if manifest is None or not previews_complete(os.path.join(previews_root(video_path), manifest["content_hash"])):
+            return None
+        return manifest
+
+    def asset_path(self, video_path: str, manifest: dict, name: str) -> str:
+        return os.path.join(previews_root(video_path), manifest["content_hash"], name)
+
+    def schedule(self, video_path: str) -> asyncio.Task:
+        """Generate a video's previews in the background, once even if asked repeatedly"""
+        video_path = os.path.abspath(video_path)
+        task = self._pending.get(video_path)
+        if task is None:
+            task = asyncio.create_task(self._generate(video_path))
+            self._pending[video_path] = task
+            task.add_done_callback(lambda _: self._pending.pop(video_path, None))
+        return task
+
+    async def _generate(self, video_path: str) -> Optional[dict]:
+        try:
+            manifest = self.lookup(video_path)
+            if manifest is not None:
+                return manifest
+
+            # Scheduled from a request, but traced on its own rather than as part of it
+            with background_trace("previews", video=os.path.basename(video_path)):
+                content_hash = await get_media_service().get_content_hash(video_path)
+                async with self._hash_locks.setdefault(content_hash, asyncio.Lock()):
+                    manifest, generated = await ensure_previews(self.ffmpeg, video_path, content_hash)
+                if generated:
+                    storage = get_storage_service()
+                    for name in PREVIEW_FILES:
+                        storage.record_write(self.asset_path(video_path, manifest, name))
+                if self._index is not None:
+                    self._index[_source_key(video_path, os.stat(video_path))] = manifest
+                return manifest
+        except Exception as e:
+            if settings.DEBUG: print(f"** Could not generate previews for {video_path}: {str(e)}")
+            return None
+
+    async def list_videos(self, offset: int = 0, limit: int = 100) -> dict:
+        """
+        A page of generated videos, newest first, with their previews
+
+        Videos without previews yet are listed with `previews` set to None
+        and have them generated in the background.
+        """
+        directory = settings.OUTPUT_DIR
+        entries = await asyncio.to_thread(
+            lambda: sorted(
+                (entry for entry in os.scandir(directory) if entry.is_file() and entry.name.lower().endswith(".mp4")),
+                key=lambda entry: entry.stat().st_mtime,
+                reverse=True
+            ) if os.path.isdir(directory) else []
+        )
+
+        videos = []
+        for entry in entries[offset:offset + limit]:
+            manifest = self.lookup(entry.path)
+            if manifest is None:
+                self.schedule(entry.path)
+            stat_result = entry.stat()
+            videos.append({
+                "filename": entry.name,
+                "size": stat_result.st_size,
+                "modified": stat_result.st_mtime,
+                "previews": self.describe(entry.name, manifest) if manifest else None,
+            })
+        return {"total": len(entries), "offset": offset, "videos": videos}
+
+    def describe(self, filename: str, manifest: dict) -> dict:
+        """
+        A video's preview manifest as the API returns it
+
+        URLs carry the video's content hash as `v`, so browsers cache the
+        previews as immutable and only fetch new ones when the video changes.
+        """
+        base = f"{settings.API_V1_STR}/videos/{quote(filename)}"
+        version = f"?v={manifest['content_hash']}"
+        return {
+            "content_hash": manifest["content_hash"],
+            "duration": manifest["duration"],
+            "width": manifest["width"],
+            "height": manifest["height"],
+            "thumbnail_url": f"{base}/thumbnail.jpg{version}",
+            "preview_url": f"{base}/preview.mp4{version}",
+            "sprite_url": f"{base}/sprite.jpg{version}",
+            "sprite": {key: value for key, value in manifest["sprite"].items() if key != "file"},
+        }
@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import shutil
+import threading
+from typing import Dict, List, Optional, Set
+from app.core.config import settings
+from app.core.container import get_artifact_index, get_upload_queue_service
+
+# Audio CSV statuses after which a row no longer needs its files kept around
+FINAL_AUDIO_STATUSES = ("completed",)
+
+class StorageService:
+    """
+    Keep artifact directories within their disk quotas
+
+    Last access times are tracked per file (filesystem atimes are usually
+    disabled) and persisted, falling back to the modification time for
+    files we haven't seen. When a directory goes over its quota, least
+    recently used files are deleted until it is back under
+    ARTIFACT_EVICT_TO of the quota. Files still needed by unfinished work
+    and files newer than ARTIFACT_MIN_AGE_SECONDS are never evicted.
+    """
+
+    def __init__(self):
+        self.quotas: Dict[str, int] = {os.path.abspath(path): quota for path, quota in settings.ARTIFACT_QUOTAS.items()}
+        self.access_path = settings.ARTIFACT_ACCESS_PATH
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._last_access: Dict[str, float] = self._load()
+        self._dirty = False
+        # Bytes per directory as of the last scan, plus writes recorded since
+        self._usage: Dict[str, Optional[int]] = {directory: None for directory in self.quotas}
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+
+        for directory in self.quotas:
+            os.makedirs(directory, exist_ok=True)
+
+    def _load(self) -> Dict[str, float]:
+        if not os.path.exists(self.access_path):
+            return {}
+        try:
+            with open(self.access_path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            if settings.DEBUG: print(f"** Ignoring unreadable artifact access file {self.access_path}: {str(e)}")
+            return {}
+
+    def flush(self):
+        """Persist access times if they changed since the last flush"""
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = dict(self._last_access)
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.access_path) or ".", exist_ok=True)
+        tmp_path = f"{self.access_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.access_path)
+
+    def _directory_of(self, path: str) -> Optional[str]:
+        """Find the quota-managed directory a file lives in"""
+        path = os.path.abspath(path)
+        for directory in self.quotas:
+            if path.startswith(directory + os.sep):
+                return directory
+        return None
+
+    def touch(self, path: str):
+        """Record that an artifact was just read"""
+        with self._lock:
+            self._last_access[os.path.abspath(path)] = time.time()
+            self._dirty = True
+
+    def record_write(self, path: str):
+        """Record a newly written artifact, and start a sweep if its directory went over quota"""
+        self.touch(path)
+        directory = self._directory_of(path)
+        if directory is None:
+            return
+
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._usage[directory] is not None:
+                self._usage[directory] += size
+            over_quota = self._usage[directory] is None or self._usage[directory] > self.quotas[directory]
+
+        if over_quota and not self._sweep_lock.locked():
+            threading.Thread(target=self.sweep, name="artifact-sweep", daemon=True).start()
+
+    def pinned_paths(self) -> Set[str]:
+        """
+        Files that unfinished work still needs
+
+        That is audio of generation rows that haven't completed, audio and
+        video of rows waiting to be mashed, and files of uploads that are
+        queued or in flight.
+        """
+        pinned: Set[str] = set()
+
+        if os.path.exists(settings.AUDIO_CSV_PATH):
+            import pandas as pd
+            rows = pd.read_csv(settings.AUDIO_CSV_PATH, usecols=lambda column: column in ("id", "status", "audio_path"))
+            if {"status", "audio_path"} <= set(rows.columns):
+                unfinished = rows[~rows["status"].isin(FINAL_AUDIO_STATUSES) & ~rows["status"].astype(str).str.startswith("error")]
+                pinned.update(os.path.abspath(path) for path in unfinished["audio_path"].dropna() if isinstance(path, str) and path)
+
+        for artifacts in get_artifact_index().entries().values():
+            if "video" in artifacts and "combined" not in artifacts:
+                pinned.update(os.path.abspath(artifacts[kind]) for kind in ("audio", "video") if kind in artifacts)
+
+        for job in get_upload_queue_service().list_jobs():
+            if job["status"] in ("queued", "uploading"):
+                pinned.add(os.path.abspath(job["file_path"]))
+
+        return pinned
+
+    def _scan(self, directory: str) -> List[dict]:
+        files = []
+        for root, _, names in os.walk(directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat_result = os.stat(path)
+                except OSError:
+                    continue
+                files.append({
+                    "path": path,
+                    "size": stat_result.st_size,
+                    "modified": stat_result.st_mtime,
+                    "last_access": self._last_access.get(path, stat_result.st_mtime),
+                })
+        return files
+
+    def _evict(self, directory: str, files: List[dict], pinned: Set[str]) -> List[str]:
+        """Delete least recently used files until the directory is under its low-water mark"""
+        used = sum(f["size"] for f in files)
+        target = int(self.quotas[directory] * settings.ARTIFACT_EVICT_TO)
+        cutoff = time.time() - settings.ARTIFACT_MIN_AGE_SECONDS
+
+        evicted = []
+        for f in sorted(files, key=lambda f: f["last_access"]):
+            if used <= target:
+                break
+            if f["path"] in pinned or f["modified"] > cutoff:
+                continue
+            try:
+                os.remove(f["path"])
+            except OSError as e:
+                if settings.DEBUG: print(f"** Could not evict {f['path']}: {str(e)}")
+                continue
+            used -= f["size"]
+            evicted.append(f["path"])
+            self.evicted_files += 1
+            self.evicted_bytes += f["size"]
+            with self._lock:
+                self._last_access.pop(f["path"], None)
+                self._dirty = True
+
+        if used > self.quotas[directory] and settings.DEBUG:
+            print(f"** {directory} is still over quota, everything left is pinned or too new to evict")
+        self._usage[directory] = used
+        return evicted
+
+    def sweep(self) -> Dict[str, List[str]]:
+        """Bring every directory back within its quota; returns the evicted files per directory"""
+        with self._sweep_lock:
+            pinned = None
+            evicted = {}
+            for directory, quota in self.quotas.items():
+                files = self._scan(directory)
+                used = sum(f["size"] for f in files)
+                self._usage[directory] = used
+                if used <= quota:
+                    continue
+                # Only worth reading the CSV and jobs once some directory needs evicting
+                if pinned is None:
+                    pinned = self.pinned_paths()
+                evicted[directory] = self._evict(directory, files, pinned)
+                if settings.DEBUG: print(f"** Evicted {len(evicted[directory])} file(s) from {directory}")
+            self.flush()
+            return evicted
+
+    def usage(self) -> dict:
+        """Current usage of each quota-managed directory and of the disk"""
+        pinned = self.pinned_paths()
+        directories = []
+        for directory, quota in self.quotas.items():
+            files = self._scan(directory)
+            used = sum(f["size"] for f in files)
+            pinned_files = [f for f in files if f["path"] in pinned]
+            directories.append({
+                "path": os.path.relpath(directory),
+                "quota_bytes": quota,
+                "used_bytes": used,
+                "usage_percent": round(used / quota * 100, 1) if quota else None,
+                "files": len(files),
+                "pinned_files": len(pinned_files),
+                "pinned_bytes": sum(f["size"] for f in pinned_files),
+                "oldest_access": min((f["last_access"] for f in files), default=None),
+            })
+
+        disk = shutil.disk_usage(".")
+        return {
+            "directories": directories,
+            "disk": {"total_bytes": disk.total, "used_bytes": disk.used, "free_bytes": disk.free},
+            "evicted_files": self.evicted_files,
+            "evicted_bytes": self.evicted_bytes,
+        }
@@ -1,14 +1,35 @@
-import google.generativeai as genai
-import instructor
-import pdfplumber
+import time
+from collections import deque
 from pydantic import BaseModel, Field
-from typing import Literal, List
+from typing import Literal, List, Optional
 from textwrap import dedent
 
 from app.core.config import settings
+from app.core.metrics import observe_stage, time_stage
+from app.core.rate_limit import classify_error, limiter
+from app.core.tracing import current_trace_id
 from app.services.csv_service import CSVManager
+from app.services.pdf_extraction import open_pdf
+from app.services.prompt_cache import CachedPrefix, GeminiPromptCache, LocalPromptCache
 
-genai.configure(api_key=settings.GEMINI_API_KEY)
+# The day the documents currently being processed refer to
+DOCUMENT_DATE = "04/02/2025 (dd/mm/yyyy)"
+
+SUMMARY_INSTRUCTIONS = dedent("""
+  You are an unbias, expert news reporter.                
+                  
+  You are tasked with processing government documents containing debates on important matters from politicians. Your objectives are:
+    1. Identify the key talking points and debates that are relevant to the public.
+    2. Ensure to keep summaries factual, accurate, and concise.
+    3. Ensure to include the name of the politician when summarising their opinion.
+    4. Ensure summaries a maximum for 300 words.
+    5. Do not focus too much on that the 'Speaker' says, but more on the senators, MPs, and other politicians.
+    6. Ensure to include the party the politican represents.
+  
+  If the chunk contains other information that is not relevant to a politican's perspective or opinion, then leave the summary list empty, and fill the is_valuable with NONE. 
+
+  If the summarises are good, relevant to the public, and factual, then fill the is_valuable with GOOD. If the summaries are not good, relevant to the public, or factual, then fill the is_valuable with BAD.
+""")
 
 class Summary(BaseModel):
   topic: str = Field(description="A high-level title summarising the topic of discussion.")
@@ -22,14 +43,29 @@ class SummaryResponse(BaseModel):
 
 class SummariesService:
   def __init__(self):
+    # Imported here so the SDKs only load when the service is first used
+    import google.generativeai as genai
+    import instructor
+
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    
     # Initialise LLM client
     self.llm_client = instructor.from_gemini(
       client=genai.GenerativeModel(
-        model_name="models/gemini-1.5-flash-latest",
+        model_name=f"models/{settings.GEMINI_MODEL}",
       ),
       mode=instructor.Mode.GEMINI_JSON,
     )
     
+    # Registers each document's invariant prompt prefix once instead of resending it with every chunk
+    if settings.GEMINI_PROMPT_CACHE == "gemini":
+      self.prompt_cache = GeminiPromptCache(genai, instructor)
+    elif settings.GEMINI_PROMPT_CACHE == "local":
+      self.prompt_cache = LocalPromptCache()
+    else:
+      self.prompt_cache = None
+    self.prompt_cache_reports = deque(maxlen=100)
+    
     # Initialise local data storage
     self.headers = [
       "id",
@@ -39,22 +75,44 @@ class SummariesService:
       "topic",
       "summary",
       "people_involved",
+      "trace_id",
+      "created_at",
     ]
     self.csv_client = CSVManager(settings.SUMMARIES_CSV_PATH, self.headers)
     
-  def process_pdf_document(self, pdf_path):
-    """Process a Government PDF document and extract summaries"""
+  def process_pdf_document(self, pdf_path) -> List[dict]:
+    """Process a Government PDF document, save its summaries and return them"""
+    if settings.DEBUG: print("** Processing PDF document...")
+    all_summaries = []
+    prefix = self.open_prompt_prefix(DOCUMENT_DATE)
+    report = {
+      "source": pdf_path,
+      "cache": prefix.name if prefix else None,
+      "prefix_tokens": prefix.prefix_tokens if prefix else None,
+      "chunks": 0,
+      "cached_chunks": 0,
+      "tokens_saved": 0,
+    }
+    try:
+      self._summarise_pages(pdf_path, prefix, report, all_summaries)
+    finally:
+      if prefix:
+        self.prompt_cache.close(prefix)
+      self.prompt_cache_reports.append(report)
+      if settings.DEBUG: print(f"** Prompt cache: {report['tokens_saved']} tokens saved over {report['chunks']} chunks of {pdf_path}")
     
+    return all_summaries
+  
+  def _summarise_pages(self, pdf_path, prefix: Optional[CachedPrefix], report: dict, all_summaries: List[dict]):
     # Break PDF pages into chunks of text and then process each chunk w/ LLM
     PAGES_PER_CHUNK = 4
     
-    if settings.DEBUG: print("** Processing PDF document...")
-    with pdfplumber.open(pdf_path) as pdf:
+    with open_pdf(pdf_path) as pdf:
       CHUNK = ""
       CURR_PAGE_NUMBERS = []
       
       if settings.DEBUG: print("** Processing PDF pages...")
-      for i, page in enumerate(pdf.pages, start=1):
+      for i in range(1, len(pdf) + 1):
         if settings.DEBUG: print(f"Processing page {i}...")
         # Skip the first 15 pages as they're usually the introduction
         if i < 15:
@@ -62,11 +120,12 @@ class SummariesService:
           continue
         
         # Extract text from page
-        text = page.extract_text()
+        with time_stage("pdf_page_extract"):
+          text = pdf.extract_text(i - 1)
         
         # If we haven't yet made a chunk and this is not the last page
         print(f"Curr page numbers: {CURR_PAGE_NUMBERS}")
-        if len(CURR_PAGE_NUMBERS) < PAGES_PER_CHUNK and i != len(pdf.pages) - 1:
+        if len(CURR_PAGE_NUMBERS) < PAGES_PER_CHUNK and i != len(pdf) - 1:
           CHUNK += text
           CURR_PAGE_NUMBERS.append(i)
           if settings.DEBUG: print(f"Chunked")
@@ -74,9 +133,14 @@ class SummariesService:
         
         # If we have a chunk, process it
         if settings.DEBUG: print("** Processing PDF chunk...")
-        response = self.process_pdf_chunk(CHUNK)
+        response = self.process_pdf_chunk(CHUNK, prefix)
         if settings.DEBUG: print(f"Processed chunk!")
         
+        report["chunks"] += 1
+        if prefix and prefix.active:
+          report["cached_chunks"] += 1
+          report["tokens_saved"] += self._cached_tokens(response, prefix)
+        
         json = response.model_dump()
         if json["is_valuable"] == "GOOD":
           new_summaries = [
@@ -87,52 +151,78 @@ class SummariesService:
               "topic": summary.topic,
               "summary": summary.summary,
               "people_involved": summary.related_personnel,
+              "trace_id": current_trace_id(),
             } for summary in response.summaries
           ]
           if settings.DEBUG: print(f"New summaries len: {len(new_summaries)}")
           self.csv_client.append_rows(new_summaries)
+          all_summaries.extend(new_summaries)
         
         # Reset chunk and page numbers
         CHUNK = ""
         CURR_PAGE_NUMBERS = []
+  
+  def _document_context(self, document_date: str) -> str:
+    """The part of the user prompt that is the same for every chunk of a document"""
+    return dedent(f"""
+      WARNING: Many of the spaces are missing from the text, though, the words have just been concatenated together, but the meaning is the same.
+      
+      **The Day the Document refers too**: "{document_date}"
+    """)
+  
+  def open_prompt_prefix(self, document_date: str) -> Optional[CachedPrefix]:
+    """Register a document's invariant prompt prefix, or return None to send it inline with each chunk"""
+    if self.prompt_cache is None:
+      return None
+    try:
+      return self.prompt_cache.open(self.llm_client, SUMMARY_INSTRUCTIONS, [self._document_context(document_date)])
+    except Exception as e:
+      if settings.DEBUG: print(f"** Prompt caching unavailable, sending the full prompt with each chunk: {str(e)}")
+      return None
+  
+  def _cached_tokens(self, response: SummaryResponse, prefix: CachedPrefix) -> int:
+    """Prefix tokens a chunk call read from the cache, as reported by Gemini when it says"""
+    usage = getattr(getattr(response, "_raw_response", None), "usage_metadata", None)
+    cached = getattr(usage, "cached_content_token_count", None)
+    return cached if isinstance(cached, int) and cached else prefix.prefix_tokens
       
-  def process_pdf_chunk(self, chunk: str) -> SummaryResponse:
+  def process_pdf_chunk(self, chunk: str, prefix: Optional[CachedPrefix] = None) -> SummaryResponse:
     """Process a PDF chunk and return a SummaryResponse"""
     
     print("** Processing/summarising PDF chunk...")
-    response = self.llm_client.create(
-      response_model=SummaryResponse,
-      messages=[
-        {
-          "role": "developer",
-          "content": dedent(f"""
-            You are an unbias, expert news reporter.                
-                            
-            You are tasked with processing government documents containing debates on important matters from politicians. Your objectives are:
-              1. Identify the key talking points and debates that are relevant to the public.
-              2. Ensure to keep summaries factual, accurate, and concise.
-              3. Ensure to include the name of the politician when summarising their opinion.
-              4. Ensure summaries a maximum for 300 words.
-              5. Do not focus too much on that the 'Speaker' says, but more on the senators, MPs, and other politicians.
-              6. Ensure to include the party the politican represents.
-            
-            If the chunk contains other information that is not relevant to a politican's perspective or opinion, then leave the summary list empty, and fill the is_valuable with NONE. 
-      
-            If the summarises are good, relevant to the public, and factual, then fill the is_valuable with GOOD. If the summaries are not good, relevant to the public, or factual, then fill the is_valuable with BAD.
-          """),
-        },
-        {
-          "role": "user",
-          "content": dedent(f"""
-            WARNING: Many of the spaces are missing from the text, though, the words have just been concatenated together, but the meaning is the same.
-            
-            **The Day the Document refers too**: "04/02/2025 (dd/mm/yyyy)"
-                            
-            **Chunk of Documents**: {chunk}
-          """),
-        },
-      ],
-    )
+    start = time.perf_counter()
+    response = None
+    if prefix and prefix.active:
+      try:
+        response = limiter.call(
+          "gemini", settings.GEMINI_MODEL, prefix.client.create,
+          response_model=SummaryResponse,
+          messages=[{"role": "user", "content": f"**Chunk of Documents**: {chunk}"}],
+        )
+      except Exception as e:
+        # An expired or rejected cache shouldn't lose the chunk; use the full prompt from now on
+        _, status, _ = classify_error(e)
+        if status not in (400, 403, 404):
+          raise
+        if settings.DEBUG: print(f"** Prompt cache {prefix.name} stopped working, falling back: {str(e)}")
+        prefix.active = False
+    
+    if response is None:
+      response = limiter.call(
+        "gemini", settings.GEMINI_MODEL, self.llm_client.create,
+        response_model=SummaryResponse,
+        messages=[
+          {
+            "role": "developer",
+            "content": SUMMARY_INSTRUCTIONS,
+          },
+          {
+            "role": "user",
+            "content": self._document_context(DOCUMENT_DATE) + f"\n**Chunk of Documents**: {chunk}\n",
+          },
+        ],
+      )
+    observe_stage("gemini_chunk", time.perf_counter() - start)
 
     print("** Finished processing chunk")
     return response
\ No newline at end of file
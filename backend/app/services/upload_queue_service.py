@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.core.container import get_job_events, get_youtube_service
+from app.core.rate_limit import limiter
+
+# Resumable upload chunks must be a multiple of 256KB
+CHUNK_GRANULARITY = 256 * 1024
+
+class UploadQueueService:
+    """
+    Upload videos to YouTube from a bounded background worker pool
+
+    Jobs are persisted with their resumable session URI and byte offset, so
+    an upload interrupted by a crash or restart continues where it stopped
+    instead of starting over.
+    """
+
+    def __init__(self):
+        self.jobs_path = settings.YOUTUBE_UPLOAD_JOBS_PATH
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, dict] = self._load()
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.YOUTUBE_UPLOAD_WORKERS,
+            thread_name_prefix="youtube-upload"
+        )
+
+    def _load(self) -> Dict[str, dict]:
+        if not os.path.exists(self.jobs_path):
+            return {}
+        try:
+            with open(self.jobs_path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            if settings.DEBUG: print(f"** Ignoring unreadable upload jobs file {self.jobs_path}: {str(e)}")
+            return {}
+
+    def _save(self):
+        """Atomically persist all jobs (caller holds the lock)"""
+        os.makedirs(os.path.dirname(self.jobs_path) or ".", exist_ok=True)
+        tmp_path = f"{self.jobs_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._jobs, f, indent=2)
+        os.replace(tmp_path, self.jobs_path)
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields, updated_at=time.time())
+            self._save()
+        self._publish(job_id)
+
+    def _publish(self, job_id: str):
+        """Push a job's current state to the job event hub as youtube:<job_id>"""
+        job = self.get_job(job_id)
+        get_job_events().publish(
+            "youtube", job_id, job["status"], job["progress"] / 100,
+            offset=job["offset"],
+            total_bytes=job["total_bytes"],
+            throughput_bps=job["throughput_bps"],
+            video_id=job["video_id"],
+            error=job["error"]
+        )
+
+    def enqueue(
+        self,
+        file_path: str,
+        title: str,
+        description: str,
+        privacy_status: str = "public",
+        tags: Optional[List[str]] = None,
+        category_id: str = "22",
+        language: str = "en"
+    ) -> dict:
+        """Queue a video for upload and return its job record"""
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "file_path": file_path,
+            "metadata": {
+                "title": title,
+                "description": description,
+                "privacy_status": privacy_status,
+                "tags": tags,
+                "category_id": category_id,
+                "language": language,
+            },
+            "status": "queued",
+            "session_uri": None,
+            "offset": 0,
+            "total_bytes": os.path.getsize(file_path),
+            "chunk_size": settings.YOUTUBE_UPLOAD_MIN_CHUNK_SIZE,
+            "throughput_bps": None,
+            "video_id": None,
+            "error": None,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._save()
+        self._publish(job_id)
+
+        self._executor.submit(self._run, job_id)
+        return self.get_job(job_id)
+
+    def retry(self, job_id: str) -> Optional[dict]:
+        """Resubmit a failed upload, continuing from its last persisted offset"""
+        job = self.get_job(job_id)
+        if job is None or job["status"] != "failed":
+            return None
+        self._update(job_id, status="queued", error=None)
+        self._executor.submit(self._run, job_id)
+        return self.get_job(job_id)
+
+    def resume_pending(self):
+        """Resubmit uploads that were queued or in flight when the process stopped"""
+        with self._lock:
+            pending = [job_id for job_id, job in self._jobs.items() if job["status"] in ("queued", "uploading")]
+        for job_id in pending:
+            if settings.DEBUG: print(f"** Resuming YouTube upload {job_id}...")
+            self._executor.submit(self._run, job_id)
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """Get a job with its progress percentage"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+        if job["status"] == "completed":
+            job["progress"] = 100.0
+        else:
+            job["progress"] = round(job["offset"] / job["total_bytes"] * 100, 1) if job["total_bytes"] else 0.0
+        return job
+
+    def list_jobs(self) -> List[dict]:
+        with self._lock:
+            job_ids = list(self._jobs)
+        return [self.get_job(job_id) for job_id in job_ids]
+
+    def shutdown(self):
+        """Stop accepting work; in-flight uploads resume on the next start"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _next_chunk_size(self, throughput_bps: float) -> int:
+        """Size the next chunk so it takes about YOUTUBE_UPLOAD_CHUNK_SECONDS to send"""
+        target = int(throughput_bps * settings.YOUTUBE_UPLOAD_CHUNK_SECONDS)
+        target = max(settings.YOUTUBE_UPLOAD_MIN_CHUNK_SIZE, min(settings.YOUTUBE_UPLOAD_MAX_CHUNK_SIZE, target))
+        return max(CHUNK_GRANULARITY, target // CHUNK_GRANULARITY * CHUNK_GRANULARITY)
+
+    def _run(self, job_id: str):
+        """Upload a job's file, persisting the session and offset after every chunk"""
+        # The Google client libraries load with the first upload, not at startup
+        from googleapiclient.errors import HttpError
+        from app.services.youtube_service import AdaptiveMediaFileUpload
+
+        job = self.get_job(job_id)
+        metadata = job["metadata"]
+        youtube_service = get_youtube_service()
+        try:
+            youtube = youtube_service._get_client()
+            http = youtube_service._get_http()
+            body = youtube_service.build_video_body(**metadata)
+
+            media = AdaptiveMediaFileUpload(job["file_path"], chunksize=job["chunk_size"])
+            insert_request = youtube.videos().insert(
+                part=','.join(body.keys()),
+                body=body,
+                media_body=media
+            )
+
+            response = None
+            if job["session_uri"]:
+                # The server may have received more than the last persisted offset, so ask it
+                offset, response = limiter.call(
+                    "youtube", "videos.insert", youtube_service.query_upload_offset,
+                    http, job["session_uri"], job["total_bytes"]
+                )
+                if settings.DEBUG: print(f"** Resuming upload {job_id} at byte {offset}...")
+                insert_request.resumable_uri = job["session_uri"]
+                insert_request.resumable_progress = offset
+
+            self._update(job_id, status="uploading", error=None)
+            throughput = job["throughput_bps"]
+            while response is None:
+                sent_before = insert_request.resumable_progress
+                start = time.perf_counter()
+                # A failed chunk leaves the request in its error state, so a retry asks the server where to resume
+                status, response = limiter.call("youtube", "videos.insert", insert_request.next_chunk, http=http)
+                elapsed = time.perf_counter() - start
+
+                sent = insert_request.resumable_progress - sent_before
+                if sent > 0 and elapsed > 0:
+                    # Smooth the measurement so one slow chunk doesn't collapse the size
+                    measured = sent / elapsed
+                    throughput = measured if throughput is None else 0.7 * throughput + 0.3 * measured
+                    media.set_chunksize(self._next_chunk_size(throughput))
+
+                self._update(
+                    job_id,
+                    session_uri=insert_request.resumable_uri,
+                    offset=insert_request.resumable_progress,
+                    chunk_size=media.chunksize(),
+                    throughput_bps=throughput
+                )
+                if status and settings.DEBUG:
+                    print(f"Upload {job_id}: {int(status.progress() * 100)}% at {f'{throughput / 1024 / 1024:.2f} MB/s' if throughput else 'n/a'}")
+
+            self._update(job_id, status="completed", video_id=response["id"], offset=job["total_bytes"])
+            if settings.DEBUG: print(f"Upload Complete! Video URL: https://www.youtube.com/watch?v={response['id']}")
+
+        except HttpError as e:
+            if job["session_uri"] and e.resp.status in (404, 410):
+                # The resumable session expired, start a fresh one from byte 0
+                if settings.DEBUG: print(f"** Upload session for {job_id} expired, restarting...")
+                self._update(job_id, status="queued", session_uri=None, offset=0)
+                self._executor.submit(self._run, job_id)
+                return
+            if settings.DEBUG: print(f"** Upload {job_id} failed: {e}")
+            self._update(job_id, status="failed", error=str(e))
+        except Exception as e:
+            if settings.DEBUG: print(f"** Upload {job_id} failed: {e}")
+            self._update(job_id, status="failed", error=str(e))
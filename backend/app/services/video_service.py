@@ -1,12 +1,22 @@
 import os
-import fal_client
-import requests
+import time
+import uuid
+import asyncio
 from typing import Optional
 from fastapi import UploadFile
 from app.core.config import settings
+from app.core.container import get_job_events, get_preview_service, get_storage_service
+from app.core.metrics import observe_stage, time_stage
+from app.core.rate_limit import limiter
 
 class VideoService:
     def __init__(self):
+        # Imported here so the SDKs only load when the service is first used
+        import fal_client
+        import requests
+
+        self.fal_client = fal_client
+        self.http = requests
         fal_client.key = settings.FAL_KEY
         os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
         os.makedirs(settings.OUTPUT_DIR, exist_ok=True)
@@ -17,78 +27,131 @@ class VideoService:
         with open(file_path, "wb") as buffer:
             content = await file.read()
             buffer.write(content)
+        get_storage_service().record_write(file_path)
         return file_path
 
-    def upload_to_fal(self, file_path: str) -> Optional[str]:
+    async def upload_to_fal(self, file_path: str) -> Optional[str]:
         """Upload a file to fal.ai and return its URL"""
         try:
-            url = fal_client.upload_file(file_path)
+            with time_stage("fal_upload"):
+                url = await limiter.acall("fal", "storage", self.fal_client.upload_file, file_path)
             print(f"Uploaded {file_path} successfully")
             return url
         except Exception as e:
             print(f"Failed to upload {file_path}: {str(e)}")
             return None
 
-    def download_video(self, url: str, filename: str) -> bool:
-        """Download a video from URL and save it"""
+    async def download_video(self, url: str, filename: str) -> bool:
+        """Download a video from URL and save it, streaming it to disk rather than holding it in memory"""
+        output_path = os.path.join(settings.OUTPUT_DIR, filename)
+        tmp_path = f"{output_path}.part"
+
+        def fetch():
+            with self.http.get(url, stream=True, timeout=settings.FAL_DOWNLOAD_TIMEOUT) as response:
+                # Raised here so the limiter sees the status and retries throttling and 5xx
+                response.raise_for_status()
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        f.write(chunk)
+
         try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                output_path = os.path.join(settings.OUTPUT_DIR, filename)
-                with open(output_path, "wb") as f:
-                    f.write(response.content)
-                print(f"Downloaded: {filename}")
-                return True
-            else:
-                print(f"Failed to download {filename}")
-                print(f"Status code: {response.status_code}")
-                return False
+            with time_stage("fal_download"):
+                await limiter.acall("fal", "cdn", fetch)
+            os.replace(tmp_path, output_path)
+            get_storage_service().record_write(output_path)
+            print(f"Downloaded: {filename}")
+            return True
         except Exception as e:
             print(f"Error downloading video: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
             return False
 
     async def generate_lip_sync(
         self, 
         video_file: UploadFile, 
-        audio_file: UploadFile
+        audio_file: UploadFile,
+        job_id: Optional[str] = None
     ) -> Optional[str]:
         """Generate a lip-synced video from input video and audio files"""
-        try:
-            # Save uploaded files
-            video_path = await self.save_uploaded_file(video_file, "input.mp4")
-            audio_path = await self.save_uploaded_file(audio_file, "input.wav")
+        # Save uploaded files
+        video_path = await self.save_uploaded_file(video_file, "input.mp4")
+        audio_path = await self.save_uploaded_file(audio_file, "input.wav")
+        return await self.lip_sync_files(video_path, audio_path, "lip_synced_output.mp4", job_id)
 
+    async def lip_sync_files(self, video_path: str, audio_path: str, output_filename: str, job_id: Optional[str] = None) -> Optional[str]:
+        """
+        Generate a lip-synced video from files already on disk and save it as `output_filename`
+
+        Progress is published to the job event hub as lipsync:<job_id>.
+        """
+        job_id = job_id or uuid.uuid4().hex
+        events = get_job_events()
+        try:
+            events.publish("lipsync", job_id, "uploading", 0.0, output_filename=output_filename)
             # Upload files to fal.ai
-            video_url = self.upload_to_fal(video_path)
-            audio_url = self.upload_to_fal(audio_path)
+            video_url, audio_url = await asyncio.gather(
+                self.upload_to_fal(video_path),
+                self.upload_to_fal(audio_path)
+            )
 
             if not video_url or not audio_url:
                 raise Exception("Failed to upload input files")
 
-            # Generate lip-sync video
-            result = fal_client.subscribe(
+            # Split the wait into time spent queued and time spent rendering
+            submitted_at = time.perf_counter()
+            started_at = None
+
+            events.publish("lipsync", job_id, "queued", 0.1)
+
+            def on_queue_update(update):
+                nonlocal started_at
+                if isinstance(update, self.fal_client.Queued):
+                    events.publish("lipsync", job_id, "queued", 0.1, position=update.position)
+                elif started_at is None and isinstance(update, self.fal_client.InProgress):
+                    started_at = time.perf_counter()
+                    events.publish("lipsync", job_id, "rendering", 0.2)
+
+            # Generate lip-sync video. Only the submit is retried as a whole: once
+            # fal has accepted the request, a failed poll resumes polling the same
+            # request instead of paying for a second render
+            handle = await limiter.acall(
+                "fal", "fal-ai/sync-lipsync", self.fal_client.submit,
                 "fal-ai/sync-lipsync",
                 arguments={
                     "video_url": video_url,
                     "audio_url": audio_url,
                     "face_detection_threshold": 0.8,
                     "output_format": "mp4"
-                },
-                with_logs=True
+                }
             )
 
+            def wait_for_result():
+                for update in handle.iter_events(with_logs=True):
+                    on_queue_update(update)
+                return handle.get()
+
+            result = await limiter.acall("fal", "fal-ai/sync-lipsync", wait_for_result)
+            finished_at = time.perf_counter()
+            started_at = started_at or submitted_at
+            observe_stage("fal_queue", started_at - submitted_at)
+            observe_stage("fal_render", finished_at - started_at)
+
             # Extract video URL from response
             if isinstance(result, dict) and 'video' in result and isinstance(result['video'], dict) and 'url' in result['video']:
                 output_url = result['video']['url']
+                events.publish("lipsync", job_id, "downloading", 0.9)
                 
                 # Download the generated video
-                if self.download_video(output_url, "lip_synced_output.mp4"):
-                    return os.path.join(settings.OUTPUT_DIR, "lip_synced_output.mp4")
+                if await self.download_video(output_url, output_filename):
+                    output_path = os.path.join(settings.OUTPUT_DIR, output_filename)
+                    get_preview_service().schedule(output_path)
+                    events.publish("lipsync", job_id, "completed", 1.0, output_path=output_path)
+                    return output_path
             
             raise Exception("Failed to generate or download video")
 
         except Exception as e:
-            print(f"Error in generate_lip_sync: {str(e)}")
+            print(f"Error in lip_sync_files: {str(e)}")
+            events.publish("lipsync", job_id, "failed", error=str(e))
             return None
-
-video_service = VideoService() 
\ No newline at end of file
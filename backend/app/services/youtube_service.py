@@ -1,11 +1,17 @@
-from typing import Optional, List
+from typing import Optional, List, Tuple
+from datetime import datetime, timedelta, timezone
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+import httplib2
 import os
+import json
 import pickle
+import threading
 from app.core.config import settings
 
 SCOPES = [
@@ -13,113 +19,138 @@ SCOPES = [
     'https://www.googleapis.com/auth/youtube'
 ]
 
+class AdaptiveMediaFileUpload(MediaFileUpload):
+    """MediaFileUpload whose chunk size can change between next_chunk calls"""
+
+    def __init__(self, filename: str, chunksize: int):
+        super().__init__(filename, chunksize=chunksize, resumable=True)
+        self._adaptive_chunksize = chunksize
+
+    def chunksize(self) -> int:
+        return self._adaptive_chunksize
+
+    def set_chunksize(self, chunksize: int):
+        self._adaptive_chunksize = chunksize
+
 class YouTubeService:
     def __init__(self):
         self.credentials = None
         self.token_path = 'token.pickle'
         self.credentials_path = 'client_secrets.json'
+        self._client = None
+        # Guards loading/refreshing credentials and building the client
+        self._lock = threading.Lock()
+        # httplib2 connections aren't thread-safe, so each thread gets its own
+        self._thread_local = threading.local()
+
+    def _needs_refresh(self, credentials: Credentials) -> bool:
+        """Check whether credentials are invalid or expire within the refresh margin"""
+        if not credentials.valid:
+            return True
+        if credentials.expiry is None:
+            return False
+        # google-auth stores expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return credentials.expiry - now < timedelta(seconds=settings.YOUTUBE_TOKEN_REFRESH_MARGIN)
+
+    def _save_credentials(self):
+        with open(self.token_path, 'wb') as token:
+            pickle.dump(self.credentials, token)
 
     def _get_credentials(self) -> Optional[Credentials]:
-        """Get or refresh credentials for YouTube API"""
-        if os.path.exists(self.token_path):
-            with open(self.token_path, 'rb') as token:
-                self.credentials = pickle.load(token)
+        """Get credentials for YouTube API, loading them once and refreshing them in memory before expiry"""
+        with self._lock:
+            if self.credentials is None and os.path.exists(self.token_path):
+                with open(self.token_path, 'rb') as token:
+                    self.credentials = pickle.load(token)
 
-        if not self.credentials or not self.credentials.valid:
-            if self.credentials and self.credentials.expired and self.credentials.refresh_token:
-                self.credentials.refresh(Request())
-            else:
+            if not self.credentials or (self._needs_refresh(self.credentials) and not self.credentials.refresh_token):
                 flow = InstalledAppFlow.from_client_secrets_file(
                     self.credentials_path, SCOPES)
                 self.credentials = flow.run_local_server(port=0)
+                self._client = None
+                self._save_credentials()
+            elif self._needs_refresh(self.credentials):
+                if settings.DEBUG: print("** Refreshing YouTube credentials...")
+                # Refreshing updates the object in place, so the cached client keeps working
+                self.credentials.refresh(Request())
+                self._save_credentials()
+
+            return self.credentials
+
+    def _get_client(self):
+        """Get the YouTube API client, built once from the discovery document bundled with the library"""
+        credentials = self._get_credentials()
+        if not credentials:
+            raise Exception("Failed to get YouTube credentials")
+
+        with self._lock:
+            if self._client is None:
+                self._client = build(
+                    'youtube', 'v3',
+                    credentials=credentials,
+                    static_discovery=True,
+                    cache_discovery=False
+                )
+            return self._client
 
-            with open(self.token_path, 'wb') as token:
-                pickle.dump(self.credentials, token)
+    def _get_http(self) -> AuthorizedHttp:
+        """Get this thread's authorized HTTP connection"""
+        http = getattr(self._thread_local, 'http', None)
+        if http is None or http.credentials is not self.credentials:
+            http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+            self._thread_local.http = http
+        return http
 
-        return self.credentials
+    def query_upload_offset(self, http: AuthorizedHttp, session_uri: str, total_bytes: int) -> Tuple[int, Optional[dict]]:
+        """
+        Ask a resumable upload session how many bytes it already has
 
-    def upload_video(
-        self, 
-        file_path: str, 
-        title: str, 
-        description: str, 
+        Returns (bytes received, None) for an unfinished upload, or
+        (total_bytes, video resource) if the upload completed before it
+        could be recorded. An expired session raises HttpError 404/410.
+        """
+        response, content = http.request(
+            session_uri,
+            method="PUT",
+            body=b"",
+            headers={"Content-Range": f"bytes */{total_bytes}", "Content-Length": "0"}
+        )
+        if response.status in (200, 201):
+            return total_bytes, json.loads(content)
+        if response.status == 308:
+            # "Range: bytes=0-<last byte received>", absent when nothing has been received
+            received = response.get("range")
+            return (int(received.rsplit("-", 1)[1]) + 1 if received else 0), None
+        raise HttpError(response, content, uri=session_uri)
+
+    def build_video_body(
+        self,
+        title: str,
+        description: str,
         privacy_status: str = "public",
         tags: Optional[List[str]] = None,
-        category_id: str = "22",  # People & Blogs
+        category_id: str = "22",
         language: str = "en"
-    ) -> str:
-        """
-        Upload a video to YouTube
-        
-        Args:
-            file_path: Path to the video file
-            title: Video title
-            description: Video description
-            privacy_status: Video privacy status (public, unlisted, private)
-            tags: List of video tags
-            category_id: YouTube video category ID (default: People & Blogs)
-            language: Video language code
-            
-        Returns:
-            YouTube video ID
-        """
-        try:
-            credentials = self._get_credentials()
-            if not credentials:
-                raise Exception("Failed to get YouTube credentials")
-
-            youtube = build('youtube', 'v3', credentials=credentials)
-
-            if tags is None:
-                tags = ['AI Generated', 'Summary', 'Educational']
-
-            body = {
-                'snippet': {
-                    'title': title,
-                    'description': description,
-                    'tags': tags,
-                    'categoryId': category_id,
-                    'defaultLanguage': language,
-                    'defaultAudioLanguage': language
-                },
-                'status': {
-                    'privacyStatus': privacy_status,
-                    'selfDeclaredMadeForKids': False,
-                    'license': 'youtube',
-                    'embeddable': True,
-                    'publicStatsViewable': True
-                }
+    ) -> dict:
+        """Build the snippet/status body for a videos.insert request"""
+        if tags is None:
+            tags = ['AI Generated', 'Summary', 'Educational']
+
+        return {
+            'snippet': {
+                'title': title,
+                'description': description,
+                'tags': tags,
+                'categoryId': category_id,
+                'defaultLanguage': language,
+                'defaultAudioLanguage': language
+            },
+            'status': {
+                'privacyStatus': privacy_status,
+                'selfDeclaredMadeForKids': False,
+                'license': 'youtube',
+                'embeddable': True,
+                'publicStatsViewable': True
             }
-
-            if settings.DEBUG:
-                print(f"Starting upload of video: {title}")
-                print(f"Privacy status: {privacy_status}")
-
-            insert_request = youtube.videos().insert(
-                part=','.join(body.keys()),
-                body=body,
-                media_body=MediaFileUpload(
-                    file_path,
-                    chunksize=1024*1024,  # 1MB chunks
-                    resumable=True
-                )
-            )
-
-            response = None
-            while response is None:
-                status, response = insert_request.next_chunk()
-                if status and settings.DEBUG:
-                    print(f"Uploaded {int(status.progress() * 100)}%")
-
-            if settings.DEBUG:
-                print(f"Upload Complete! Video ID: {response['id']}")
-                print(f"Video URL: https://www.youtube.com/watch?v={response['id']}")
-
-            return response['id']
-
-        except Exception as e:
-            if settings.DEBUG:
-                print(f"An error occurred during upload: {e}")
-            raise Exception(f"Failed to upload video: {str(e)}")
-
-youtube_service = YouTubeService() 
\ No newline at end of file
+        }
@@ -0,0 +1,85 @@
+"""
+Compare two benchmark results
+
+    python -m benchmarks.compare                      # latest two results
+    python -m benchmarks.compare BASELINE.json        # baseline vs latest
+    python -m benchmarks.compare OLD.json NEW.json --threshold 0.2
+
+Exits with status 1 when any metric regressed by more than the threshold.
+"""
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Optional
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Metric name suffixes where a smaller number is better, and where a bigger one is
+LOWER_IS_BETTER = ("_ms", "_s", "_mb", "errors")
+HIGHER_IS_BETTER = ("_rps", "_per_second", "_fidelity")
+
+def direction(metric: str) -> Optional[int]:
+    """-1 if lower is better, 1 if higher is better, None for informational metrics"""
+    if metric.endswith(HIGHER_IS_BETTER):
+        return 1
+    # Totals and sizes that depend on the options rather than on the code
+    if metric in ("elapsed_s", "file_mb", "final_chunk_mb"):
+        return None
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    return None
+
+def load(path: Path) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark results")
+    parser.add_argument("files", nargs="*", type=Path, help="Baseline and current result files (default: the latest two)")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change counted as a regression (default: 0.1)")
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    recorded = sorted(args.results_dir.glob("*.json"))
+    if len(args.files) == 2:
+        baseline_path, current_path = args.files
+    elif len(args.files) == 1 and recorded:
+        baseline_path, current_path = args.files[0], recorded[-1]
+    elif len(recorded) >= 2:
+        baseline_path, current_path = recorded[-2], recorded[-1]
+    else:
+        parser.error(f"Need two result files, found {len(recorded)} in {args.results_dir}")
+
+    baseline, current = load(baseline_path), load(current_path)
+    print(f"Baseline: {baseline_path.name} ({baseline['commit'][:8]})")
+    print(f"Current:  {current_path.name} ({current['commit'][:8]})")
+    if baseline.get("options") != current.get("options") or baseline.get("profiles") != current.get("profiles"):
+        print("Warning: the runs used different options or fake profiles")
+
+    regressions = 0
+    for scenario, metrics in current["results"].items():
+        base_metrics = baseline["results"].get(scenario)
+        if base_metrics is None:
+            print(f"\n{scenario}: new scenario")
+            continue
+        print(f"\n{scenario}")
+        for metric, value in metrics.items():
+            base_value = base_metrics.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(base_value, (int, float)):
+                continue
+            change = (value - base_value) / base_value if base_value else 0.0
+            better = direction(metric)
+            flag = ""
+            if better is not None and change * better < -args.threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            elif better is not None and change * better > args.threshold:
+                flag = "  improved"
+            print(f"  {metric:<22} {base_value:>12} -> {value:<12} {change:+8.1%}{flag}")
+
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+import time
+import random
+import hashlib
+import itertools
+import threading
+from collections import deque
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Optional
+
+class FakeAPIError(RuntimeError):
+    """Error raised by a fake client to simulate a failed remote call"""
+
+    def __init__(self, message: str, status_code: int = 503, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = SimpleNamespace(
+            status_code=status_code,
+            headers={"retry-after": str(retry_after)} if retry_after is not None else {}
+        )
+
+@dataclass
+class FakeProfile:
+    """How a fake remote API behaves: per-call latency, failures and response size"""
+    latency: float = 0.1
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    # Requests per second the fake accepts before answering 429, 0 for no limit
+    rate_limit: float = 0.0
+    payload_bytes: int = 64 * 1024
+    # Upload bandwidth, only used by the YouTube fake
+    bandwidth_bps: float = 20 * 1024 * 1024
+
+class FakeRemote:
+    def __init__(self, name: str, profile: FakeProfile, seed: int = 0):
+        self.name = name
+        self.profile = profile
+        self._rng = random.Random(f"{name}-{seed}")
+        self._rng_lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.throttled = 0
+        self._recent_calls: deque = deque()
+
+    def simulate(self, extra_seconds: float = 0.0):
+        """
+        Block like a synchronous SDK call would, then maybe fail
+
+        The real SDK calls are blocking, so this deliberately sleeps on the
+        calling thread, including the event loop when called from it.
+        """
+        with self._rng_lock:
+            self.calls += 1
+            if self.profile.rate_limit:
+                # Sliding one-second window, like a provider's requests-per-second limit
+                now = time.monotonic()
+                while self._recent_calls and now - self._recent_calls[0] > 1.0:
+                    self._recent_calls.popleft()
+                if len(self._recent_calls) >= self.profile.rate_limit:
+                    self.throttled += 1
+                    raise FakeAPIError(f"Simulated {self.name} rate limit", status_code=429, retry_after=1.0 - (now - self._recent_calls[0]))
+                self._recent_calls.append(now)
+            delay = self.profile.latency + self._rng.uniform(-self.profile.jitter, self.profile.jitter)
+            failed = self._rng.random() < self.profile.error_rate
+            self.errors += failed
+        time.sleep(max(0.0, delay) + extra_seconds)
+        if failed:
+            raise FakeAPIError(f"Simulated {self.name} failure")
+
+    def payload(self, key: str) -> bytes:
+        """Deterministic response body of the configured size"""
+        block = hashlib.sha256(key.encode()).digest()
+        size = self.profile.payload_bytes
+        return (block * (size // len(block) + 1))[:size]
+
+class FakeOpenAI(FakeRemote):
+    """Stands in for the instructor-patched OpenAI client used by AudioService"""
+
+    def __init__(self, profile: FakeProfile, seed: int = 0):
+        super().__init__("openai", profile, seed)
+        self._counter = itertools.count()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+        self.audio = SimpleNamespace(speech=SimpleNamespace(create=self._create_speech))
+
+    def _create_completion(self, model: str, response_model, messages: list, **kwargs):
+        self.simulate()
+        n = next(self._counter)
+        return response_model(
+            soundbite=f"Benchmark soundbite number {n}: {messages[-1]['content'][-80:]}",
+            duration=12,
+            tone="energetic",
+            music="lo-fi",
+            hook_elements=["question opener"],
+            timing_markers=["0:00"],
+            trending_potential=7,
+            target_audience="everyone",
+            hashtags=["#benchmark"],
+        )
+
+    def _create_speech(self, model: str, voice: str, input: str, **kwargs):
+        self.simulate()
+        return SimpleNamespace(content=self.payload(input))
+
+class FakeGemini(FakeRemote):
+    """Stands in for the instructor Gemini client used by SummariesService"""
+
+    def __init__(self, profile: FakeProfile, seed: int = 0):
+        super().__init__("gemini", profile, seed)
+
+    def create(self, response_model, messages: list, **kwargs):
+        self.simulate()
+        summary = response_model.model_fields["summaries"].annotation.__args__[0]
+        return response_model(
+            summaries=[
+                summary(
+                    topic="Benchmark topic",
+                    summary="A fixed summary returned by the offline Gemini stand-in.",
+                    key_words=["benchmark"],
+                    related_personnel=["Senator Example (Independent)"],
+                )
+            ],
+            is_valuable="GOOD",
+        )
+
+class FakeFal(FakeRemote):
+    """Stands in for the fal_client module used by VideoService"""
+
+    class Queued(SimpleNamespace):
+        pass
+
+    class InProgress(SimpleNamespace):
+        pass
+
+    class Completed(SimpleNamespace):
+        pass
+
+    def __init__(self, profile: FakeProfile, seed: int = 0):
+        super().__init__("fal", profile, seed)
+        self._counter = itertools.count()
+        self.key = None
+
+    def upload_file(self, path: str) -> str:
+        self.simulate()
+        return f"https://fal.invalid/files/{next(self._counter)}"
+
+    def submit(self, application: str, arguments: dict) -> "FakeFalHandle":
+        self.simulate()
+        return FakeFalHandle(self, f"fake-{next(self._counter)}")
+
+    def subscribe(self, application: str, arguments: dict, with_logs: bool = False, on_queue_update=None):
+        handle = self.submit(application, arguments)
+        for update in handle.iter_events(with_logs=with_logs):
+            if on_queue_update:
+                on_queue_update(update)
+        return handle.get()
+
+class FakeFalHandle:
+    """The request handle FakeFal.submit returns, like fal_client.SyncRequestHandle"""
+
+    def __init__(self, fal: FakeFal, request_id: str):
+        self.fal = fal
+        self.request_id = request_id
+
+    def iter_events(self, with_logs: bool = False, interval: float = 0.1):
+        # The profile latency is spent once waiting in the queue and once rendering
+        yield self.fal.Queued(position=0)
+        yield self.fal.InProgress(logs=[])
+        time.sleep(self.fal.profile.latency)
+        yield self.fal.Completed(logs=[])
+
+    def get(self) -> dict:
+        return {"video": {"url": f"https://fal.invalid/results/{self.request_id}.mp4"}}
+
+class FakeHttp(FakeRemote):
+    """Stands in for `requests` when downloading rendered videos"""
+
+    def __init__(self, profile: FakeProfile, seed: int = 0):
+        super().__init__("fal_cdn", profile, seed)
+
+    def get(self, url: str, **kwargs) -> "FakeResponse":
+        try:
+            self.simulate()
+        except FakeAPIError as e:
+            return FakeResponse(e.status_code, b"")
+        return FakeResponse(200, self.payload(url))
+
+class FakeResponse:
+    """The parts of requests.Response used by a streamed download"""
+
+    def __init__(self, status_code: int, content: bytes):
+        self.status_code = status_code
+        self.content = content
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise FakeAPIError(f"Simulated HTTP {self.status_code}", status_code=self.status_code)
+
+    def iter_content(self, chunk_size: int = 1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+class FakeInsertRequest:
+    """Resumable videos.insert request that 'uploads' at the configured bandwidth"""
+
+    def __init__(self, remote: FakeRemote, media_body):
+        self.remote = remote
+        self.media = media_body
+        self.resumable_uri = f"https://upload.invalid/session/{id(self)}"
+        self.resumable_progress = 0
+
+    def next_chunk(self, http=None, num_retries: int = 0):
+        total = self.media.size()
+        sent = min(self.media.chunksize(), total - self.resumable_progress)
+        self.remote.simulate(extra_seconds=sent / self.remote.profile.bandwidth_bps)
+        self.resumable_progress += sent
+        self.remote.sessions[self.resumable_uri] = self.resumable_progress
+        if self.resumable_progress >= total:
+            return None, {"id": hashlib.sha1(self.resumable_uri.encode()).hexdigest()[:11]}
+        return SimpleNamespace(progress=lambda: self.resumable_progress / total), None
+
+class FakeYouTubeService(FakeRemote):
+    """Stands in for YouTubeService as used by the upload queue"""
+
+    def __init__(self, profile: FakeProfile, seed: int = 0):
+        super().__init__("youtube", profile, seed)
+        # Bytes received per resumable session
+        self.sessions = {}
+
+    def _get_client(self):
+        videos = SimpleNamespace(insert=lambda part, body, media_body: FakeInsertRequest(self, media_body))
+        return SimpleNamespace(videos=lambda: videos)
+
+    def _get_http(self):
+        return None
+
+    def query_upload_offset(self, http, session_uri: str, total_bytes: int):
+        self.simulate()
+        return self.sessions.get(session_uri, 0), None
+
+    def build_video_body(self, title: str, description: str, privacy_status: str = "public", tags: Optional[list] = None, category_id: str = "22", language: str = "en") -> dict:
+        return {
+            "snippet": {"title": title, "description": description, "tags": tags or [], "categoryId": category_id},
+            "status": {"privacyStatus": privacy_status},
+        }
+
+DEFAULT_PROFILES = {
+    "openai": FakeProfile(latency=0.4, jitter=0.1, payload_bytes=160 * 1024),
+    "gemini": FakeProfile(latency=1.0, jitter=0.2),
+    "fal": FakeProfile(latency=0.5, jitter=0.1, payload_bytes=2 * 1024 * 1024),
+    "youtube": FakeProfile(latency=0.05, bandwidth_bps=40 * 1024 * 1024),
+}
+
+def install_fakes(container, profiles: dict, seed: int = 0) -> dict:
+    """
+    Build the real services with their SDK clients swapped for fakes
+
+    Everything between the route and the SDK call (CSV bookkeeping, file
+    writes, ffmpeg scheduling, the upload queue) still runs for real.
+    """
+    from app.services.audio_service import AudioService
+    from app.services.prompt_cache import LocalPromptCache
+    from app.services.summaries_service import SummariesService
+    from app.services.video_service import VideoService
+
+    fakes = {
+        "openai": FakeOpenAI(profiles["openai"], seed),
+        "gemini": FakeGemini(profiles["gemini"], seed),
+        "fal": FakeFal(profiles["fal"], seed),
+        "fal_cdn": FakeHttp(profiles["fal"], seed),
+        "youtube": FakeYouTubeService(profiles["youtube"], seed),
+    }
+
+    audio_service = AudioService()
+    audio_service.client = fakes["openai"]
+    container.override("audio", audio_service)
+
+    summaries_service = SummariesService()
+    summaries_service.llm_client = fakes["gemini"]
+    summaries_service.prompt_cache = LocalPromptCache()
+    container.override("summaries", summaries_service)
+
+    video_service = VideoService()
+    video_service.fal_client = fakes["fal"]
+    video_service.http = fakes["fal_cdn"]
+    container.override("video", video_service)
+
+    container.override("youtube", fakes["youtube"])
+    return fakes
@@ -0,0 +1,169 @@
+"""
+Offline benchmarks for the backend
+
+Runs the FastAPI app in-process against fake OpenAI, Gemini, fal and
+YouTube clients and records throughput, latency and memory per commit.
+
+    cd backend
+    python -m benchmarks.run                       # everything, default load
+    python -m benchmarks.run -s audio,media -n 50  # selected scenarios
+    python -m benchmarks.run --set openai.latency=1.5 --set fal.error_rate=0.05
+    python -m benchmarks.compare                   # latest run vs the one before
+"""
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import contextlib
+from dataclasses import asdict, fields, replace
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCHMARKS_DIR / "results"
+
+def git_revision() -> dict:
+    """Commit being benchmarked, and whether the tree has uncommitted changes"""
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=BENCHMARKS_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "HEAD") or "unknown", "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": "unknown", "dirty": False}
+
+def max_rss_mb() -> float:
+    """Peak resident memory of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+def parse_overrides(values, profiles: dict) -> dict:
+    """Apply `service.field=value` overrides to the fake profiles"""
+    profiles = dict(profiles)
+    for value in values:
+        key, _, raw = value.partition("=")
+        service, _, field_name = key.partition(".")
+        if service not in profiles or not raw:
+            raise argparse.ArgumentTypeError(f"Expected <{'|'.join(profiles)}>.<field>=<value>, got '{value}'")
+        field_types = {f.name: f.type for f in fields(profiles[service])}
+        if field_name not in field_types:
+            raise argparse.ArgumentTypeError(f"Unknown field '{field_name}', expected one of: {', '.join(field_types)}")
+        cast = int if field_types[field_name] in (int, "int") else float
+        profiles[service] = replace(profiles[service], **{field_name: cast(raw)})
+    return profiles
+
+async def run_scenarios(args, profiles: dict) -> dict:
+    # Imported after the working directory and environment are set up
+    import httpx
+    from app.main import app
+    from app.core.container import container
+    from benchmarks.fakes import install_fakes
+    from benchmarks.scenarios import SCENARIOS, BenchContext
+
+    fakes = install_fakes(container, profiles, seed=args.seed)
+    options = {
+        "pdfs": args.pdfs,
+        "pdf_pages": args.pdf_pages,
+        "upload_mb": args.upload_mb,
+        "media_mb": args.media_mb,
+        "csv_rows": args.csv_rows,
+        "csv_ops": args.csv_ops,
+        "uploads": args.uploads,
+        "youtube_mb": args.youtube_mb,
+    }
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        ctx = BenchContext(client, container, fakes, args.requests, args.concurrency, options)
+        for name in args.scenarios:
+            print(f"Running {name}...", flush=True)
+            # The services print a lot; keep the benchmark output readable
+            output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with output:
+                scenario_results = await SCENARIOS[name](ctx)
+            for scenario, metrics in scenario_results.items():
+                metrics["max_rss_mb"] = max_rss_mb()
+                results[scenario] = metrics
+                print(f"  {scenario}: " + ", ".join(f"{key}={value}" for key, value in metrics.items()))
+
+    container.get("upload_queue").shutdown()
+    return results
+
+def main():
+    # Keep the app quiet and make sure no real credentials are ever picked up
+    os.environ["DEBUG"] = "false"
+    for key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "FAL_KEY"):
+        os.environ[key] = "offline-benchmark"
+    sys.path.insert(0, str(BENCHMARKS_DIR.parent))
+
+    from benchmarks.fakes import DEFAULT_PROFILES
+    from benchmarks.scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(description="Run the offline backend benchmarks")
+    parser.add_argument("-s", "--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated scenarios (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("-n", "--requests", type=int, default=20, help="Requests per HTTP scenario (default: 20)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Requests in flight at once (default: 4)")
+    parser.add_argument("--pdfs", type=int, default=2, help="Sample PDFs to summarise (default: 2)")
+    parser.add_argument("--pdf-pages", type=int, default=60, help="Pages per sample PDF (default: 60)")
+    parser.add_argument("--upload-mb", type=int, default=8, help="Size of the lip-sync input video in MB (default: 8)")
+    parser.add_argument("--media-mb", type=int, default=50, help="Size of the downloaded video in MB (default: 50)")
+    parser.add_argument("--csv-rows", type=int, default=100_000, help="Rows to grow the CSV to (default: 100000)")
+    parser.add_argument("--csv-ops", type=int, default=10, help="Timed operations per CSV checkpoint (default: 10)")
+    parser.add_argument("--uploads", type=int, default=4, help="Concurrent YouTube uploads (default: 4)")
+    parser.add_argument("--youtube-mb", type=int, default=64, help="Size of each uploaded video in MB (default: 64)")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="SERVICE.FIELD=VALUE", help="Override a fake's behaviour, e.g. openai.latency=0.8 or fal.error_rate=0.05")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for simulated jitter and errors (default: 0)")
+    parser.add_argument("--work-dir", help="Where generated files go (default: a fresh temporary directory)")
+    parser.add_argument("--results-dir", default=str(RESULTS_DIR), help=f"Where results are recorded (default: {RESULTS_DIR})")
+    parser.add_argument("--verbose", action="store_true", help="Show the services' own output")
+    args = parser.parse_args()
+
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(unknown)}")
+    try:
+        profiles = parse_overrides(args.overrides, DEFAULT_PROFILES)
+    except (argparse.ArgumentTypeError, ValueError) as e:
+        parser.error(str(e))
+
+    results_dir = Path(args.results_dir).resolve()
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="shoutout-bench-")).resolve()
+    work_dir.mkdir(parents=True, exist_ok=True)
+    # Every relative data/output path in the settings now lands in the work dir
+    os.chdir(work_dir)
+    print(f"Working in {work_dir}")
+
+    started = time.time()
+    results = asyncio.run(run_scenarios(args, profiles))
+
+    revision = git_revision()
+    record = {
+        **revision,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "duration_s": round(time.time() - started, 1),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "options": {key: value for key, value in vars(args).items() if key not in ("work_dir", "results_dir", "verbose", "overrides")},
+        "profiles": {name: asdict(profile) for name, profile in profiles.items()},
+        "results": results,
+    }
+
+    results_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    result_path = results_dir / f"{stamp}_{revision['commit'][:8]}{'-dirty' if revision['dirty'] else ''}.json"
+    with open(result_path, "w") as f:
+        json.dump(record, f, indent=2)
+    print(f"Results written to {result_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import os
+import random
+from typing import List
+
+SPEAKERS = [
+    "Senator Smith (Labor)",
+    "Senator Nguyen (Liberal)",
+    "Mr Patel (Greens)",
+    "Ms O'Brien (Independent)",
+    "The SPEAKER",
+]
+
+WORDS = (
+    "budget housing climate energy health education infrastructure migration "
+    "amendment committee motion question minister report funding regional "
+    "community transport water agriculture defence trade workforce policy"
+).split()
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _page_lines(rng: random.Random, lines_per_page: int) -> list:
+    lines = []
+    while len(lines) < lines_per_page:
+        lines.append(f"{rng.choice(SPEAKERS)}:")
+        for _ in range(rng.randint(2, 5)):
+            lines.append(" ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + ".")
+    return lines[:lines_per_page]
+
+def _table_page(rng: random.Random, rows: int) -> tuple:
+    """
+    A ruled division list: member, party and vote columns
+
+    Like many PDF producers, the content stream draws the table column by
+    column, so only layout-aware extraction gets the rows back in reading
+    order. Returns the content operators and the text in reading order.
+    """
+    members = [(f"{rng.choice(['Senator', 'Mr', 'Ms'])} {rng.choice(WORDS).capitalize()}",
+                rng.choice(["Labor", "Liberal", "Greens", "Independent"]),
+                rng.choice(["Aye", "No"])) for _ in range(rows)]
+    columns = (50, 250, 400)
+    top, height, right = 780, 14, 500
+
+    ops = ["0.5 w"]
+    for row in range(rows + 1):
+        y = top - row * height - 3
+        ops.append(f"{columns[0] - 5} {y} m {right} {y} l S")
+    for x in columns + (right,):
+        x = x - 5 if x != right else x
+        ops.append(f"{x} {top - 3} m {x} {top - rows * height - 3} l S")
+    for column, x in enumerate(columns):
+        ops += ["BT", "/F1 10 Tf"]
+        for row, member in enumerate(members):
+            ops.append(f"1 0 0 1 {x} {top - (row + 1) * height + 2} Tm ({_escape(member[column])}) Tj")
+        ops.append("ET")
+    return ops, [" ".join(member) for member in members]
+
+def write_sample_pdf(path: str, pages: int, lines_per_page: int = 45, seed: int = 0, table_every: int = 0) -> List[str]:
+    """
+    Write a Hansard-like text PDF with the given number of pages
+
+    The file is built by hand (one Helvetica content stream per page) so
+    the benchmarks need no PDF writer library. With `table_every`, every
+    Nth page is a ruled division list instead of debate text. Returns the
+    text of each page in reading order, to measure extraction against.
+    """
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    page_texts = []
+    for number in range(1, pages + 1):
+        if table_every and number % table_every == 0:
+            text, lines = _table_page(rng, lines_per_page)
+        else:
+            lines = _page_lines(rng, lines_per_page)
+            text = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+            for line in lines:
+                text.append(f"({_escape(line)}) Tj T*")
+            text.append("ET")
+        page_texts.append("\n".join(lines))
+        content = "\n".join(text).encode("latin-1")
+
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref_offset = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset))
+    return page_texts
+
+def write_payload_file(path: str, size: int):
+    """Write a file of the given size for download and upload benchmarks"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            f.write(block[:min(remaining, len(block))])
+            remaining -= len(block)
@@ -0,0 +1,364 @@
+import os
+import time
+import json
+import random
+import asyncio
+import difflib
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List
+import httpx
+import pandas as pd
+from benchmarks.samples import write_payload_file, write_sample_pdf
+
+MB = 1024 * 1024
+
+@dataclass
+class BenchContext:
+    client: httpx.AsyncClient
+    container: object
+    fakes: dict
+    requests: int
+    concurrency: int
+    options: dict
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(q / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+def latency_stats(latencies: List[float], prefix: str = "") -> dict:
+    return {
+        f"{prefix}p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        f"{prefix}p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        f"{prefix}max_ms": round(max(latencies, default=0.0) * 1000, 2),
+    }
+
+async def drive(
+    send: Callable[[int], Awaitable[httpx.Response]],
+    total: int,
+    concurrency: int,
+    expected_status: int = 200
+) -> dict:
+    """Issue `total` requests with at most `concurrency` in flight and summarise them"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await send(i)
+                failed = response.status_code != expected_status
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 3) if elapsed else 0.0,
+        **latency_stats(latencies),
+    }
+
+async def bench_audio(ctx: BenchContext) -> Dict[str, dict]:
+    """Script generation + TTS through POST /api/v1/audio/generate/audio"""
+    async def send(i: int):
+        return await ctx.client.post("/api/v1/audio/generate/audio", json={
+            "input_text": f"Benchmark input {i}: the committee debated the regional housing budget.",
+            "voice_type": "nova",
+        })
+
+    result = await drive(send, ctx.requests, ctx.concurrency)
+    result["openai_calls"] = ctx.fakes["openai"].calls
+    result["openai_throttled"] = ctx.fakes["openai"].throttled
+    return {"audio_generate": result}
+
+async def bench_pdf(ctx: BenchContext) -> Dict[str, dict]:
+    """
+    PDF summarisation through POST /api/v1/summaries/process/
+
+    The summary runs as a background task, which the in-process transport
+    waits for, so latency covers the whole document.
+    """
+    pages = ctx.options["pdf_pages"]
+    paths = []
+    for i in range(ctx.options["pdfs"]):
+        path = os.path.abspath(f"samples/hansard_{i}.pdf")
+        write_sample_pdf(path, pages, seed=i)
+        paths.append(path)
+
+    calls_before = ctx.fakes["gemini"].calls
+    summaries = ctx.container.get("summaries")
+    reports_before = len(summaries.prompt_cache_reports)
+
+    async def send(i: int):
+        return await ctx.client.post("/api/v1/summaries/process/", json={"pdf_path": paths[i]})
+
+    result = await drive(send, len(paths), ctx.concurrency)
+    result["pages_per_second"] = round(len(paths) * pages / result["elapsed_s"], 2) if result["elapsed_s"] else 0.0
+    result["gemini_calls"] = ctx.fakes["gemini"].calls - calls_before
+    result["prompt_tokens_saved"] = sum(report["tokens_saved"] for report in list(summaries.prompt_cache_reports)[reports_before:])
+    return {"pdf_summarise": result}
+
+async def bench_lip_sync(ctx: BenchContext) -> Dict[str, dict]:
+    """Upload, fal submission and download through POST /api/v1/lip-sync/"""
+    video_bytes = os.urandom(ctx.options["upload_mb"] * MB)
+    audio_bytes = os.urandom(max(1, ctx.options["upload_mb"] // 4) * MB)
+
+    async def send(i: int):
+        return await ctx.client.post("/api/v1/lip-sync/", files={
+            "video": ("clip.mp4", video_bytes, "video/mp4"),
+            "audio": ("voice.wav", audio_bytes, "audio/wav"),
+        })
+
+    result = await drive(send, ctx.requests, ctx.concurrency)
+    result["fal_calls"] = ctx.fakes["fal"].calls
+    result["fal_throttled"] = ctx.fakes["fal"].throttled
+    return {"lip_sync": result}
+
+async def bench_media(ctx: BenchContext) -> Dict[str, dict]:
+    """Full, ranged and revalidating downloads through GET /api/v1/download/{filename}"""
+    size = ctx.options["media_mb"] * MB
+    write_payload_file("generated_videos/benchmark.mp4", size)
+    url = "/api/v1/download/benchmark.mp4"
+
+    # The first request also pays for hashing the file
+    start = time.perf_counter()
+    first = await ctx.client.get(url)
+    first_ms = round((time.perf_counter() - start) * 1000, 2)
+    etag = first.headers["etag"]
+
+    full = await drive(lambda i: ctx.client.get(url), ctx.requests, ctx.concurrency)
+    full["first_request_ms"] = first_ms
+    full["mb_per_second"] = round(full["requests"] * size / MB / full["elapsed_s"], 1) if full["elapsed_s"] else 0.0
+
+    ranged = await drive(
+        lambda i: ctx.client.get(url, headers={"Range": f"bytes={i * MB % size}-{i * MB % size + MB - 1}"}),
+        ctx.requests, ctx.concurrency, expected_status=206
+    )
+    revalidate = await drive(
+        lambda i: ctx.client.get(url, headers={"If-None-Match": etag}),
+        ctx.requests, ctx.concurrency, expected_status=304
+    )
+    return {"media_full": full, "media_range": ranged, "media_revalidate": revalidate}
+
+def text_fidelity(extracted: str, truth: str) -> float:
+    """Similarity of the word sequences, so dropped, garbled or reordered text all count against it"""
+    def words(text: str) -> List[str]:
+        return text.replace("\u2019", "'").lower().split()
+    return difflib.SequenceMatcher(None, words(extracted), words(truth), autojunk=False).ratio()
+
+async def bench_pdf_extract(ctx: BenchContext) -> Dict[str, dict]:
+    """
+    Pages per second and text fidelity of each PDF extraction backend
+
+    Every fifth page of the sample documents is a ruled table drawn column
+    by column, which only layout-aware extraction reads back row by row.
+    Fidelity compares the extracted words to the text the page was written
+    from (1.0 is identical).
+    """
+    from app.services.pdf_extraction import EXTRACTORS, open_pdf
+
+    documents = []
+    for i in range(ctx.options["pdfs"]):
+        path = os.path.abspath(f"samples/extract_{i}.pdf")
+        documents.append((path, write_sample_pdf(path, ctx.options["pdf_pages"], seed=i, table_every=5)))
+
+    def extract_all(backend: str) -> dict:
+        fidelity = {"text": [], "table": []}
+        table_pages = 0
+        start = time.perf_counter()
+        for path, truth in documents:
+            with open_pdf(path, backend) as pdf:
+                texts = [pdf.extract_text(index) for index in range(len(pdf))]
+                table_pages += getattr(pdf, "table_pages", 0)
+            for number, (text, expected) in enumerate(zip(texts, truth), start=1):
+                fidelity["table" if number % 5 == 0 else "text"].append(text_fidelity(text, expected))
+        elapsed = time.perf_counter() - start
+
+        pages = sum(len(truth) for _, truth in documents)
+        result = {
+            "pages": pages,
+            "elapsed_s": round(elapsed, 3),
+            "pages_per_second": round(pages / elapsed, 1) if elapsed else 0.0,
+            "text_fidelity": round(sum(fidelity["text"]) / len(fidelity["text"]), 4) if fidelity["text"] else None,
+            "table_fidelity": round(sum(fidelity["table"]) / len(fidelity["table"]), 4) if fidelity["table"] else None,
+        }
+        if backend == "auto":
+            result["table_pages_detected"] = table_pages
+        return result
+
+    return {f"pdf_extract_{backend}": await asyncio.to_thread(extract_all, backend) for backend in EXTRACTORS}
+
+def _bulk_rows(start_id: int, count: int, rng: random.Random) -> pd.DataFrame:
+    script = json.dumps({"soundbite": "x" * 300, "hashtags": ["#benchmark"] * 5})
+    return pd.DataFrame({
+        "id": range(start_id, start_id + count),
+        "input_text": [f"Benchmark input {start_id + i}" for i in range(count)],
+        "status": [rng.choice(["completed", "pending", "script_generated"]) for _ in range(count)],
+        "voice_type": "nova",
+        "script": script,
+        "audio_path": [f"generated_audio/speech_{start_id + i}.mp3" for i in range(count)],
+        "trace_id": "",
+    })
+
+async def bench_csv_growth(ctx: BenchContext) -> Dict[str, dict]:
+    """
+    Cost of single-row CSV operations as the generations CSV grows
+
+    Rows are bulk-written up to each checkpoint, then a few appends,
+    updates and lookups are timed through CSVManager.
+    """
+    from app.services.csv_service import CSVManager
+
+    path = "data/benchmark_generations.csv"
+    if os.path.exists(path):
+        os.remove(path)
+    headers = list(_bulk_rows(1, 0, random.Random()).columns)
+    manager = CSVManager(path, headers)
+    rng = random.Random(0)
+    rows = 0
+    results = {}
+
+    checkpoints = [n for n in (1_000, 10_000, 100_000) if n < ctx.options["csv_rows"]] + [ctx.options["csv_rows"]]
+    for checkpoint in checkpoints:
+        while rows < checkpoint:
+            batch = min(10_000, checkpoint - rows)
+            _bulk_rows(rows + 1, batch, rng).to_csv(path, mode="a", header=False, index=False)
+            rows += batch
+
+        timings = {"append": [], "update": [], "get": []}
+        for _ in range(ctx.options["csv_ops"]):
+            start = time.perf_counter()
+            await asyncio.to_thread(manager.append_rows, {"input_text": "appended", "status": "pending"})
+            timings["append"].append(time.perf_counter() - start)
+            rows += 1
+
+            row_id = rng.randint(1, rows)
+            start = time.perf_counter()
+            await asyncio.to_thread(manager.update_row, row_id, {"status": "completed"})
+            timings["update"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await asyncio.to_thread(manager.get_row, row_id)
+            timings["get"].append(time.perf_counter() - start)
+
+        results[f"csv_growth_{checkpoint}"] = {
+            "rows": rows,
+            "file_mb": round(os.path.getsize(path) / MB, 2),
+            **{key: value for op, values in timings.items() for key, value in latency_stats(values, f"{op}_").items()},
+        }
+    return results
+
+async def bench_export(ctx: BenchContext) -> Dict[str, dict]:
+    """
+    Streaming NDJSON and CSV export of a `--csv-rows` generations CSV
+
+    The export bodies are consumed straight from ExportService, because
+    the in-process HTTP transport buffers whole responses. Each export is
+    run once for throughput and once under tracemalloc for its Python heap
+    peak, next to loading the same file with CSVManager.read_data, which
+    is what downstream jobs did before.
+    """
+    import tracemalloc
+    from app.services.csv_service import CSVManager
+
+    path = "data/benchmark_export.csv"
+    rng = random.Random(0)
+    rows = ctx.options["csv_rows"]
+    headers = list(_bulk_rows(1, 0, rng).columns)
+    pd.DataFrame(columns=headers).to_csv(path, index=False)
+    for start in range(1, rows + 1, 10_000):
+        _bulk_rows(start, min(10_000, rows + 1 - start), rng).to_csv(path, mode="a", header=False, index=False)
+    export_service = ctx.container.get("export")
+    export_service.datasets["generations"] = path
+
+    def consume(fmt: str) -> int:
+        export = export_service.open("generations")
+        body = export.ndjson() if fmt == "ndjson" else export.csv()
+        return sum(len(chunk) for chunk in body)
+
+    def heap_peak(func, *args) -> float:
+        tracemalloc.start()
+        try:
+            func(*args)
+            return tracemalloc.get_traced_memory()[1] / MB
+        finally:
+            tracemalloc.stop()
+
+    results = {}
+    for fmt in ("ndjson", "csv"):
+        start = time.perf_counter()
+        written = await asyncio.to_thread(consume, fmt)
+        elapsed = time.perf_counter() - start
+        results[f"export_{fmt}"] = {
+            "rows": rows,
+            "file_mb": round(os.path.getsize(path) / MB, 2),
+            "rows_per_second": round(rows / elapsed) if elapsed else 0,
+            "mb_per_second": round(written / MB / elapsed, 1) if elapsed else 0.0,
+            "peak_heap_mb": round(await asyncio.to_thread(heap_peak, consume, fmt), 2),
+        }
+
+    manager = CSVManager(path, headers)
+    start = time.perf_counter()
+    await asyncio.to_thread(manager.read_data)
+    elapsed = time.perf_counter() - start
+    results["export_read_data"] = {
+        "rows": rows,
+        "rows_per_second": round(rows / elapsed) if elapsed else 0,
+        "peak_heap_mb": round(await asyncio.to_thread(heap_peak, manager.read_data), 2),
+    }
+    return results
+
+async def bench_youtube(ctx: BenchContext) -> Dict[str, dict]:
+    """Background resumable uploads through the upload queue against the fake YouTube API"""
+    size = ctx.options["youtube_mb"] * MB
+    path = os.path.abspath("generated_videos/benchmark_upload.mp4")
+    write_payload_file(path, size)
+
+    queue = ctx.container.get("upload_queue")
+    start = time.perf_counter()
+    jobs = [queue.enqueue(path, title=f"Benchmark {i}", description="Offline benchmark upload") for i in range(ctx.options["uploads"])]
+
+    pending = {job["id"] for job in jobs}
+    finished = {}
+    while pending:
+        await asyncio.sleep(0.05)
+        for job_id in list(pending):
+            job = queue.get_job(job_id)
+            if job["status"] in ("completed", "failed"):
+                finished[job_id] = job
+                pending.discard(job_id)
+    elapsed = time.perf_counter() - start
+
+    durations = [job["updated_at"] - job["created_at"] for job in finished.values()]
+    return {"youtube_upload": {
+        "uploads": len(jobs),
+        "errors": sum(job["status"] == "failed" for job in finished.values()),
+        "elapsed_s": round(elapsed, 3),
+        "mb_per_second": round(len(jobs) * size / MB / elapsed, 1) if elapsed else 0.0,
+        "p50_s": round(percentile(durations, 50), 3),
+        "final_chunk_mb": round(sum(job["chunk_size"] for job in finished.values()) / len(finished) / MB, 2),
+    }}
+
+SCENARIOS = {
+    "audio": bench_audio,
+    "pdf": bench_pdf,
+    "pdf_extract": bench_pdf_extract,
+    "lip_sync": bench_lip_sync,
+    "media": bench_media,
+    "csv": bench_csv_growth,
+    "export": bench_export,
+    "youtube": bench_youtube,
+}
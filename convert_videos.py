@@ -1,56 +1,276 @@
 import os
-import subprocess
+import sys
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import argparse
 from pathlib import Path
 
-def convert_to_mp4(input_dir, output_dir):
-    """Convert videos to MP4 format and rename them sequentially"""
-    # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Get all video files
-    video_files = [f for f in os.listdir(input_dir) if f.endswith(('.MOV', '.mp4', '.MP4', '.mov'))]
-    
-    for idx, video_file in enumerate(sorted(video_files), 1):
-        input_path = os.path.join(input_dir, video_file)
-        output_path = os.path.join(output_dir, f'input{idx}.mp4')
-        
-        print(f"\nConverting {video_file} to {output_path}...")
-        
-        try:
-            # Convert video to MP4 with H.264 codec
-            cmd = [
-                'ffmpeg',
-                '-i', input_path,
+# ffmpeg runs through the backend's shared scheduler
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from app.services.ffmpeg_service import FFmpegService, FFmpegError, Priority, summarize_streams
+from app.services.preview_service import ensure_previews
+
+MANIFEST_NAME = '.conversion_manifest.json'
+DEFAULT_THREADS_PER_JOB = 2
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hash a file's content so renamed or touched sources are not re-converted"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(output_dir):
+    """Load the source hash -> output manifest for an output directory"""
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Ignoring unreadable manifest {manifest_path}: {str(e)}")
+        return {}
+
+def save_manifest(output_dir, manifest):
+    """Atomically write the conversion manifest"""
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def is_up_to_date(manifest, source_hash, output_path):
+    """Check whether the output for a source hash exists and is unchanged"""
+    entry = manifest.get(source_hash)
+    if not entry or entry.get('output') != output_path:
+        return False
+    return os.path.exists(output_path) and os.path.getsize(output_path) == entry.get('output_size')
+
+def plan_output_path(output_dir, manifest, video_file, source_hash, claimed):
+    """
+    Pick a source's output path, so adding or removing sources never renames other outputs
+
+    A source converted before keeps its recorded output, even if it was
+    renamed since. New sources are named after themselves, with part of
+    their hash added when another source already has that name.
+    """
+    entry = manifest.get(source_hash)
+    if entry and entry.get('output') and entry['output'] not in claimed:
+        return entry['output']
+
+    output_path = os.path.join(output_dir, f'{Path(video_file).stem}.mp4')
+    recorded = {other.get('output') for other_hash, other in manifest.items() if other_hash != source_hash}
+    if output_path in claimed or output_path in recorded:
+        output_path = os.path.join(output_dir, f'{Path(video_file).stem}_{source_hash[:12]}.mp4')
+    return output_path
+
+def plan_threads(jobs=None, threads=None):
+    """Size the process pool and per-process thread budget so jobs * threads <= CPU count"""
+    cpu_count = os.cpu_count() or 1
+    if threads is None:
+        threads = max(1, cpu_count // jobs) if jobs else min(DEFAULT_THREADS_PER_JOB, cpu_count)
+    if jobs is None:
+        jobs = max(1, cpu_count // threads)
+    return jobs, threads
+
+async def probe_video(ffmpeg, input_path):
+    """Inspect a file's streams with ffprobe and return its video/audio codecs and duration"""
+    return summarize_streams(await ffmpeg.probe(input_path))
+
+def choose_strategy(probe):
+    """
+    Pick the cheapest conversion path for a probed file
+
+    remux:     H.264 (yuv420p) + AAC or no audio, only the container changes
+    audio:     H.264 video is kept, audio is transcoded to AAC
+    transcode: full H.264/AAC re-encode
+    """
+    if not probe or probe.get('video_codec') != 'h264' or probe.get('pix_fmt') not in ('yuv420p', 'yuvj420p'):
+        return 'transcode'
+    if probe.get('audio_codec') in (None, 'aac'):
+        return 'remux'
+    return 'audio'
+
+def build_ffmpeg_command(input_path, output_path, threads, strategy='transcode'):
+    """Build the ffmpeg arguments for a conversion strategy"""
+    cmd = [
+        '-i', input_path,
+        # Only keep the main video and audio streams, MOV data/timecode tracks can't be copied into MP4
+        '-map', '0:v:0',
+        '-map', '0:a:0?',
+    ]
+
+    if strategy == 'remux':
+        cmd += ['-c', 'copy']
+    else:
+        if strategy == 'audio':
+            cmd += ['-c:v', 'copy']
+        else:
+            cmd += [
                 '-c:v', 'libx264',  # Use H.264 codec
                 '-preset', 'medium',  # Balance between speed and quality
                 '-crf', '23',  # Constant Rate Factor (18-28 is good, lower is better quality)
-                '-c:a', 'aac',  # AAC audio codec
-                '-b:a', '128k',  # Audio bitrate
-                '-y',  # Overwrite output file if exists
-                output_path
+                '-threads', str(threads),  # Per-process budget so parallel jobs don't oversubscribe cores
             ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                print(f"Successfully converted {video_file}")
-            else:
-                print(f"Error converting {video_file}:")
-                print(result.stderr)
-                
+        cmd += [
+            '-c:a', 'aac',  # AAC audio codec
+            '-b:a', '128k',  # Audio bitrate
+        ]
+
+    cmd += [
+        '-movflags', '+faststart',  # Put the moov atom first so browsers can start playback immediately
+        '-y',  # Overwrite output file if exists
+        output_path
+    ]
+    return cmd
+
+async def convert_file(ffmpeg, input_path, output_path, threads):
+    """Convert a single video and return (success, strategy, seconds spent encoding, stderr)"""
+    try:
+        probe = await probe_video(ffmpeg, input_path)
+        strategy = choose_strategy(probe)
+    except Exception as e:
+        print(f"Could not probe {input_path}, falling back to a full transcode: {str(e)}")
+        probe, strategy = {}, 'transcode'
+
+    print(f"Converting {input_path} to {output_path} via {strategy}...")
+    cmd = build_ffmpeg_command(input_path, output_path, threads, strategy)
+    # Stream copies are I/O bound, only encodes need the full thread budget
+    job = ffmpeg.submit(
+        cmd,
+        priority=Priority.BATCH,
+        threads=threads if strategy == 'transcode' else 1,
+        duration=probe.get('duration')
+    )
+    try:
+        await job.wait()
+        success = True
+    except FFmpegError:
+        success = False
+    # Only the ffmpeg run itself, not the probe or the wait for a free slot
+    seconds = job.finished_at - job.started_at if job.started_at and job.finished_at else 0.0
+    return success, strategy, seconds, job.stderr
+
+def print_summary(stats, wall_seconds):
+    """Print an aggregate throughput summary for a conversion run"""
+    converted_mb = stats['converted_bytes'] / (1024 * 1024)
+    print("\nConversion summary:")
+    print(f"  Converted: {stats['converted']}  Skipped (up to date): {stats['skipped']}  Failed: {stats['failed']}")
+    print(f"  Input converted: {converted_mb:.1f} MB in {wall_seconds:.1f}s wall time")
+    print("  Paths: " + ", ".join(f"{name}={count}" for name, count in sorted(stats['strategies'].items())))
+    if wall_seconds > 0 and stats['converted']:
+        print(f"  Throughput: {converted_mb / wall_seconds:.2f} MB/s, {stats['converted'] * 60 / wall_seconds:.1f} files/min")
+        print(f"  Parallel speedup: {stats['encode_seconds'] / wall_seconds:.2f}x ({stats['encode_seconds']:.1f}s of encoding)")
+
+async def convert_all(input_dir, output_dir, jobs, threads, force, previews=True):
+    """Convert every video in input_dir, running conversions concurrently through the scheduler"""
+    video_files = [f for f in os.listdir(input_dir) if f.endswith(('.MOV', '.mp4', '.MP4', '.mov'))]
+
+    # One slot per CPU thread, no slots held back for interactive work in a batch run
+    ffmpeg = FFmpegService(total_slots=jobs * threads, interactive_reserved_slots=0)
+    manifest = {} if force else load_manifest(output_dir)
+    stats = {'converted': 0, 'skipped': 0, 'failed': 0, 'converted_bytes': 0, 'encode_seconds': 0.0, 'strategies': {}}
+    start = time.perf_counter()
+
+    async def convert_one(video_file, input_path, output_path, source_hash):
+        success, strategy, seconds, stderr = await convert_file(ffmpeg, input_path, output_path, threads)
+        if success:
+            print(f"Successfully converted {video_file} via {strategy} in {seconds:.1f}s")
+            stats['strategies'][strategy] = stats['strategies'].get(strategy, 0) + 1
+            stats['converted'] += 1
+            stats['converted_bytes'] += os.path.getsize(input_path)
+            stats['encode_seconds'] += seconds
+            manifest[source_hash] = {
+                'source': video_file,
+                'output': output_path,
+                'output_size': os.path.getsize(output_path),
+                'strategy': strategy
+            }
+            # Save as we go so an interrupted run keeps its finished outputs
+            save_manifest(output_dir, manifest)
+            if previews:
+                await make_previews(video_file, output_path)
+        else:
+            print(f"Error converting {video_file} via {strategy}:")
+            print(stderr)
+            stats['failed'] += 1
+
+    async def make_previews(video_file, output_path):
+        try:
+            _, generated = await ensure_previews(ffmpeg, output_path, await asyncio.to_thread(file_sha256, output_path))
+            if generated:
+                print(f"Generated previews for {video_file}")
         except Exception as e:
-            print(f"Error processing {video_file}: {str(e)}")
+            # Previews are a convenience, a failure doesn't fail the conversion
+            print(f"Could not generate previews for {video_file}: {str(e)}")
+
+    # Work out which inputs actually need converting
+    pending = []
+    claimed = set()
+    for video_file in sorted(video_files):
+        input_path = os.path.join(input_dir, video_file)
+        source_hash = file_sha256(input_path)
+        output_path = plan_output_path(output_dir, manifest, video_file, source_hash, claimed)
+        claimed.add(output_path)
+
+        if is_up_to_date(manifest, source_hash, output_path):
+            print(f"Skipping {video_file}, {output_path} is up to date")
+            stats['skipped'] += 1
+            # Outputs from before previews existed, or whose previews were deleted, still get them
+            if previews:
+                pending.append(make_previews(video_file, output_path))
+            continue
+        pending.append(convert_one(video_file, input_path, output_path, source_hash))
+
+    outcomes = await asyncio.gather(*pending, return_exceptions=True)
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            print(f"Error processing file: {str(outcome)}")
+            stats['failed'] += 1
+
+    print_summary(stats, time.perf_counter() - start)
+    return stats
+
+def convert_to_mp4(input_dir, output_dir, jobs=None, threads=None, force=False, previews=True):
+    """Convert videos to MP4 format, named after their sources"""
+    # Create output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs, threads = plan_threads(jobs, threads)
+    print(f"Running {jobs} ffmpeg process(es) with {threads} thread(s) each")
+
+    return asyncio.run(convert_all(input_dir, output_dir, jobs, threads, force, previews))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert videos in a directory to web-friendly MP4")
+    parser.add_argument('--input-dir', default='input_files', help="Directory containing source videos")
+    parser.add_argument('--output-dir', default='converted_files', help="Directory for converted videos")
+    parser.add_argument('--jobs', type=int, default=None, help="Concurrent ffmpeg processes (default: CPU count / threads)")
+    parser.add_argument('--threads', type=int, default=None, help=f"Threads per ffmpeg process (default: {DEFAULT_THREADS_PER_JOB})")
+    parser.add_argument('--sequential', action='store_true', help="Convert one file at a time")
+    parser.add_argument('--force', action='store_true', help="Re-convert files even if their output is up to date")
+    parser.add_argument('--skip-previews', action='store_true', help="Don't generate thumbnails, preview clips and seek sprites")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    input_dir = "input_files"
-    output_dir = "converted_files"
-    
-    # Check if ffmpeg is installed
-    try:
-        subprocess.run(['ffmpeg', '-version'], capture_output=True)
-    except FileNotFoundError:
+    args = parse_args()
+
+    # Check if ffmpeg and ffprobe are installed
+    if not shutil.which('ffmpeg') or not shutil.which('ffprobe'):
         print("Error: ffmpeg is not installed. Please install ffmpeg first.")
         exit(1)
-    
-    convert_to_mp4(input_dir, output_dir)
-    print("\nConversion completed! Check the 'converted_files' directory for the output.") 
\ No newline at end of file
+
+    convert_to_mp4(
+        args.input_dir,
+        args.output_dir,
+        jobs=1 if args.sequential else args.jobs,
+        threads=args.threads,
+        force=args.force,
+        previews=not args.skip_previews
+    )
+    print(f"\nConversion completed! Check the '{args.output_dir}' directory for the output.")
@@ -1,11 +1,32 @@
 import fal_client
 import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import httpx
 import requests
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+ENDPOINT = "fal-ai/minimax/video-01-live"  # correct endpoint for video generation
+
+DEFAULT_PROMPT = "A hilarious political debate between a wise owl wearing glasses and a energetic squirrel in a suit, vertical video format, TikTok style, Pixar-like animation quality, vibrant colors, split screen debate setup, animated meme reactions floating around, fact-check emojis popping up, viral social media aesthetic, comic speech bubbles, funny facial expressions, the owl looks scholarly and serious while the squirrel is hyperactive and dramatic, trending hashtags appearing, kawaii style effects, professional studio lighting, 4K quality"
+
+DEFAULT_PARAMETERS = {
+    "negative_prompt": "blurry, low quality, distorted, realistic humans, scary, aggressive, dark mood, unprofessional lighting, horizontal format, serious tone, realistic animals",
+    "num_frames": 24,
+    "fps": 12,  # Increased for smoother motion
+    "width": 608,   # Vertical format for TikTok (9:16 ratio)
+    "height": 1080,
+    "guidance_scale": 8.5,  # Increased for stronger prompt adherence
+    "num_inference_steps": 50
+}
+
 def download_video(url, filename):
     """Download a video from URL and save it to filename"""
     response = requests.get(url)
@@ -27,30 +48,21 @@ def generate_video():
     output_dir = "generated_videos"
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
-    
+
     # Get API key from environment variable
     fal_client.key = os.getenv('FAL_KEY')
-    
+
     try:
         # Subscribe to the video generation endpoint
         result = fal_client.subscribe(
-            "fal-ai/minimax/video-01-live",  # correct endpoint for video generation
-            arguments={
-                "prompt": "A hilarious political debate between a wise owl wearing glasses and a energetic squirrel in a suit, vertical video format, TikTok style, Pixar-like animation quality, vibrant colors, split screen debate setup, animated meme reactions floating around, fact-check emojis popping up, viral social media aesthetic, comic speech bubbles, funny facial expressions, the owl looks scholarly and serious while the squirrel is hyperactive and dramatic, trending hashtags appearing, kawaii style effects, professional studio lighting, 4K quality",
-                "negative_prompt": "blurry, low quality, distorted, realistic humans, scary, aggressive, dark mood, unprofessional lighting, horizontal format, serious tone, realistic animals",
-                "num_frames": 24,
-                "fps": 12,  # Increased for smoother motion
-                "width": 608,   # Vertical format for TikTok (9:16 ratio)
-                "height": 1080,
-                "guidance_scale": 8.5,  # Increased for stronger prompt adherence
-                "num_inference_steps": 50
-            },
+            ENDPOINT,
+            arguments={"prompt": DEFAULT_PROMPT, **DEFAULT_PARAMETERS},
             with_logs=True,
             on_queue_update=on_queue_update,
         )
-        
+
         print("\nVideo generation completed!")
-        
+
         # Download the generated video
         if isinstance(result, dict) and 'video' in result and isinstance(result['video'], dict):
             video_info = result['video']
@@ -64,9 +76,119 @@ def generate_video():
         else:
             print("No video information found in the response")
             print("Response:", result)
-            
+
     except Exception as e:
         print(f"An error occurred: {str(e)}")
 
+def load_batch(batch_path):
+    """
+    Read prompts and parameters from a JSONL file
+
+    Each line needs a "prompt" (or a "body", so backlog-style files such as
+    requests.jsonl work as-is). Any DEFAULT_PARAMETERS key on the line, or in
+    a nested "arguments" object, overrides the default.
+    """
+    jobs = []
+    with open(batch_path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            prompt = entry.get('prompt') or entry.get('body')
+            if not prompt:
+                print(f"Skipping line {line_number}: no prompt or body")
+                continue
+
+            arguments = {"prompt": prompt, **DEFAULT_PARAMETERS}
+            arguments.update({key: entry[key] for key in DEFAULT_PARAMETERS if key in entry})
+            arguments.update(entry.get('arguments', {}))
+            jobs.append(arguments)
+    return jobs
+
+def output_filename(arguments):
+    """Name an output deterministically from its prompt and a hash of every parameter"""
+    slug = re.sub(r'[^a-z0-9]+', '_', arguments['prompt'].lower()).strip('_')[:40] or 'video'
+    payload = json.dumps({"endpoint": ENDPOINT, "arguments": arguments}, sort_keys=True)
+    digest = hashlib.sha256(payload.encode()).hexdigest()[:12]
+    return f"{slug}_{digest}.mp4"
+
+async def download_video_async(http, url, filename):
+    """Stream a video to disk, renaming it into place only once it is complete"""
+    tmp_filename = f"{filename}.part"
+    async with http.stream('GET', url) as response:
+        response.raise_for_status()
+        with open(tmp_filename, 'wb') as f:
+            async for chunk in response.aiter_bytes():
+                f.write(chunk)
+    os.replace(tmp_filename, filename)
+
+async def generate_one(http, window, arguments, filename, poll_interval):
+    """Submit one prompt through the queue API, wait for it and download the result"""
+    start = time.perf_counter()
+    # The window bounds how many requests sit in fal's queue at once
+    async with window:
+        handle = await fal_client.submit_async(ENDPOINT, arguments=arguments)
+        print(f"Submitted {os.path.basename(filename)} (request {handle.request_id})")
+        async for _ in handle.iter_events(interval=poll_interval):
+            pass
+        result = await fal_client.result_async(ENDPOINT, handle.request_id)
+
+    video_info = result.get('video') if isinstance(result, dict) else None
+    if not isinstance(video_info, dict) or 'url' not in video_info:
+        raise RuntimeError(f"No video URL found in the response: {result}")
+
+    await download_video_async(http, video_info['url'], filename)
+    print(f"Downloaded: {filename} ({time.perf_counter() - start:.1f}s)")
+
+async def generate_batch(batch_path, output_dir="generated_videos", max_in_flight=8, poll_interval=2.0):
+    """Generate every prompt in a JSONL file concurrently, skipping outputs that already exist"""
+    os.makedirs(output_dir, exist_ok=True)
+    fal_client.key = os.getenv('FAL_KEY')
+
+    jobs = load_batch(batch_path)
+    stats = {'completed': 0, 'skipped': 0, 'failed': 0}
+    pending = []
+    seen = set()
+    for arguments in jobs:
+        filename = os.path.join(output_dir, output_filename(arguments))
+        if os.path.exists(filename) or filename in seen:
+            stats['skipped'] += 1
+            continue
+        seen.add(filename)
+        pending.append((arguments, filename))
+
+    print(f"{len(jobs)} prompt(s): {len(pending)} to generate, {stats['skipped']} already done, up to {max_in_flight} in flight")
+    start = time.perf_counter()
+    window = asyncio.Semaphore(max_in_flight)
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(60.0, read=300.0), follow_redirects=True) as http:
+        outcomes = await asyncio.gather(
+            *(generate_one(http, window, arguments, filename, poll_interval) for arguments, filename in pending),
+            return_exceptions=True
+        )
+
+    for (arguments, filename), outcome in zip(pending, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"Failed {os.path.basename(filename)}: {str(outcome)}")
+            stats['failed'] += 1
+        else:
+            stats['completed'] += 1
+
+    elapsed = time.perf_counter() - start
+    print(f"\nBatch finished in {elapsed:.1f}s: {stats['completed']} generated, {stats['skipped']} skipped, {stats['failed']} failed")
+    return stats
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate videos with fal.ai")
+    parser.add_argument('--batch', help="JSONL file of prompts to generate concurrently")
+    parser.add_argument('--output-dir', default="generated_videos", help="Directory for generated videos")
+    parser.add_argument('--max-in-flight', type=int, default=8, help="Maximum requests queued on fal at once")
+    parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds between queue status checks")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    generate_video() 
\ No newline at end of file
+    args = parse_args()
+    if args.batch:
+        asyncio.run(generate_batch(args.batch, args.output_dir, args.max_in_flight, args.poll_interval))
+    else:
+        generate_video()
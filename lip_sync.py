@@ -1,11 +1,24 @@
 import fal_client
 import os
+import csv
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import httpx
 import requests
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+ENDPOINT = "fal-ai/sync-lipsync"
+LIP_SYNC_ARGUMENTS = {
+    "face_detection_threshold": 0.8,  # Confidence threshold for face detection
+    "output_format": "mp4"  # Output video format
+}
+
 def upload_file(file_path):
     """Upload a file and get its URL"""
     try:
@@ -63,13 +76,8 @@ def generate_lip_sync(video_path="input_files/input.mp4", audio_path="input_file
         
         # Subscribe to the lip-sync endpoint
         result = fal_client.subscribe(
-            "fal-ai/sync-lipsync",  # lip-sync endpoint
-            arguments={
-                "video_url": video_url,
-                "audio_url": audio_url,
-                "face_detection_threshold": 0.8,  # Confidence threshold for face detection
-                "output_format": "mp4"  # Output video format
-            },
+            ENDPOINT,
+            arguments={"video_url": video_url, "audio_url": audio_url, **LIP_SYNC_ARGUMENTS},
             with_logs=True,
             on_queue_update=on_queue_update,
         )
@@ -90,6 +98,210 @@ def generate_lip_sync(video_path="input_files/input.mp4", audio_path="input_file
     except Exception as e:
         print(f"An error occurred: {str(e)}")
 
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hash a file's content, so the same clip under two names is uploaded once"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(manifest_path):
+    """
+    Read (video, audio) pairs from a JSONL or CSV manifest
+
+    Each JSONL line or CSV row needs "video" and "audio" paths, relative to
+    the manifest's directory unless absolute, and may name its "output".
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, newline='') as f:
+        if manifest_path.lower().endswith('.csv'):
+            entries = list(csv.DictReader(f))
+        else:
+            entries = [json.loads(line) for line in f if line.strip()]
+
+    pairs = []
+    for number, entry in enumerate(entries, 1):
+        if not entry.get('video') or not entry.get('audio'):
+            print(f"Skipping entry {number}: needs both a video and an audio path")
+            continue
+        pairs.append({
+            'video': os.path.join(base_dir, entry['video']),
+            'audio': os.path.join(base_dir, entry['audio']),
+            'output': entry.get('output') or None,
+        })
+    return pairs
+
+def output_filename(video_path, audio_path, video_hash, audio_hash):
+    """Name an output deterministically from its inputs' names and a hash of their content and the arguments"""
+    def stem(path):
+        return os.path.splitext(os.path.basename(path))[0][:30]
+
+    payload = json.dumps({"endpoint": ENDPOINT, "video": video_hash, "audio": audio_hash, "arguments": LIP_SYNC_ARGUMENTS}, sort_keys=True)
+    digest = hashlib.sha256(payload.encode()).hexdigest()[:12]
+    return f"{stem(video_path)}_{stem(audio_path)}_{digest}.mp4"
+
+async def download_video_async(http, url, filename):
+    """Stream a video to disk, renaming it into place only once it is complete"""
+    tmp_filename = f"{filename}.part"
+    async with http.stream('GET', url) as response:
+        response.raise_for_status()
+        with open(tmp_filename, 'wb') as f:
+            async for chunk in response.aiter_bytes():
+                f.write(chunk)
+    os.replace(tmp_filename, filename)
+
+class Uploader:
+    """Upload each distinct file once, however many jobs use it, with a bounded number in flight"""
+
+    def __init__(self, max_uploads):
+        self.window = asyncio.Semaphore(max_uploads)
+        self.tasks = {}
+        self.uploads = []
+
+    async def _upload(self, path, content_hash):
+        async with self.window:
+            start = time.perf_counter()
+            url = await fal_client.upload_file_async(path)
+        seconds = time.perf_counter() - start
+        self.uploads.append({'path': path, 'sha256': content_hash, 'bytes': os.path.getsize(path), 'seconds': round(seconds, 3)})
+        print(f"Uploaded {path} ({seconds:.1f}s)")
+        return url
+
+    def url(self, path, content_hash):
+        """Get the URL of a file's upload, starting it on the first request"""
+        if content_hash not in self.tasks:
+            self.tasks[content_hash] = asyncio.ensure_future(self._upload(path, content_hash))
+        return self.tasks[content_hash]
+
+def save_results(results_path, results):
+    """Atomically write the results manifest"""
+    tmp_path = f"{results_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp_path, results_path)
+
+async def lip_sync_one(http, window, uploader, job, poll_interval):
+    """Upload a pair's files (once per file), render it through the queue API and download the result"""
+    timings = job['timings']
+    start = time.perf_counter()
+    video_url, audio_url = await asyncio.gather(
+        uploader.url(job['video'], job['video_sha256']),
+        uploader.url(job['audio'], job['audio_sha256'])
+    )
+    timings['upload_wait_s'] = round(time.perf_counter() - start, 3)
+
+    # The window bounds how many requests sit in fal's queue at once
+    async with window:
+        submitted_at = time.perf_counter()
+        handle = await fal_client.submit_async(
+            ENDPOINT,
+            arguments={"video_url": video_url, "audio_url": audio_url, **LIP_SYNC_ARGUMENTS}
+        )
+        job['request_id'] = handle.request_id
+        print(f"Submitted {os.path.basename(job['output'])} (request {handle.request_id})")
+        started_at = None
+        async for status in handle.iter_events(interval=poll_interval):
+            if started_at is None and isinstance(status, fal_client.InProgress):
+                started_at = time.perf_counter()
+        result = await fal_client.result_async(ENDPOINT, handle.request_id)
+        finished_at = time.perf_counter()
+    started_at = started_at or submitted_at
+    timings['queue_s'] = round(started_at - submitted_at, 3)
+    timings['render_s'] = round(finished_at - started_at, 3)
+
+    video_info = result.get('video') if isinstance(result, dict) else None
+    if not isinstance(video_info, dict) or 'url' not in video_info:
+        raise RuntimeError(f"No video URL found in the response: {result}")
+
+    await download_video_async(http, video_info['url'], job['output'])
+    timings['download_s'] = round(time.perf_counter() - finished_at, 3)
+    timings['total_s'] = round(time.perf_counter() - start, 3)
+    print(f"Downloaded: {job['output']} ({timings['total_s']:.1f}s)")
+
+async def lip_sync_batch(manifest_path, output_dir="generated_videos", max_in_flight=8, max_uploads=4, poll_interval=2.0, results_path=None):
+    """
+    Lip-sync every (video, audio) pair in a manifest concurrently
+
+    Outputs that already exist are skipped. A results manifest with each
+    job's status, output and timings is rewritten as jobs finish, so an
+    interrupted run still records what it completed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    fal_client.key = os.getenv('FAL_KEY')
+    results_path = results_path or os.path.join(output_dir, "lip_sync_results.json")
+
+    pairs = load_manifest(manifest_path)
+    hashes = {}
+    jobs = []
+    seen = set()
+    for pair in pairs:
+        missing = [path for path in (pair['video'], pair['audio']) if not os.path.exists(path)]
+        job = {**pair, 'status': 'pending', 'request_id': None, 'error': None, 'timings': {}}
+        jobs.append(job)
+        if missing:
+            job.update(status='failed', error=f"File not found: {', '.join(missing)}")
+            continue
+
+        for path in (pair['video'], pair['audio']):
+            if path not in hashes:
+                hashes[path] = file_sha256(path)
+        job['video_sha256'] = hashes[pair['video']]
+        job['audio_sha256'] = hashes[pair['audio']]
+        filename = pair['output'] or output_filename(pair['video'], pair['audio'], job['video_sha256'], job['audio_sha256'])
+        job['output'] = os.path.join(output_dir, filename)
+        if os.path.exists(job['output']) or job['output'] in seen:
+            job['status'] = 'skipped'
+        seen.add(job['output'])
+
+    pending = [job for job in jobs if job['status'] == 'pending']
+    distinct = len({job[key] for job in pending for key in ('video_sha256', 'audio_sha256')})
+    print(f"{len(jobs)} pair(s): {len(pending)} to render from {distinct} distinct file(s), up to {max_in_flight} in flight")
+
+    results = {
+        'manifest': os.path.abspath(manifest_path),
+        'endpoint': ENDPOINT,
+        'max_in_flight': max_in_flight,
+        'started_at': time.time(),
+        'jobs': jobs,
+    }
+    start = time.perf_counter()
+    window = asyncio.Semaphore(max_in_flight)
+    uploader = Uploader(max_uploads)
+    results['uploads'] = uploader.uploads
+
+    async def run(http, job):
+        try:
+            await lip_sync_one(http, window, uploader, job, poll_interval)
+            job['status'] = 'completed'
+        except Exception as e:
+            print(f"Failed {os.path.basename(job['output'])}: {str(e)}")
+            job.update(status='failed', error=str(e))
+        # Save as we go so an interrupted run keeps a record of its finished renders
+        save_results(results_path, results)
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(60.0, read=300.0), follow_redirects=True) as http:
+        await asyncio.gather(*(run(http, job) for job in pending))
+
+    elapsed = time.perf_counter() - start
+    counts = {status: sum(job['status'] == status for job in jobs) for status in ('completed', 'skipped', 'failed')}
+    results.update(counts, wall_seconds=round(elapsed, 3))
+    save_results(results_path, results)
+
+    print(f"\nBatch finished in {elapsed:.1f}s: {counts['completed']} rendered, {counts['skipped']} skipped, {counts['failed']} failed")
+    print(f"Uploaded {len(uploader.uploads)} file(s) for {len(pending)} render(s). Results: {results_path}")
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Lip-sync videos to audio with fal.ai")
+    parser.add_argument('--batch', help="JSONL or CSV manifest of video/audio pairs to render concurrently")
+    parser.add_argument('--output-dir', default="generated_videos", help="Directory for lip-synced videos")
+    parser.add_argument('--max-in-flight', type=int, default=8, help="Maximum requests queued on fal at once")
+    parser.add_argument('--max-uploads', type=int, default=4, help="Maximum input files uploading at once")
+    parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds between queue status checks")
+    parser.add_argument('--results', help="Path of the results manifest (default: <output dir>/lip_sync_results.json)")
+    return parser.parse_args()
+
 def main():
     # Check if input files exist, if not, print instructions
     if not os.path.exists("input_files/input.mp4") or not os.path.exists("input_files/input.wav"):
@@ -102,4 +314,8 @@ def main():
     generate_lip_sync()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    args = parse_args()
+    if args.batch:
+        asyncio.run(lip_sync_batch(args.batch, args.output_dir, args.max_in_flight, args.max_uploads, args.poll_interval, args.results))
+    else:
+        main() 
\ No newline at end of file